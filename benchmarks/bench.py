@@ -0,0 +1,374 @@
+'''
+u-sa 벤치마크
+한국투자증권 서버 없이(가짜 통신 세션) 실행한다.
+
+실행 : python benchmarks/bench.py run [-o 결과.json] [--save-baseline]
+비교 : python benchmarks/bench.py compare [기준.json] [결과.json] [--threshold 0.15]
+     기준보다 느려진(또는 요청 수가 늘어난) 항목이 있으면 종료 코드 1
+'''
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# 헤드리스 환경에서도 pystray 를 불러올 수 있도록 (데스크톱에서는 영향 없음)
+os.environ.setdefault("PYSTRAY_BACKEND", "dummy")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), "u-sa.py")
+
+# 결과 저장 위치
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+RESULTS_LATEST_PATH = os.path.join(RESULTS_DIR, "latest.json")
+RESULTS_BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+
+# 기준 대비 허용 비율 (0.15 = 15% 까지는 잡음으로 본다)
+REGRESSION_THRESHOLD = 0.15
+
+# 측정 반복 횟수
+BENCH_ROUNDS = 7
+
+# 벤치마크 시각 : 영업일, 영업시간
+BENCH_NOW = datetime(2025, 5, 21, 10, 0, tzinfo=ZoneInfo("Asia/Seoul"))
+
+# 잔고 1페이지 종목 수 (실전 최대 50건)
+BALANCE_PAGE_SIZE = 50
+
+def load_app():
+    # u-sa.py 는 파일 이름에 '-' 가 있어 import 문으로 불러올 수 없다.
+    spec = importlib.util.spec_from_file_location("usa", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["usa"] = module
+    spec.loader.exec_module(module)
+    return module
+
+class FakeResponse:
+    '''
+    requests.Response 대신 사용하는 응답
+    '''
+    def __init__(self, data: dict, tr_cont: str = "D", status_code: int = 200):
+        self.data = data
+        self.status_code = status_code
+        self.headers = {"tr_cont": tr_cont}
+        self.text = json.dumps(data, ensure_ascii=False)
+
+    def json(self) -> dict:
+        return self.data
+
+class FakeSession:
+    '''
+    requests.Session 대신 사용하는 가짜 통신 세션
+    path 별로 미리 만든 응답을 돌려준다. (KisApi.send_request 부터는 실제 코드를 그대로 탄다)
+    '''
+    def __init__(self, balance_pages: int = 1, page_size: int = BALANCE_PAGE_SIZE, take_profit: bool = True):
+        """
+        Name:생성자
+        Args:
+            balance_pages (int): 잔고 연속 조회 페이지 수
+            page_size (int): 페이지당 종목 수
+            take_profit (bool): 첫 종목의 수익률을 익절 기준 이상으로
+        """
+        self.balance_pages = balance_pages
+        self.page_size = page_size
+        self.take_profit = take_profit
+        self.request_count = 0
+
+    def request(self, method, url, headers=None, params=None, data=None, timeout=None):
+        self.request_count += 1
+        if url.endswith("/uapi/hashkey"):
+            return FakeResponse({"HASH": "0" * 64})
+        if url.endswith("/trading/inquire-balance"):
+            return self.get_balance_page(params)
+        if url.endswith("/trading/inquire-daily-ccld"):
+            return FakeResponse({"output1": [], "output2": {}, "rt_cd": "0", "msg_cd": "KIOK0560",
+                                 "msg1": "조회할 내용이 없습니다"})
+        if url.endswith("/trading/inquire-psbl-sell"):
+            return FakeResponse({"output": {"pdno": params["PDNO"], "ord_psbl_qty": "2"},
+                                 "rt_cd": "0", "msg_cd": "KIOK0420", "msg1": "정상적으로 조회되었습니다"})
+        if url.endswith("/trading/order-cash"):
+            return FakeResponse({"output": {"ODNO": "0000000001"}, "rt_cd": "0", "msg_cd": "APBK0013",
+                                 "msg1": "주문 전송 완료 되었습니다."})
+        if url.endswith("/quotations/chk-holiday"):
+            return FakeResponse(make_business_date_data())
+        return FakeResponse({"rt_cd": "1", "msg1": f"unknown {url}"}, status_code=404)
+
+    def get_balance_page(self, params: dict) -> FakeResponse:
+        # CTX_AREA_NK100 에 페이지 번호를 넣어 연속 조회를 흉내낸다.
+        page = int(params.get("CTX_AREA_NK100") or 0)
+        rows = []
+        for i in range(self.page_size):
+            index = page * self.page_size + i
+            rt = "6.00" if self.take_profit and index == 0 else "0.56"
+            rows.append({
+                "pdno": "360750" if index == 0 else f"{100000 + index:06d}",
+                "prdt_name": f"종목{index}",
+                "hldg_qty": "2", "ord_psbl_qty": "2",
+                "pchs_avg_pric": "22020.0000", "pchs_amt": "44040",
+                "prpr": "22145", "evlu_amt": "44290",
+                "evlu_pfls_amt": "250", "evlu_pfls_rt": rt,
+            })
+        output2 = [{"prvs_rcdl_excc_amt": "1000000", "tot_evlu_amt": "1044290",
+                    "pchs_amt_smtl_amt": "44040", "evlu_amt_smtl_amt": "44290",
+                    "evlu_pfls_smtl_amt": "250"}]
+        last = page + 1 >= self.balance_pages
+        return FakeResponse({
+            "output1": rows, "output2": output2 if last else [],
+            "ctx_area_fk100": "", "ctx_area_nk100": str(page + 1),
+            "rt_cd": "0", "msg_cd": "KIOK0510", "msg1": "조회가 완료되었습니다",
+        }, tr_cont="D" if last else "M")
+
+def make_business_date_data() -> dict:
+    # 국내휴장일조회 응답 : BENCH_NOW 기준 24일
+    output = []
+    for day in range(24):
+        bass_dt = f"202505{day + 1:02d}"
+        weekday = datetime.strptime(bass_dt, "%Y%m%d").weekday()
+        opnd_yn = "Y" if weekday < 5 else "N"
+        output.append({"bass_dt": bass_dt, "wday_dvsn_cd": f"{(weekday + 1) % 7 + 1:02d}",
+                       "bzdy_yn": opnd_yn, "tr_day_yn": "Y", "opnd_yn": opnd_yn, "sttl_day_yn": opnd_yn})
+    return {"ctx_area_nk": "", "ctx_area_fk": "", "output": output, "rt_cd": "0", "msg_cd": "KIOK0500", "msg1": ""}
+
+class Bench:
+    '''
+    벤치마크 실행
+    임시 폴더에 config.json, token.json, businesdate.json 을 만들고 그 안에서 실행한다.
+    '''
+    def __init__(self, usa, rounds: int = BENCH_ROUNDS):
+        self.usa = usa
+        self.rounds = rounds
+        self.results = {}
+
+    def write_fixtures(self):
+        with open("config.json", "w", encoding="utf-8") as f:
+            json.dump({"app_key": "bench", "app_secret": "bench", "account_no": "12345678-01"}, f)
+        with open("token.json", "w", encoding="utf-8") as f:
+            json.dump({"authorization": "Bearer bench", "access_token": "bench",
+                       "access_token_token_expired": "2099-12-31 23:59:59"}, f)
+        with open("businesdate.json", "w", encoding="utf-8") as f:
+            json.dump(make_business_date_data(), f)
+
+    def create_api(self, session: FakeSession):
+        with contextlib.redirect_stdout(io.StringIO()):
+            api = self.usa.KisApi("bench", "bench", "12345678-01", clock=self.usa.VirtualClock(BENCH_NOW))
+        api.session = session
+        # 통신 대기는 측정 대상이 아니다.
+        api.rate_limiter = self.usa.RateLimiter(1e9)
+        return api
+
+    def measure(self, name: str, func, number: int, **extra):
+        """
+        Name:측정
+        func 을 number 번 실행하는 것을 rounds 번 반복하고 1회 시간(ms)을 기록한다.
+        출력은 버린다. (print 비용은 포함)
+        """
+        samples = []
+        sink = io.StringIO()
+        with contextlib.redirect_stdout(sink):
+            func()  # 준비 실행
+            for _ in range(self.rounds):
+                started = time.perf_counter()
+                for _ in range(number):
+                    func()
+                samples.append((time.perf_counter() - started) * 1000.0 / number)
+                sink.seek(0)
+                sink.truncate()
+        result = {
+            "median_ms": statistics.median(samples),
+            "min_ms": min(samples),
+            "mean_ms": statistics.fmean(samples),
+            "rounds": self.rounds,
+            "number": number,
+        }
+        result.update(extra)
+        self.results[name] = result
+        print(f"{name.ljust(28)} {result['median_ms']:10.3f} ms  (min {result['min_ms']:.3f})"
+              + "".join(f"  {key}={value}" for key, value in extra.items()))
+
+    def bench_do_trading(self):
+        # do_trading 전체 : 로그인, 휴일, 잔고, 체결, 전략, 매도, 매수
+        # 하루 판단 기록(DecisionMemo)이 남아 있으면 휴장일/체결 조회를 건너뛰므로 매번 새 기록(파일 저장 안 함)으로 실행한다.
+        session = FakeSession()
+        api = self.create_api(session)
+        with contextlib.redirect_stdout(io.StringIO()):
+            usa_tray = self.usa.UsaTray(kis_api=api)
+
+        def cycle():
+            usa_tray.decision_memo = self.usa.DecisionMemo(api.clock, None)
+            usa_tray.do_trading()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            before = api.request_count
+            cycle()
+        requests_per_cycle = api.request_count - before
+        self.measure("do_trading", cycle, number=20, requests_per_cycle=requests_per_cycle)
+
+    def bench_balance_all(self):
+        for pages in (1, 10, 100):
+            api = self.create_api(FakeSession(balance_pages=pages))
+            number = max(1, 200 // pages)
+            self.measure(f"balance_all_{pages}_pages", api.get_domestic_balance_all, number=number,
+                         requests_per_call=pages)
+
+    def bench_calendar(self):
+        # 오늘 휴장일 확인 (businesdate.json 을 불러온 후 메모리 조회)
+        api = self.create_api(FakeSession())
+        self.measure("calendar_lookup", api.get_today_opnd_yn, number=1000)
+
+    def bench_print_balance(self):
+        api = self.create_api(FakeSession(balance_pages=1))
+        balance = api.get_domestic_balance_all()
+        self.measure("print_balance", lambda: self.usa.Utill.print_balance(balance), number=100,
+                     holdings=len(balance["output1"]))
+
+    def bench_startup(self):
+        # 새 프로세스에서 시작하는 시간
+        # import : u-sa.py 를 불러오는 시간
+        # startup : import + UsaTray 생성 (설정, KisApi, 실행기, 판단 기록, 트레이 아이콘)
+        code = ("import importlib.util, sys;"
+                f"spec = importlib.util.spec_from_file_location('usa', {APP_PATH!r});"
+                "module = importlib.util.module_from_spec(spec);"
+                "spec.loader.exec_module(module)")
+        self.measure_process("import", code)
+        self.measure_process("startup", code + ";module.UsaTray()")
+
+    def measure_process(self, name: str, code: str):
+        env = dict(os.environ)
+        samples = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append((time.perf_counter() - started) * 1000.0)
+        self.results[name] = {
+            "median_ms": statistics.median(samples),
+            "min_ms": min(samples),
+            "mean_ms": statistics.fmean(samples),
+            "rounds": self.rounds,
+            "number": 1,
+        }
+        print(f"{name.ljust(28)} {statistics.median(samples):10.3f} ms  (min {min(samples):.3f})")
+
+    def run(self) -> dict:
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)
+            try:
+                self.write_fixtures()
+                self.bench_do_trading()
+                self.bench_balance_all()
+                self.bench_calendar()
+                self.bench_print_balance()
+                self.bench_startup()
+            finally:
+                os.chdir(cwd)
+        return {
+            "meta": {
+                "created_at": datetime.now(ZoneInfo("Asia/Seoul")).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "commit": get_git_commit(),
+                "rounds": self.rounds,
+            },
+            "benchmarks": self.results,
+        }
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """
+    Name:기준과 비교
+    시간(median_ms)은 threshold 를 넘게 느려지면, 요청 수(requests_*)는 늘어나면 회귀로 본다.
+    Args:
+        baseline (dict): 기준 결과
+        current (dict): 현재 결과
+        threshold (float): 허용 비율
+    Returns:
+        list: 회귀 항목 이름
+    """
+    regressions = []
+    base_benchmarks = baseline["benchmarks"]
+    print(f"{'benchmark'.ljust(28)} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, result in current["benchmarks"].items():
+        base = base_benchmarks.get(name)
+        if base is None:
+            print(f"{name.ljust(28)} {'-':>12} {result['median_ms']:12.3f}       new")
+            continue
+
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] > 0 else 1.0
+        status = ""
+        if ratio > 1.0 + threshold:
+            status = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1.0 - threshold:
+            status = "  faster"
+        print(f"{name.ljust(28)} {base['median_ms']:12.3f} {result['median_ms']:12.3f} {(ratio - 1.0) * 100:+8.1f}%{status}")
+
+        for key, value in result.items():
+            if key.startswith("requests_") and key in base and value > base[key]:
+                print(f"{''.ljust(28)} {key} {base[key]} -> {value}  REGRESSION")
+                regressions.append(f"{name}.{key}")
+
+    for name in base_benchmarks:
+        if name not in current["benchmarks"]:
+            print(f"{name.ljust(28)} 현재 결과에 없음")
+    return regressions
+
+def load_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="벤치마크 실행")
+    run_parser.add_argument("-o", "--output", default=RESULTS_LATEST_PATH, help="결과 json 경로")
+    run_parser.add_argument("--rounds", type=int, default=BENCH_ROUNDS, help="반복 횟수")
+    run_parser.add_argument("--save-baseline", action="store_true", help="결과를 기준으로도 저장")
+
+    compare_parser = sub.add_parser("compare", help="기준과 비교")
+    compare_parser.add_argument("baseline", nargs="?", default=RESULTS_BASELINE_PATH, help="기준 json 경로")
+    compare_parser.add_argument("current", nargs="?", default=RESULTS_LATEST_PATH, help="결과 json 경로")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="허용 비율 (기본 0.15)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        with contextlib.redirect_stdout(io.StringIO()):
+            usa = load_app()
+        result = Bench(usa, rounds=args.rounds).run()
+        save_json(args.output, result)
+        print(f"결과 저장 : {args.output}")
+        if args.save_baseline:
+            save_json(RESULTS_BASELINE_PATH, result)
+            print(f"기준 저장 : {RESULTS_BASELINE_PATH}")
+        return 0
+
+    regressions = compare(load_json(args.baseline), load_json(args.current), args.threshold)
+    if regressions:
+        print(f"회귀 {len(regressions)}건 : {', '.join(regressions)}")
+        return 1
+    print("회귀 없음")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
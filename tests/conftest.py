@@ -0,0 +1,19 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# 헤드리스 환경에서도 pystray 를 불러올 수 있도록 (데스크톱에서는 영향 없음)
+os.environ.setdefault("PYSTRAY_BACKEND", "dummy")
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "u-sa.py")
+
+@pytest.fixture(scope="session")
+def usa():
+    # u-sa.py 는 파일 이름에 '-' 가 있어 import 문으로 불러올 수 없다.
+    spec = importlib.util.spec_from_file_location("usa", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["usa"] = module
+    spec.loader.exec_module(module)
+    return module
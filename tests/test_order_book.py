@@ -0,0 +1,20 @@
+import threading
+
+def test_concurrent_add_symbols_allocates_each_symbol_once(usa):
+    store = usa.OrderBookStore([], capacity=4)
+    symbols = [f"{i:06d}" for i in range(50)]
+    barrier = threading.Barrier(8)
+
+    def add():
+        barrier.wait()
+        store.add_symbols(symbols)
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.symbols == symbols
+    assert len(store.ts) == len(symbols)
+    assert [store.index[symbol] for symbol in symbols] == list(range(len(symbols)))
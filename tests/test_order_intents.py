@@ -0,0 +1,65 @@
+def intent(side, symbol, quantity):
+    return {"side": side, "symbol": symbol, "quantity": quantity}
+
+def test_partial_sell_and_buy_net_to_one_order(usa):
+    orders, netted = usa.Utill.net_order_intents(
+        [intent("sell", "A", 4), intent("buy", "A", 1)], held={"A": 10})
+
+    assert orders == [intent("sell", "A", 3)]
+    assert netted == {"A": 1}
+
+def test_liquidating_sell_is_not_netted(usa):
+    # 익절 전량 매도 + 오늘 매수 : 청산 후 새 매수 단가로 다시 시작
+    orders, netted = usa.Utill.net_order_intents(
+        [intent("sell", "A", 10), intent("buy", "A", 1)], held={"A": 10})
+
+    assert orders == [intent("sell", "A", 10), intent("buy", "A", 1)]
+    assert netted == {}
+
+def test_unknown_holding_is_not_netted(usa):
+    orders, netted = usa.Utill.net_order_intents([intent("sell", "A", 4), intent("buy", "A", 1)])
+
+    assert orders == [intent("sell", "A", 4), intent("buy", "A", 1)]
+    assert netted == {}
+
+def test_reserved_quantity_is_kept_from_later_sells(usa):
+    orders, _ = usa.Utill.net_order_intents([intent("sell", "A", 9)], reserved={"A": 1}, held={"A": 9})
+
+    assert orders == [intent("sell", "A", 8)]
+
+def test_working_orders_are_not_resubmitted(usa):
+    working = usa.Utill.get_working_orders([
+        {"pdno": "A", "sll_buy_dvsn_cd": "01", "rmn_qty": "6"},
+        {"pdno": "B", "sll_buy_dvsn_cd": "02", "rmn_qty": "1"},
+        {"pdno": "B", "sll_buy_dvsn_cd": "02", "rmn_qty": "2", "cncl_yn": "Y"},
+        {"pdno": "C", "sll_buy_dvsn_cd": "02", "rmn_qty": "0"},
+    ])
+    assert working == {("sell", "A"): 6, ("buy", "B"): 1}
+
+    orders, _ = usa.Utill.net_order_intents(
+        [intent("sell", "A", 10), intent("buy", "B", 1), intent("buy", "C", 1)], working)
+
+    assert orders == [intent("sell", "A", 4), intent("buy", "C", 1)]
+
+def test_overseas_working_orders_use_nccs_qty(usa):
+    working = usa.Utill.get_working_orders(
+        [{"pdno": "AAPL", "sll_buy_dvsn_cd": "01", "nccs_qty": "3"}], qty_key="nccs_qty")
+
+    assert working == {("sell", "AAPL"): 3}
+
+def make_trader(usa):
+    from types import SimpleNamespace
+
+    return SimpleNamespace(working_orders={}, decision_memo=usa.DecisionMemo(usa.Clock(), None))
+
+def test_netted_is_recorded_only_when_sell_is_accepted(usa):
+    trader = make_trader(usa)
+    results = [
+        {"side": "sell", "symbol": "A", "quantity": 3, "rt_cd": "0"},
+        {"side": "sell", "symbol": "B", "quantity": 3, "rt_cd": "1"},
+    ]
+    usa.UsaTray.record_orders(trader, results, {"A": 1, "B": 1})
+
+    assert trader.decision_memo.get_netted() == {"A": 1}
+    assert trader.decision_memo.get_bought() == {"A"}
+    assert trader.working_orders == {("sell", "A"): 3}
@@ -0,0 +1,65 @@
+import math
+
+def make_fill(ord_dt, ord_tmd, side, symbol, qty, price):
+    return {"ord_dt": ord_dt, "ord_tmd": ord_tmd, "sll_buy_dvsn_cd": "02" if side == "buy" else "01",
+            "pdno": symbol, "prdt_name": symbol, "tot_ccld_qty": str(qty), "avg_prvs": str(price),
+            "tot_ccld_amt": str(qty * price)}
+
+def make_balance(rows=()):
+    output1 = [{"pdno": symbol, "prdt_name": symbol, "hldg_qty": str(qty), "pchs_avg_pric": str(avg),
+                "prpr": str(prpr)} for symbol, qty, avg, prpr in rows]
+    return {"output1": output1, "output2": [{"tot_evlu_amt": "1000000"}]}
+
+def test_position_opened_before_window_and_sold_inside(usa):
+    # 기간 이전에 산 10주를 기간 안에서 모두 팔고(단가 모름), 새로 사고 판다.
+    fills = [
+        make_fill("20250501", "090000", "sell", "A", 10, 90),
+        make_fill("20250502", "090000", "buy", "A", 5, 100),
+        make_fill("20250503", "090000", "buy", "A", 10, 100),
+        make_fill("20250504", "090000", "sell", "A", 15, 110),
+    ]
+    result = usa.PnlReport(fills, make_balance(), take_profit_rt=5.0).compute()
+
+    report_fills = result["fills"]
+    assert (report_fills["pos_after"] >= 0).all()
+    first_sell = report_fills[~report_fills["opening"]].iloc[0]
+    assert math.isnan(first_sell["realized_pnl"])
+
+    last_sell = report_fills.iloc[-1]
+    assert last_sell["realized_pnl"] == 150.0
+    assert abs(last_sell["return_rt"] - 10.0) < 1e-9
+    assert bool(last_sell["take_profit_hit"])
+
+    summary = result["summary"]
+    assert summary["fills"] == 4
+    assert summary["realized_pnl"] == 150.0
+    assert summary["take_profit_hit_rate"] == 1.0
+    assert summary["closed_positions"] == 1
+
+def test_opening_lot_still_held_uses_balance_cost(usa):
+    # 기간 이전 보유 10주 중 4주 매도, 6주 보유 (잔고 평균단가 100)
+    fills = [make_fill("20250501", "090000", "sell", "A", 4, 120)]
+    result = usa.PnlReport(fills, make_balance([("A", 6, 100, 110)])).compute()
+
+    assert result["fills"].iloc[-1]["realized_pnl"] == 80.0
+    assert result["symbols"].loc["A", "unrealized_pnl"] == 60.0
+    assert result["symbols"].loc["A", "buy_qty"] == 0
+
+def test_moving_average_cost(usa):
+    fills = [
+        make_fill("20250501", "090000", "buy", "A", 10, 100),
+        make_fill("20250501", "100000", "sell", "A", 5, 110),
+        make_fill("20250502", "090000", "buy", "A", 5, 130),
+        make_fill("20250502", "100000", "sell", "A", 10, 120),
+    ]
+    report_fills = usa.PnlReport(fills, make_balance()).compute()["fills"]
+
+    # 두 번째 매수 후 평균단가 (5 x 100 + 5 x 130) / 10 = 115
+    assert report_fills["realized_pnl"].tolist() == [0.0, 50.0, 0.0, 50.0]
+    assert report_fills["avg_cost"].iloc[2] == 115.0
+
+def test_months_before_uses_calendar_months(usa):
+    from datetime import datetime
+
+    assert usa.PnlReport.months_before(datetime(2026, 5, 31), 3) == datetime(2026, 2, 28)
+    assert usa.PnlReport.months_before(datetime(2026, 1, 15), 3) == datetime(2025, 10, 15)
@@ -0,0 +1,104 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+@pytest.fixture
+def paper_trader(usa, tmp_path, monkeypatch):
+    # config.json 없이 실행 (example_config.json 설정)
+    monkeypatch.chdir(tmp_path)
+
+    def make(strategy, positions, feed=None):
+        if feed is None:
+            ts = np.array([20250521090000, 20250521150000], dtype=np.int64)
+            feed = usa.PriceFeed({"A": (ts, np.array([110.0, 110.0]))})
+        start = datetime(2025, 5, 21, 8, 0, tzinfo=ZoneInfo("Asia/Seoul"))
+        trader = usa.PaperTrader(feed, start, start, positions=positions)
+        trader.usa_tray.strategy = strategy
+        return trader
+    return make
+
+def run_cycle(usa, trader, budget_sec=None):
+    trader.clock.set(datetime(2025, 5, 21, 10, 0, tzinfo=ZoneInfo("Asia/Seoul")))
+    usa_tray = trader.usa_tray
+    budget_sec = usa.CYCLE_DEADLINE_SEC if budget_sec is None else budget_sec
+    usa_tray.trading_cycle(usa_tray.clock.now(), usa.Deadline(budget_sec, usa_tray.clock))
+    return [(order["sll_buy_dvsn_cd_name"], order["pdno"], int(order["ord_qty"])) for order in trader.broker.orders]
+
+def make_strategy(usa, sell_qty, buy_qty):
+    class FixedStrategy(usa.Strategy):
+        # 보유하면 sell_qty 매도, 오늘 매수하지 않았으면 buy_qty 매수
+        def evaluate(self, universe):
+            sell = np.where(universe["held"], np.minimum(sell_qty, universe["hldg_qty"]), 0)
+            buy = np.where(~universe["bought_today"], buy_qty, 0)
+            return {"sell_qty": sell, "buy_qty": buy}
+    return FixedStrategy(symbols=["A"])
+
+def test_partial_sell_and_buy_are_sent_as_one_net_order(usa, paper_trader):
+    trader = paper_trader(make_strategy(usa, 5, 1), {"A": (10, 100)})
+
+    assert run_cycle(usa, trader) == [("현금매도", "A", 4)]
+    assert trader.broker.positions["A"][0] == 6
+    assert trader.usa_tray.decision_memo.get_netted() == {"A": 1}
+
+def test_liquidating_sell_and_buy_are_sent_separately(usa, paper_trader):
+    trader = paper_trader(make_strategy(usa, 10, 1), {"A": (10, 100)})
+
+    assert run_cycle(usa, trader) == [("현금매도", "A", 10), ("현금매수", "A", 1)]
+    assert trader.usa_tray.decision_memo.get_netted() == {}
+
+def test_sell_is_sent_when_ccld_fails(usa, paper_trader):
+    trader = paper_trader(make_strategy(usa, 5, 1), {"A": (10, 100)})
+
+    def fail(*args, **kwargs):
+        raise usa.KisApiError("timeout")
+    trader.broker.get_domestic_daily_ccld = fail
+
+    assert run_cycle(usa, trader) == [("현금매도", "A", 5)]
+
+def test_expired_budget_skips_remaining_steps(usa, paper_trader):
+    trader = paper_trader(make_strategy(usa, 10, 0), {"A": (10, 100)})
+
+    # 로그인, 휴일 확인 사이 대기(1초)로 예산을 다 쓴다.
+    assert run_cycle(usa, trader, budget_sec=0.5) == []
+    assert trader.broker.positions["A"][0] == 10
+
+def test_history_closes_are_loaded_once_per_day(usa, paper_trader):
+    seen = []
+
+    class HistoryStrategy(usa.Strategy):
+        history_days = 3
+
+        def evaluate(self, universe):
+            seen.append(universe["closes"].copy())
+            zeros = np.zeros(len(universe["symbols"]), dtype=np.int64)
+            return {"sell_qty": zeros, "buy_qty": zeros}
+
+    ts = np.array([20250516150000, 20250519150000, 20250520090000, 20250520150000, 20250521090000], dtype=np.int64)
+    feed = usa.PriceFeed({"A": (ts, np.array([100.0, 101.0, 90.0, 102.0, 103.0]))})
+    trader = paper_trader(HistoryStrategy(symbols=["A"]), {}, feed)
+
+    chart_calls = []
+    get_chart = trader.broker.get_domestic_daily_chart_all
+    trader.broker.get_domestic_daily_chart_all = lambda *args: chart_calls.append(args) or get_chart(*args)
+
+    run_cycle(usa, trader)
+    run_cycle(usa, trader)
+
+    # 오늘(21일) 이전 확정된 일봉 종가 3개, 두 번째 실행은 일봉을 다시 조회하지 않는다.
+    assert seen[0].tolist() == [[100.0, 101.0, 102.0]]
+    assert seen[1].tolist() == seen[0].tolist()
+    assert len(chart_calls) == 1
+
+def test_paper_runs_without_config_or_credentials(usa, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ts = np.array([20250521090000, 20250521150000], dtype=np.int64)
+    feed = usa.PriceFeed({"360750": (ts, np.array([22000.0, 22100.0]))})
+    start = datetime(2025, 5, 21, 8, 0, tzinfo=ZoneInfo("Asia/Seoul"))
+    trader = usa.PaperTrader(feed, start, start.replace(hour=10))
+
+    # example_config.json 의 기본 전략 : 360750 매일 1주 매수
+    result = trader.run()
+    assert [(order["pdno"], order["ord_qty"]) for order in result["orders"]] == [("360750", "1")]
+    assert not (tmp_path / "config.json").exists()
@@ -0,0 +1,14 @@
+import pytest
+
+def test_us_market_requires_explicit_strategy(usa):
+    with pytest.raises(ValueError):
+        usa.UsMarketTrader.create_strategy(None)
+
+def test_us_market_rejects_default_korean_buy_symbols(usa):
+    with pytest.raises(ValueError):
+        usa.UsMarketTrader.create_strategy({"name": "take_profit_daily_buy", "params": {"take_profit_rt": 5.0}})
+
+def test_us_market_strategy_with_buy_symbols(usa):
+    strategy = usa.UsMarketTrader.create_strategy({"params": {"buy_symbols": ["VOO"]}})
+
+    assert strategy.symbols == ["VOO"]
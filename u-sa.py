@@ -1,41 +1,534 @@
+import argparse
+import calendar
+import copy
+import cProfile
+import importlib
+import io
 import json
+import math
+import multiprocessing
 import os
+import pstats
+import random
+import signal
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image, ImageDraw, UnidentifiedImageError
 from pystray import Icon, MenuItem, Menu
 import schedule
 import threading
 import time # sleep
-from datetime import datetime
+import zlib
+from datetime import datetime, timedelta
 from datetime import time as dtime
 from zoneinfo import ZoneInfo
 import requests
+import numpy as np
 
 APP_VERSION = "0.0.1"
 
 # config.json, token.json, businesdate.json
 JSON_CONFIG_PATH = "config.json" 
+# config.json 이 없을 때 모의 매매가 대신 읽는 설정 (u-sa.py 옆, 계정 정보는 사용하지 않음)
+JSON_EXAMPLE_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example_config.json")
 JSON_TOKEN_PATH = "token.json"
 JSON_BUSINESS_DATE_PATH = "businesdate.json"
 
 # 실전투자 url
 BASE_URL = "https://openapi.koreainvestment.com:9443"
+# 실시간 시세 (웹소켓) url
+WEBSOCKET_URL = "ws://ops.koreainvestment.com:21000"
 
 # 매수용 종목 코드 목록
 SIMBOL_LIST = [
     "360750",
 ] 
 
+# 통신 타임아웃 (connect 초, read 초)
+# 응답이 없는 연결 때문에 do_trading, 스케줄 쓰레드가 멈추지 않도록 모든 요청에 지정한다.
+DEFAULT_TIMEOUT = (3.05, 10.0)
+API_TIMEOUTS = {
+    "/oauth2/tokenP": (3.05, 15.0),
+    "/uapi/hashkey": (3.05, 5.0),
+    "/uapi/domestic-stock/v1/trading/inquire-balance": (3.05, 10.0),
+    "/uapi/domestic-stock/v1/quotations/chk-holiday": (3.05, 10.0),
+    "/uapi/domestic-stock/v1/trading/inquire-psbl-sell": (3.05, 5.0),
+    "/uapi/domestic-stock/v1/trading/order-cash": (3.05, 10.0),
+    "/uapi/domestic-stock/v1/trading/inquire-daily-ccld": (3.05, 10.0),
+    "/uapi/domestic-stock/v1/quotations/inquire-price": (3.05, 5.0),
+    "/uapi/domestic-stock/v1/quotations/intstock-multprice": (3.05, 5.0),
+    "/uapi/domestic-stock/v1/quotations/inquire-asking-price-exp-ccn": (3.05, 5.0),
+    "/oauth2/Approval": (3.05, 10.0),
+    "/uapi/overseas-stock/v1/trading/inquire-balance": (3.05, 10.0),
+    "/uapi/overseas-stock/v1/trading/inquire-ccnl": (3.05, 10.0),
+    "/uapi/overseas-stock/v1/trading/order": (3.05, 10.0),
+    "/uapi/overseas-price/v1/quotations/price": (3.05, 5.0),
+    "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice": (3.05, 10.0),
+    "/uapi/domestic-stock/v1/quotations/inquire-time-itemchartprice": (3.05, 10.0),
+}
+
+# 재시도 : 조회성(멱등) 요청만 재시도 한다. 주문(order-cash)은 절대 재시도 하지 않는다.
+RETRY_MAX = 3                   # 최초 요청 포함 최대 시도 횟수
+RETRY_BACKOFF_BASE = 0.5        # 초, 시도마다 2배
+RETRY_BACKOFF_MAX = 4.0         # 초
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRY_MSG_CODES = ("EGW00201",) # 초당 거래건수를 초과하였습니다.
+
+# 헤지 요청 : 조회성 요청이 이 시간(초) 안에 응답이 없으면 같은 요청을 한번 더 보내고 먼저 온 응답을 사용
+# 0 이면 사용 안함 (기본)
+# 헤지 요청은 요청 수를 늘리고 초당 요청 한도(RateLimiter)를 함께 쓰므로, 한도에 가까우면 다른 요청이 밀리거나 EGW00201 로 거부된다.
+# 느린 응답은 타임아웃(API_TIMEOUTS)과 실행 시간 예산(CYCLE_DEADLINE_SEC)으로 먼저 막고,
+# 조회 응답 지연(p99)이 잦은 환경에서만 켠다. 예) 1.0
+HEDGE_DELAY_SEC = 0
+
+# 과거 시세(봉) 캐시 폴더
+# bars/{종목코드}/{D|M}/{컬럼}.bin : 컬럼별 append-only 바이너리 파일, memmap 으로 읽는다.
+BAR_CACHE_DIR = "bars"
+# ts : 일봉 YYYYMMDD, 분봉 YYYYMMDDHHMMSS
+BAR_COLUMNS = {
+    "ts": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.int64,
+}
+
+# 지표 : 이동평균, 변동성 윈도우 크기 / RSI 기간 (단위는 가격 입력 횟수)
+# 자동매매는 do_trading 실행마다 잔고 현재가 1개를 넣으므로 20 = 최근 20회 실행
+INDICATOR_WINDOW = 20
+INDICATOR_RSI_PERIOD = 14
+# 누적 합의 부동소수점 오차를 없애기 위해 이 횟수마다 링버퍼에서 다시 계산
+INDICATOR_RESYNC_INTERVAL = 1000
+
+# 매매 전략 : config.json 의 "strategy" 로 선택, 없으면 기본 전략
+# "strategy": {"name": "take_profit_daily_buy", "params": {"take_profit_rt": 5.0}}
+# name 은 STRATEGY_REGISTRY 의 이름 또는 "모듈:클래스" (u-sa.py 수정 없이 외부 전략 사용)
+DEFAULT_STRATEGY_NAME = "take_profit_daily_buy"
+
+# 모의 매매(재생) 결과 파일
+JSON_PAPER_ORDERS_PATH = "paper_orders.json"
+
+# 하루 동안 바뀌지 않는 판단(휴장 여부, 오늘 매수한 종목) 기록 파일
+JSON_DECISION_MEMO_PATH = "decision.json"
+
+# 손익 분석 리포트 (--report) 저장 폴더, 조회 기간(개월, 주식일별주문체결조회는 3개월 이내)
+REPORT_DIR = "report"
+REPORT_MONTHS_DEFAULT = 3
+REPORT_MONTHS_MAX = 3
+
+# 실행 추적 : 최근 do_trading 요약 보관 개수
+TRACE_HISTORY_SIZE = 200
+# 프로파일링 : 요청 시 기본 실행 횟수, 결과 폴더
+PROFILE_CYCLES_DEFAULT = 5
+PROFILE_DIR = "profile"
+
+# 국내 정규장 매매 시간 (Asia/Seoul)
+SESSION_START_TIME = dtime(9, 00)
+SESSION_END_TIME = dtime(15, 20)
+
+# 미국 주식 영업시간 (America/New_York, 서머타임은 ZoneInfo 가 처리)
+US_TIMEZONE = "America/New_York"
+US_SESSION_START_TIME = dtime(9, 30)
+US_SESSION_END_TIME = dtime(16, 0)
+# 미국 휴장일 (NYSE)
+# 표에 없는 해는 휴장일을 알 수 없으므로 매매하지 않는다. config.json us_market.holidays 로 추가할 수 있다.
+US_MARKET_HOLIDAYS = {
+    "20250101", "20250109", "20250120", "20250217", "20250418", "20250526",
+    "20250619", "20250704", "20250901", "20251127", "20251225",
+    "20260101", "20260119", "20260216", "20260403", "20260525", "20260619",
+    "20260703", "20260907", "20261126", "20261225",
+}
+# 미국 조기 폐장일 (13:00)
+US_MARKET_EARLY_CLOSE = {"20250703", "20251128", "20251224", "20261127", "20261224"}
+US_EARLY_CLOSE_TIME = dtime(13, 0)
+# 주문/잔고 거래소 코드 -> 시세 거래소 코드
+US_QUOTE_EXCHANGES = {"NASD": "NAS", "NYSE": "NYS", "AMEX": "AMS"}
+# 미국 주식은 지정가만 가능 : 현재가에서 이 비율만큼 불리한 가격으로 주문해서 바로 체결되게 한다.
+US_ORDER_PRICE_SLIPPAGE = 0.005
+
+# 스케줄 : config.json "schedule_mode" fixed(기본, 10분마다) 또는 adaptive
+SCHEDULE_INTERVAL_MIN = 10
+# adaptive : 보유 종목의 익절 기준까지 거리와 변동성으로 다음 실행 시각을 정한다.
+ADAPTIVE_MIN_INTERVAL_SEC = 5
+ADAPTIVE_MAX_INTERVAL_SEC = 1800
+ADAPTIVE_DAILY_REQUEST_BUDGET = 3000    # 하루 API 요청 예산
+ADAPTIVE_Z = 3.0                        # 다음 실행 전에 기준을 넘을 확률을 작게 하는 표준편차 배수
+ADAPTIVE_DEFAULT_DAILY_VOL = 0.01       # 변동성을 모를 때 일간 변동성 (1%)
+ADAPTIVE_VOL_HALFLIFE = 20              # 변동성 EWMA 반감기 (관측 횟수)
+
+# 장 시작 전 준비 시각 (Asia/Seoul) : 토큰, 휴장일, 연결, 잔고/체결, 오늘 매수 주문 준비
+WARMUP_TIME = "08:50"
+# 장 시작 직전 연결 유지 요청 시각
+WARMUP_KEEPALIVE_TIME = "08:59:30"
+
+# API 초당 요청 수 제한 (실전 계좌 20건/초, 여유를 둔다)
+# 분할 실행(shard_workers)에서는 모든 프로세스가 공유 메모리로 이 예산을 함께 쓴다.
+API_RATE_LIMIT_PER_SEC = 15
+
+# 호가(order book)
+# ORDER_BOOK_DEPTH : 호가 단계 (매도/매수 각 10단계)
+# ORDER_BOOK_CAPACITY : 종목별 보관할 호가 갱신 수 (링 버퍼)
+# ORDER_BOOK_MAX_AGE_SEC : 이보다 오래된 호가는 주문 유형 선택에 쓰지 않는다.
+ORDER_BOOK_DEPTH = 10
+ORDER_BOOK_CAPACITY = 1024
+ORDER_BOOK_MAX_AGE_SEC = 5.0
+
+# 관심종목(멀티종목) 시세조회 1회 최대 종목 수
+MULTI_PRICE_MAX_SYMBOLS = 30
+
+# do_trading 1회 실행 시간 예산 (초)
+# 단계 사이마다 확인해서 예산을 넘기면 남은 단계는 다음 실행으로 넘긴다.
+# 잔고 조회 전, 주문 전(잔고/시세가 오래되었으면 주문하지 않음), 주문체결 조회(매수) 전후
+CYCLE_DEADLINE_SEC = 60
+
+# 스케줄 쓰레드가 백그라운드 작업을 기다리는 최대 시간 (초)
+# 넘으면 작업은 작업 쓰레드에서 계속 진행하고 스케줄 쓰레드는 다음 일정으로 넘어간다.
+JOB_WAIT_TIMEOUT_SEC = 120
+
+class KisApiError(Exception):
+    '''
+    한국투자증권 REST API 통신 오류
+    타임아웃, 연결 실패, 재시도 초과, 응답 형식 오류
+    '''
+    pass
+
+class Clock:
+    '''
+    시계
+    매매 흐름의 현재 시각, 대기를 담당한다. 모의 매매(VirtualClock)에서 교체한다.
+    '''
+    def now(self) -> datetime:
+        # Asia/Seoul 기준 현재 시각
+        return datetime.now(ZoneInfo("Asia/Seoul"))
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+class VirtualClock(Clock):
+    '''
+    가상 시계
+    sleep 은 기다리지 않고 시각만 앞으로 보낸다.
+    '''
+    def __init__(self, start: datetime):
+        """
+        Name:생성자
+        Args:
+            start (datetime): 시작 시각 (tz 없으면 Asia/Seoul)
+        """
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=ZoneInfo("Asia/Seoul"))
+        self.current = start
+        self.lock = threading.Lock()
+
+    def now(self) -> datetime:
+        with self.lock:
+            return self.current
+
+    def monotonic(self) -> float:
+        return self.now().timestamp()
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        with self.lock:
+            self.current = self.current + timedelta(seconds=seconds)
+
+    def set(self, current: datetime):
+        if current.tzinfo is None:
+            current = current.replace(tzinfo=ZoneInfo("Asia/Seoul"))
+        with self.lock:
+            self.current = max(self.current, current)
+
+class Deadline:
+    '''
+    실행 시간 예산
+    do_trading 1회 실행에 사용할 수 있는 시간을 관리한다.
+    '''
+    def __init__(self, budget_sec: float, clock: Clock = None):
+        """
+        Name:생성자
+        Args:
+            budget_sec (float): 사용 가능한 시간(초)
+            clock (Clock): 시계, 없으면 실제 시계
+        """
+        self.budget_sec = budget_sec
+        self.clock = clock or Clock()
+        self.expires_at = self.clock.monotonic() + budget_sec
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+class Tracer:
+    '''
+    실행 추적
+    do_trading 1회(cycle) 동안 단계별/API별 구간(span) 시간을 모아서 요약을 링버퍼에 보관한다.
+    cycle 이 진행 중인 쓰레드의 구간만 기록한다. (트레이 쓰레드의 조회는 기록하지 않음)
+    '''
+    def __init__(self, history_size: int = TRACE_HISTORY_SIZE):
+        """
+        Name:생성자
+        Args:
+            history_size (int): 보관할 요약 개수
+        """
+        self.local = threading.local()
+        self.history = deque(maxlen=history_size)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def cycle(self, name: str, started_at: datetime = None):
+        """
+        Name:실행 1회 추적
+        Args:
+            name (str): 실행 이름 do_trading
+            started_at (datetime): 시작 시각 (모의 매매는 가상 시각)
+        """
+        spans = {}
+        self.local.spans = spans
+        started = time.perf_counter()
+        try:
+            yield spans
+        finally:
+            self.local.spans = None
+            total_ms = (time.perf_counter() - started) * 1000.0
+            summary = {
+                "name": name,
+                "started_at": (started_at or datetime.now(ZoneInfo("Asia/Seoul"))).strftime("%Y-%m-%d %H:%M:%S"),
+                "total_ms": round(total_ms, 3),
+                "spans": {key: {"count": value[0], "ms": round(value[1], 3)} for key, value in spans.items()},
+            }
+            with self.lock:
+                self.history.append(summary)
+            phases = " ".join(f"{key}={value[1]:.0f}ms" for key, value in spans.items() if not key.startswith("api "))
+            print(f"[trace] {name} {total_ms:.0f}ms {phases}")
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Name:구간 추적
+        같은 이름은 횟수와 시간을 합산한다.
+        """
+        spans = getattr(self.local, "spans", None)
+        if spans is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            count, total = spans.get(name, (0, 0.0))
+            spans[name] = (count + 1, total + elapsed_ms)
+
+    def add_spans(self, spans: dict, prefix: str = ""):
+        """
+        Name:구간 합치기
+        다른 프로세스(분할 실행)에서 측정한 구간을 현재 cycle 에 더한다.
+        Args:
+            spans (dict): {이름: (횟수, ms)}
+            prefix (str): 이름 앞에 붙일 값
+        """
+        current = getattr(self.local, "spans", None)
+        if current is None:
+            return
+        for name, (count, ms) in spans.items():
+            key = f"{prefix}{name}"
+            prev_count, prev_ms = current.get(key, (0, 0.0))
+            current[key] = (prev_count + count, prev_ms + ms)
+
+    def get_history(self) -> list:
+        with self.lock:
+            return list(self.history)
+
+class CycleProfiler:
+    '''
+    요청형 프로파일러
+    요청하면 다음 N회의 do_trading 을 cProfile 로 측정해서 profile 폴더에 저장한다.
+    트레이 메뉴, 시그널(SIGUSR1), --profile N 으로 요청한다.
+    '''
+    def __init__(self, tracer: Tracer, profile_dir: str = PROFILE_DIR):
+        """
+        Name:생성자
+        Args:
+            tracer (Tracer): 결과에 실행 추적 요약을 함께 저장
+            profile_dir (str): 결과 폴더 ./profile
+        """
+        self.tracer = tracer
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.remaining = 0
+        self.total = 0
+        self.profile = None
+
+    def request(self, cycles: int = PROFILE_CYCLES_DEFAULT):
+        with self.lock:
+            self.remaining = cycles
+            self.total = cycles
+        print(f"프로파일링 요청 : 다음 {cycles}회 실행")
+
+    def run(self, func, *args, **kwargs):
+        """
+        Name:실행
+        요청이 있으면 프로파일링 하면서 실행한다.
+        """
+        with self.lock:
+            active = self.remaining > 0
+            if active and self.profile is None:
+                self.profile = cProfile.Profile()
+        if not active:
+            return func(*args, **kwargs)
+
+        self.profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profile.disable()
+            with self.lock:
+                self.remaining -= 1
+                done = self.remaining <= 0
+            if done:
+                self.save()
+
+    def save(self):
+        # 결과 저장 : .prof(pstats), .txt(누적 시간 상위), .json(실행 추적 요약)
+        with self.lock:
+            profile, self.profile = self.profile, None
+            cycles = self.total
+        if profile is None:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d_%H%M%S")
+        base_path = os.path.join(self.profile_dir, f"cycle_{stamp}")
+
+        profile.dump_stats(f"{base_path}.prof")
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(50)
+        with open(f"{base_path}.txt", "w", encoding="utf-8") as f:
+            f.write(stream.getvalue())
+        with open(f"{base_path}.json", "w", encoding="utf-8") as f:
+            json.dump(self.tracer.get_history()[-cycles:], f, indent=2, ensure_ascii=False)
+
+        print(f"프로파일링 완료 : {base_path}.prof")
+
+class RateLimiter:
+    '''
+    초당 요청 수 제한
+    요청마다 다음 요청 가능 시각을 1/rate 초씩 뒤로 미는 방식 (GCRA)
+    '''
+    def __init__(self, rate_per_sec: float = API_RATE_LIMIT_PER_SEC):
+        """
+        Name:생성자
+        Args:
+            rate_per_sec (float): 초당 요청 수
+        """
+        self.interval = 1.0 / rate_per_sec
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def reserve(self) -> float:
+        # 요청 1건 예약, 기다려야 할 시간(초)
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+            return start - now
+
+    def acquire(self):
+        wait_sec = self.reserve()
+        if wait_sec > 0:
+            time.sleep(wait_sec)
+
+class SharedRateLimiter(RateLimiter):
+    '''
+    프로세스 공유 초당 요청 수 제한
+    다음 요청 가능 시각을 공유 메모리(multiprocessing.Value)에 두고 여러 프로세스가 함께 쓴다.
+    '''
+    def __init__(self, rate_per_sec: float = API_RATE_LIMIT_PER_SEC, state=None):
+        """
+        Name:생성자
+        Args:
+            rate_per_sec (float): 초당 요청 수 (전체 프로세스 합계)
+            state (multiprocessing.Value): 공유 상태, 없으면 생성
+        """
+        self.interval = 1.0 / rate_per_sec
+        self.state = state if state is not None else multiprocessing.Value("d", 0.0)
+
+    def reserve(self) -> float:
+        with self.state.get_lock():
+            now = time.time()
+            start = max(now, self.state.value)
+            self.state.value = start + self.interval
+            return start - now
+
+class SingleFlight:
+    '''
+    동일 요청 합치기
+    같은 key 의 요청이 진행 중이면 새로 보내지 않고 진행 중인 요청의 결과를 기다려 함께 사용한다.
+    트레이 쓰레드와 스케줄 쓰레드가 같은 조회를 동시에 하는 경우에 사용한다.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared_count = 0   # 합쳐진(보내지 않은) 요청 수
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Name:실행
+        Args:
+            key: 요청 식별 값 (hashable)
+            func: 실제 요청 함수
+        Returns:
+            func 결과, 기다린 쪽은 복사본을 받는다.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+            else:
+                self.shared_count += 1
+
+        if not is_leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            # 결과를 수정해도 서로 영향이 없도록 복사
+            return copy.deepcopy(call["result"])
+
+        try:
+            call["result"] = func(*args, **kwargs)
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call["event"].set()
+
 class KisApi:
     '''
     한국투자증권 REST API
     '''
-    def __init__(self, app_key: str, app_secret: str, account_no: str):
+    def __init__(self, app_key: str, app_secret: str, account_no: str, clock: Clock = None):
         """
         Name:생성자
         Args:
             app_key (str): 발급받은 API key
             app_secret (str): 발급받은 API secret
             account_no (str): 계좌번호 체계의 앞 8자리-뒤 2자리
+            clock (Clock): 시계, 없으면 실제 시계
         """
         print("KisApi __init__")
 
@@ -50,6 +543,31 @@ class KisApi:
         # base url
         self.base_url = BASE_URL
 
+        # 시계
+        self.clock = clock or Clock()
+
+        # 실행 추적 (API 호출 구간)
+        self.tracer = Tracer()
+
+        # 동시에 들어온 같은 조회, 토큰 발급 합치기
+        self.single_flight = SingleFlight()
+
+        # 보낸 요청 수 (재시도 포함), 스케줄/미국/작업 쓰레드가 함께 갱신한다.
+        self.request_count = 0
+        self.request_count_lock = threading.Lock()
+
+        # 초당 요청 수 제한
+        self.rate_limiter = RateLimiter()
+
+        # 통신 세션 : 연결을 재사용한다.
+        self.session = requests.Session()
+
+        # 쓰레드별 실행 시간 예산 (do_trading 에서 지정)
+        self.local = threading.local()
+
+        # 헤지 요청용 쓰레드 풀
+        self.hedge_executor = ThreadPoolExecutor(max_workers=4) if HEDGE_DELAY_SEC > 0 else None
+
         # api key
         self.app_key = app_key
         self.app_secret = app_secret
@@ -146,6 +664,129 @@ class KisApi:
             with open(self.json_business_date_path, "r", encoding="utf-8") as f:
                 self.business_date_data = json.load(f)
 
+    # 통신
+    def set_deadline(self, deadline: Deadline | None):
+        """
+        Name:실행 시간 예산 지정
+        현재 쓰레드에서 보내는 조회성 요청의 타임아웃, 재시도를 예산 안으로 제한한다.
+        Args:
+            deadline (Deadline | None): None 이면 해제
+        """
+        self.local.deadline = deadline
+
+    def get_deadline(self) -> Deadline | None:
+        return getattr(self.local, "deadline", None)
+
+    def count_request(self, count: int = 1):
+        with self.request_count_lock:
+            self.request_count += count
+
+    def send_request(self, method: str, path: str, headers: dict, params: dict = None,
+                     data: str = None, idempotent: bool = True) -> requests.Response:
+        """
+        Name:요청 전송
+        엔드포인트별 타임아웃을 적용한다.
+        idempotent 요청만 재시도(지터 포함 지수 백오프), 헤지 요청을 한다.
+        주문처럼 idempotent 가 아닌 요청은 1회만 보낸다.
+        Args:
+            method (str): GET, POST
+            path (str): api path
+            headers (dict): 요청 헤더
+            params (dict): query string
+            data (str): POST body
+            idempotent (bool): 재시도 가능 여부
+        Returns:
+            requests.Response
+        Raises:
+            KisApiError: 타임아웃, 연결 실패, 재시도 초과
+        """
+        url = f"{self.base_url}{path}"
+        connect_timeout, read_timeout = API_TIMEOUTS.get(path, DEFAULT_TIMEOUT)
+        self.count_request()
+        deadline = self.get_deadline()
+        max_attempts = RETRY_MAX if idempotent else 1
+
+        last_error = None
+        for attempt in range(1, max_attempts + 1):
+            timeout = (connect_timeout, read_timeout)
+            if idempotent and deadline is not None:
+                # 예산이 남은 만큼만 기다린다 (최소 1초)
+                timeout = (connect_timeout, max(1.0, min(read_timeout, deadline.remaining())))
+
+            self.rate_limiter.acquire()
+            try:
+                with self.tracer.span(f"api {method} {path}"):
+                    if idempotent and self.hedge_executor is not None:
+                        resp = self.send_hedged(method, url, headers, params, data, timeout)
+                    else:
+                        resp = self.session.request(method, url, headers=headers, params=params,
+                                                    data=data, timeout=timeout)
+                if resp.status_code not in RETRY_STATUS_CODES or not self.is_retryable(resp):
+                    return resp
+                last_error = KisApiError(f"{path} HTTP {resp.status_code}")
+            except (requests.Timeout, requests.ConnectionError) as e:
+                last_error = KisApiError(f"{path} {type(e).__name__}: {e}")
+                if not idempotent:
+                    # 주문은 전송 여부를 알 수 없으므로 재시도 하지 않고 바로 알린다.
+                    raise last_error from e
+
+            if attempt >= max_attempts:
+                break
+
+            # 지터 포함 지수 백오프
+            backoff = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** (attempt - 1)))
+            backoff = random.uniform(0, backoff)
+            if deadline is not None and backoff >= deadline.remaining():
+                print(f"재시도 중단 (시간 예산 부족) : {path}")
+                break
+            print(f"재시도 {attempt}/{max_attempts - 1} : {last_error}")
+            self.clock.sleep(backoff)
+
+        raise last_error
+
+    def is_retryable(self, resp: requests.Response) -> bool:
+        # 5xx 중에서도 유량 초과 등 재시도 의미가 있는 경우만
+        if resp.status_code != 500:
+            return True
+        try:
+            return resp.json().get("msg_cd") in RETRY_MSG_CODES
+        except ValueError:
+            return True
+
+    def send_hedged(self, method: str, url: str, headers: dict, params: dict, data: str,
+                    timeout: tuple) -> requests.Response:
+        """
+        Name:헤지 요청
+        HEDGE_DELAY_SEC 안에 응답이 없으면 같은 요청을 한번 더 보내고 먼저 온 응답을 사용한다.
+        """
+        def call():
+            return self.session.request(method, url, headers=headers, params=params,
+                                        data=data, timeout=timeout)
+
+        futures = [self.hedge_executor.submit(call)]
+        done, _ = wait(futures, timeout=HEDGE_DELAY_SEC)
+        if not done:
+            # 두 번째 요청도 요청 수, 초당 요청 한도에 포함
+            self.count_request()
+            self.rate_limiter.acquire()
+            futures.append(self.hedge_executor.submit(call))
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+        # 먼저 성공한 응답, 모두 실패면 첫 예외
+        first = done.pop()
+        if first.exception() is None:
+            return first.result()
+        for f in futures:
+            if f is not first:
+                return f.result()
+        return first.result()
+
+    def get_json(self, resp: requests.Response) -> dict:
+        try:
+            return resp.json()
+        except ValueError as e:
+            raise KisApiError(f"응답 형식 오류 HTTP {resp.status_code}: {resp.text[:200]}") from e
+
     # OAuth인증
     def get_hashkey(self, data: dict):
         """
@@ -156,23 +797,30 @@ class KisApi:
             haskkey
         """
         path = "/uapi/hashkey"
-        url = f"{self.base_url}{path}"
         headers = {
            "content-type": "application/json",
            "appKey": self.app_key,
            "appSecret": self.app_secret,
            "User-Agent": "Mozilla/5.0"
         }
-        resp = requests.post(url, headers=headers, data=json.dumps(data))
-        haskkey = resp.json()["HASH"]
+        resp = self.send_request("POST", path, headers=headers, data=json.dumps(data))
+        haskkey = self.get_json(resp)["HASH"]
         return haskkey
     
     def get_access_token(self) -> bool:
         """
         Name:접근토큰발급
+        만료된 경우에만 발급한다. 동시에 여러 쓰레드가 요청해도 발급은 1번만 한다.
+        """
+        if not self.is_expired():
+            return True
+        return self.single_flight.do("access_token", self.issue_access_token)
+
+    def issue_access_token(self) -> bool:
+        """
+        Name:접근토큰발급 요청
         """
         path = "/oauth2/tokenP"
-        url = f"{self.base_url}{path}"
 
         headers = {"content-type": "application/json"}
         data = {
@@ -184,12 +832,14 @@ class KisApi:
         if self.is_expired():
 
             # 토큰 발급
-            resp = requests.post(url, headers=headers, data=json.dumps(data))
+            # 토큰 발급은 1분당 1회 제한이 있어 재시도 하지 않는다.
+            resp = self.send_request("POST", path, headers=headers, data=json.dumps(data), idempotent=False)
             resp_status_code = resp.status_code
             if resp_status_code == 200: # 토큰 정상발급
                 # 토큰 추출
-                resp_access_token = resp.json()["access_token"]
-                self.access_token_token_expired = resp.json()["access_token_token_expired"]
+                resp_json = self.get_json(resp)
+                resp_access_token = resp_json["access_token"]
+                self.access_token_token_expired = resp_json["access_token_token_expired"]
                 self.access_token = resp_access_token
                 # header에 지정할 때 Bearer를 추가 해야 하는데 여기서 한다.
                 # Bearer를 추가하는 경우는 authorization
@@ -219,7 +869,7 @@ class KisApi:
                 return True
             
             # 2025-05-20 14:10:40 한국시간이 기준이다.
-            now_dt = datetime.now(ZoneInfo("Asia/Seoul"))
+            now_dt = self.clock.now()
             exp_dt = datetime.strptime(self.access_token_token_expired, '%Y-%m-%d %H:%M:%S')
             exp_dt = exp_dt.replace(tzinfo=ZoneInfo("Asia/Seoul"))
             return now_dt > exp_dt
@@ -243,7 +893,6 @@ class KisApi:
             dict: 
         """
         path = "/uapi/domestic-stock/v1/trading/inquire-balance"
-        url = f"{self.base_url}{path}"
         headers = {
            "content-type": "application/json",
            "authorization": self.authorization,
@@ -265,8 +914,8 @@ class KisApi:
             'CTX_AREA_NK100': ctx_area_nk100
         }
 
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
         # tr_cont 연속 거래 여부
         # F or M : 다음 데이터 있음
         # D or E : 마지막 데이터
@@ -276,9 +925,19 @@ class KisApi:
     def get_domestic_balance_all(self) -> dict:
         """
         Name:주식잔고조회
+        동시에 들어온 요청은 1번만 조회하고 결과를 함께 사용한다.
 
         Args:
 
+        Returns:
+            dict: response data
+        """
+        return self.single_flight.do("domestic_balance_all", self.request_domestic_balance_all)
+
+    def request_domestic_balance_all(self) -> dict:
+        """
+        Name:주식잔고조회 요청 (연속 조회)
+
         Returns:
             dict: response data
         """
@@ -333,12 +992,21 @@ class KisApi:
         가능 하면 하루에 한번만 요청
         모의투자 미지원
         default today YYYYMMDD
+        동시에 들어온 같은 요청은 1번만 조회하고 결과를 함께 사용한다.
         Args:
             ctx_area_fk (str): 공란
         """
+        if base_dt is None:
+            base_dt = self.clock.now().strftime("%Y%m%d")   # 시작일자 값이 없으면 현재일자
+        key = ("domestic_chk_holiday", base_dt, ctx_area_fk, ctx_area_nk)
+        return self.single_flight.do(key, self.request_domestic_chk_holiday, base_dt, ctx_area_fk, ctx_area_nk)
+
+    def request_domestic_chk_holiday(self, base_dt: str, ctx_area_fk: str = "", ctx_area_nk: str = ""):
+        """
+        Name:국내휴장일조회 요청
+        """
         print("get_domestic_chk_holiday")
         path = "/uapi/domestic-stock/v1/quotations/chk-holiday"
-        url = f"{self.base_url}{path}"
         headers = {
            "content-type": "application/json",
            "authorization": self.authorization,
@@ -347,17 +1015,14 @@ class KisApi:
            "tr_id": "CTCA0903R"
         }
 
-        if base_dt is None:
-            base_dt = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")   # 시작일자 값이 없으면 현재일자
-        
         params = {
             'BASS_DT': base_dt,
             "CTX_AREA_FK": ctx_area_fk,  # 공란
             "CTX_AREA_NK": ctx_area_nk  # 공란
         }
 
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
         self.business_date_data = data
         
         with open(self.json_business_date_path, "w", encoding="utf-8") as f:
@@ -371,7 +1036,7 @@ class KisApi:
         """
         try:
             # 오늘 날짜 (Asia/Seoul 기준) yyyyMMdd 형식으로 구함
-            today_str = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
+            today_str = self.clock.now().strftime("%Y%m%d")
             print(f"오늘은 : {today_str} : get_today_opnd_yn")
 
             # output 리스트를 순회하면서 오늘 날짜에 해당하는 데이터 찾기
@@ -448,7 +1113,6 @@ class KisApi:
             symbol (str): 종목코드
         """
         path = "/uapi/domestic-stock/v1/trading/inquire-psbl-sell"
-        url = f"{self.base_url}{path}"
         headers = {
            "content-type": "application/json",
            "authorization": self.authorization,
@@ -462,8 +1126,8 @@ class KisApi:
             'PDNO': symbol
         }
 
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
         # ord_psbl_qty 에서 확인 가능
 
         return data
@@ -485,7 +1149,6 @@ class KisApi:
             dict: 
         """
         path = "/uapi/domestic-stock/v1/trading/order-cash"
-        url = f"{self.base_url}{path}"
 
         # 매수 : TTTC0012U (구버전 TTTC0802U)
         # 매도 : TTTC0011U (구버전 TTTC0801U)
@@ -512,8 +1175,9 @@ class KisApi:
            "custtype": "P",
            "hashkey": hashkey
         }
-        resp = requests.post(url, headers=headers, data=json.dumps(data))
-        return resp.json()
+        # 주문은 재시도 하지 않는다. (중복 주문 방지)
+        resp = self.send_request("POST", path, headers=headers, data=json.dumps(data), idempotent=False)
+        return self.get_json(resp)
 
     def set_market_price_buy_order(self, symbol: str, quantity: int) -> dict:
         """
@@ -632,19 +1296,19 @@ class KisApi:
             이전 조회 Output CTX_AREA_FK100 값 : 다음페이지 조회시(2번째부터)
         """
         path = "/uapi/domestic-stock/v1/trading/inquire-daily-ccld"
-        url = f"{self.base_url}{path}"
         headers = {
            "content-type": "application/json",
            "authorization": self.authorization,
            "appKey": self.app_key,
            "appSecret": self.app_secret,
-           "tr_id": "TTTC0081R" # 01:3개월 이내 국내주식체결내역
+           "tr_id": "TTTC0081R", # 01:3개월 이내 국내주식체결내역
+           "tr_cont": "N" if ctx_area_nk100.strip() else ""  # 연속 조회는 N
         }
 
         if inqr_strt_dt is None:
-            inqr_strt_dt = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d") # 시작일자 값이 없으면 현재일자
+            inqr_strt_dt = self.clock.now().strftime("%Y%m%d") # 시작일자 값이 없으면 현재일자
         if inqr_end_dt is None:
-            inqr_end_dt  = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d") # 종료일자 값이 없으면 현재일자
+            inqr_end_dt  = self.clock.now().strftime("%Y%m%d") # 종료일자 값이 없으면 현재일자
 
         params = {
             'CANO': self.account_no_prefix,
@@ -663,71 +1327,2651 @@ class KisApi:
             "CTX_AREA_NK100": ctx_area_nk100        # 공란 : 최초 조회시 이전 조회 Output CTX_AREA_NK100 값 : 다음페이지 조회시(2번째부터)
         }
 
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        # tr_cont 연속 거래 여부 F or M : 다음 데이터 있음, D or E : 마지막 데이터
+        data['tr_cont'] = res.headers.get('tr_cont', 'D')
         return data
-    
-class Utill:
-    '''
-    utill 클래스
-    기타 보조 도구 클래스
-    '''
-    def __init__(self):
-        pass
 
-    def print_balance(jsonOrDict):
-        try:
+    def get_domestic_daily_ccld_all(self, inqr_strt_dt: str, inqr_end_dt: str) -> list:
+        """
+        Name:주식일별주문체결조회 (연속 조회)
+        1회 최대 100건, 기간 전체를 조회한다.
+        Returns:
+            list: output1 전체
+        """
+        data = self.get_domestic_daily_ccld(inqr_strt_dt, inqr_end_dt)
+        output1 = list(data.get("output1") or [])
+        while data.get('tr_cont') in ('F', 'M') and (data.get("ctx_area_nk100") or "").strip():
+            data = self.get_domestic_daily_ccld(inqr_strt_dt, inqr_end_dt,
+                                                data["ctx_area_fk100"], data["ctx_area_nk100"])
+            output1.extend(data.get("output1") or [])
+        return output1
 
-            # JSON 형식의 문자열인지 확인
-            if isinstance(jsonOrDict, str):
-                parsed = json.loads(jsonOrDict)
-            # 딕셔너리인지 확인
-            elif isinstance(jsonOrDict, dict):
-                parsed = jsonOrDict
-            else:
-                raise TypeError("Input must be a JSON string or a dictionary.")
-            
-            for item in parsed["output1"]:
-                print(f"{'종목번호'.ljust(10, chr(12288))}: {item['pdno']}")
-                print(f"{'종목명'.ljust(10, chr(12288))}: {item['prdt_name']}")
-                print(f"{'보유수량'.ljust(10, chr(12288))}: {int(item['hldg_qty']):,}")
-                print(f"{'매입평균가격'.ljust(10, chr(12288))}: {float(item['pchs_avg_pric']):,.2f}")
-                print(f"{'매입금액'.ljust(10, chr(12288))}: {int(item['pchs_amt']):,}")
-                print(f"{'현재가'.ljust(10, chr(12288))}: {int(item['prpr']):,}")
-                print(f"{'평가금액'.ljust(10, chr(12288))}: {int(item['evlu_amt']):,}")
-                print(f"{'평가손익금액'.ljust(10, chr(12288))}: {int(item['evlu_pfls_amt']):,}")
-                print(f"{'평가손익율'.ljust(10, chr(12288))}: {item['evlu_pfls_rt']}")
-                print("----------------")
-            print(" ")
-            for item in parsed["output2"]:
-                print(f"{'D+2 예수금'.ljust(12, chr(12288))}: {int(item['prvs_rcdl_excc_amt']):,}")
-                print(f"{'총평가금액'.ljust(10, chr(12288))}: {int(item['tot_evlu_amt']):,}")
-                print(f"{'매입금액합계금액'.ljust(10, chr(12288))}: {int(item['pchs_amt_smtl_amt']):,}")
-                print(f"{'평가금액합계금액'.ljust(10, chr(12288))}: {int(item['evlu_amt_smtl_amt']):,}")
-                print(f"{'평가손익합계금액'.ljust(10, chr(12288))}: {int(item['evlu_pfls_smtl_amt']):,}")
+    # [해외주식] 주문/계좌
+    # {
+    #     "ctx_area_fk200": "",
+    #     "ctx_area_nk200": "",
+    #     "output1": [
+    #         {
+    #             "ovrs_pdno": "VOO",
+    #             "ovrs_item_name": "뱅가드 S&P500 ETF",
+    #             "ovrs_cblc_qty": "2",
+    #             "ord_psbl_qty": "2",
+    #             "pchs_avg_pric": "520.1200",
+    #             "now_pric2": "530.250000",
+    #             "evlu_pfls_rt": "1.94",
+    #             "ovrs_stck_evlu_amt": "1060.50",
+    #             "frcr_evlu_pfls_amt": "20.26",
+    #             "ovrs_excg_cd": "AMEX",
+    #              ........
+    #         }
+    #     ],
+    #     "output2": { "frcr_pchs_amt1": "1040.24", "tot_evlu_pfls_amt": "20.26", ........ },
+    #     "rt_cd": "0",
+    #     "msg_cd": "KIOK0510",
+    #     "msg1": "조회가 완료되었습니다"
+    # }
+    def get_overseas_balance(self, exchange: str = "NASD", currency: str = "USD",
+                             ctx_area_fk200: str = "", ctx_area_nk200: str = "") -> dict:
+        """
+        Name:해외주식 잔고
+        Args:
+            exchange (str): NASD(미국 전체), NYSE, AMEX
+            currency (str): USD
+            ctx_area_fk200 (str): 연속조회검색조건200
+            ctx_area_nk200 (str): 연속조회키200
+        """
+        path = "/uapi/overseas-stock/v1/trading/inquire-balance"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "TTTS3012R",
+           "tr_cont": "N" if ctx_area_nk200 else ""
+        }
+        params = {
+            "CANO": self.account_no_prefix,
+            "ACNT_PRDT_CD": self.account_no_postfix,
+            "OVRS_EXCG_CD": exchange,
+            "TR_CRCY_CD": currency,
+            "CTX_AREA_FK200": ctx_area_fk200,
+            "CTX_AREA_NK200": ctx_area_nk200
+        }
 
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        data['tr_cont'] = res.headers.get('tr_cont', 'D')
+        return data
 
-        except json.JSONDecodeError as e:
-            print(f"Invalid JSON: {e}")
-        except TypeError as e:
-            print(f"TypeError: {e}")
-        except Exception as e:
-            print(f"An error occurred: {e}")
+    def get_overseas_balance_all(self, exchange: str = "NASD") -> dict:
+        """
+        Name:해외주식 잔고 (연속 조회)
+        동시에 들어온 요청은 1번만 조회하고 결과를 함께 사용한다.
+        """
+        return self.single_flight.do(("overseas_balance_all", exchange), self.request_overseas_balance_all, exchange)
 
+    def request_overseas_balance_all(self, exchange: str) -> dict:
+        data = self.get_overseas_balance(exchange)
+        output = {"output1": list(data.get("output1", [])), "output2": data.get("output2", {})}
+        while data['tr_cont'] in ('F', 'M'):
+            data = self.get_overseas_balance(exchange, ctx_area_fk200=data['ctx_area_fk200'],
+                                             ctx_area_nk200=data['ctx_area_nk200'])
+            output["output1"].extend(data.get("output1", []))
+        return output
 
-class UsaTray:
-    '''
-    main 클래스
-    유저 인터페이스: 시스템 트레이
-    매매 자동화
-    매매 판단 알고리즘
+    def get_overseas_ccnl(self, start_dt: str, end_dt: str, side: str = "00") -> dict:
+        """
+        Name:해외주식 주문체결내역
+        Args:
+            start_dt (str): 주문시작일자 YYYYMMDD (한국 날짜)
+            end_dt (str): 주문종료일자 YYYYMMDD (한국 날짜)
+            side (str): 00:전체, 01:매도, 02:매수
+        """
+        path = "/uapi/overseas-stock/v1/trading/inquire-ccnl"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "TTTS3035R"
+        }
+        params = {
+            "CANO": self.account_no_prefix,
+            "ACNT_PRDT_CD": self.account_no_postfix,
+            "PDNO": "%",                # 전종목
+            "ORD_STRT_DT": start_dt,
+            "ORD_END_DT": end_dt,
+            "SLL_BUY_DVSN": side,
+            "CCLD_NCCS_DVSN": "00",     # 00:전체, 01:체결, 02:미체결
+            "OVRS_EXCG_CD": "%",        # 전체
+            "SORT_SQN": "DS",           # DS:정순
+            "ORD_DT": "",
+            "ORD_GNO_BRNO": "",
+            "ODNO": "",
+            "CTX_AREA_NK200": "",
+            "CTX_AREA_FK200": ""
+        }
+
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        return data
+
+    def set_overseas_order(self, side: str, symbol: str, price: float, quantity: int, exchange: str = "NASD") -> dict:
+        """
+        Name:해외주식 주문 (미국, 지정가)
+        미국 주식은 시장가 주문이 없어 지정가(ORD_DVSN 00)로 주문한다.
+        Args:
+            side (str): 매수 "buy" 또는 매도(else)
+            symbol (str): 종목코드 (VOO)
+            price (float): 1주당 가격 (USD)
+            quantity (int): 수량
+            exchange (str): NASD, NYSE, AMEX
+        """
+        path = "/uapi/overseas-stock/v1/trading/order"
+
+        # 매수 : TTTT1002U, 매도 : TTTT1006U
+        tr_id = "TTTT1002U" if side == "buy" else "TTTT1006U"
+
+        data = {
+            "CANO": self.account_no_prefix,
+            "ACNT_PRDT_CD": self.account_no_postfix,
+            "OVRS_EXCG_CD": exchange,
+            "PDNO": symbol,
+            "ORD_QTY": str(quantity),
+            "OVRS_ORD_UNPR": f"{price:.2f}",
+            "ORD_SVR_DVSN_CD": "0",
+            "ORD_DVSN": "00"
+        }
+        hashkey = self.get_hashkey(data)
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": tr_id,
+           "custtype": "P",
+           "hashkey": hashkey
+        }
+        # 주문은 재시도 하지 않는다. (중복 주문 방지)
+        resp = self.send_request("POST", path, headers=headers, data=json.dumps(data), idempotent=False)
+        return self.get_json(resp)
+
+    # [해외주식] 기본시세
+    # {
+    #     "output": { "rsym": "DAMSVOO", "zdiv": "4", "base": "528.1000", "last": "530.2500", "tvol": "3512345", ........ },
+    #     "rt_cd": "0",
+    #     "msg_cd": "MCA00000",
+    #     "msg1": "정상처리 되었습니다."
+    # }
+    def get_overseas_price(self, symbol: str, exchange: str = "NASD") -> dict:
+        """
+        Name:해외주식 현재체결가
+        Args:
+            symbol (str): 종목코드
+            exchange (str): 주문 거래소 코드 NASD, NYSE, AMEX (시세 코드로 바꿔서 요청)
+        """
+        path = "/uapi/overseas-price/v1/quotations/price"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "HHDFS00000300"
+        }
+        params = {
+            "AUTH": "",
+            "EXCD": US_QUOTE_EXCHANGES.get(exchange, exchange),
+            "SYMB": symbol
+        }
+
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        return data
+
+    # [국내주식] 기본시세
+    # {
+    #     "output": { "stck_prpr": "22145", "prdy_vrss": "45", "prdy_ctrt": "0.20", ........ },
+    #     "rt_cd": "0",
+    #     "msg_cd": "MCA00000",
+    #     "msg1": "정상처리 되었습니다."
+    # }
+    def get_domestic_price(self, symbol: str) -> dict:
+        """
+        Name:주식현재가 시세
+        Args:
+            symbol (str): 종목코드
+        """
+        path = "/uapi/domestic-stock/v1/quotations/inquire-price"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "FHKST01010100"
+        }
+        params = {
+            "FID_COND_MRKT_DIV_CODE": "J",          # J:주식,ETF,ETN
+            "FID_INPUT_ISCD": symbol
+        }
+
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        return data
+
+    def get_domestic_multi_price(self, symbols: list) -> dict:
+        """
+        Name:관심종목(멀티종목) 시세조회
+        1회 최대 MULTI_PRICE_MAX_SYMBOLS 종목
+        Args:
+            symbols (list): 종목코드 목록
+        Returns:
+            dict: output [{"inter_shrn_iscd": 종목코드, "inter2_prpr": 현재가, ...}]
+        """
+        path = "/uapi/domestic-stock/v1/quotations/intstock-multprice"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "FHKST11300006"
+        }
+        params = {}
+        for i, symbol in enumerate(symbols[:MULTI_PRICE_MAX_SYMBOLS], start=1):
+            params[f"FID_COND_MRKT_DIV_CODE_{i}"] = "J"
+            params[f"FID_INPUT_ISCD_{i}"] = symbol
+
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        return data
+
+    # {
+    #     "output1": {
+    #         "aspr_acpt_hour": "100000",
+    #         "askp1": "22150", ........ "askp10": "22195",
+    #         "bidp1": "22145", ........ "bidp10": "22100",
+    #         "askp_rsqn1": "1532", ........ "askp_rsqn10": "210",
+    #         "bidp_rsqn1": "2310", ........ "bidp_rsqn10": "150",
+    #         "total_askp_rsqn": "25012",
+    #         "total_bidp_rsqn": "30100",
+    #          ........
+    #     },
+    #     "output2": { "stck_prpr": "22145", ........ },
+    #     "rt_cd": "0",
+    #     "msg_cd": "MCA00000",
+    #     "msg1": "정상처리 되었습니다."
+    # }
+    def get_domestic_asking_price(self, symbol: str) -> dict:
+        """
+        Name:주식현재가 호가/예상체결
+        매도/매수 10단계 호가와 잔량
+        Args:
+            symbol (str): 종목코드
+        """
+        path = "/uapi/domestic-stock/v1/quotations/inquire-asking-price-exp-ccn"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "FHKST01010200"
+        }
+        params = {
+            "FID_COND_MRKT_DIV_CODE": "J",          # J:주식,ETF,ETN
+            "FID_INPUT_ISCD": symbol
+        }
+
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        return data
+
+    def get_websocket_approval_key(self) -> str:
+        """
+        Name:실시간 (웹소켓) 접속키 발급
+        Returns:
+            str: approval_key
+        """
+        path = "/oauth2/Approval"
+        headers = {"content-type": "application/json"}
+        data = {
+            "grant_type": "client_credentials",
+            "appkey": self.app_key,
+            "secretkey": self.app_secret
+        }
+        resp = self.send_request("POST", path, headers=headers, data=json.dumps(data), idempotent=False)
+        return self.get_json(resp)["approval_key"]
+
+    # {
+    #     "output1": { "stck_prpr": "22145", "hts_kor_isnm": "TIGER 미국S&P500", ........ },
+    #     "output2": [
+    #         {
+    #             "stck_bsop_date": "20250521",
+    #             "stck_clpr": "22145",
+    #             "stck_oprc": "22100",
+    #             "stck_hgpr": "22200",
+    #             "stck_lwpr": "22050",
+    #             "acml_vol": "123456",
+    #              ........
+    #         },
+    #         ........
+    #     ],
+    #     "rt_cd": "0",
+    #     "msg_cd": "MCA00000",
+    #     "msg1": "정상처리 되었습니다."
+    # }
+    def get_domestic_daily_chart(self, symbol: str, start_dt: str, end_dt: str, period: str = "D") -> dict:
+        """
+        Name:국내주식기간별시세(일/주/월/년)
+        1회 최대 100건, 최신 날짜부터 내림차순
+        Args:
+            symbol (str): 종목코드
+            start_dt (str): 조회 시작일자 YYYYMMDD
+            end_dt (str): 조회 종료일자 YYYYMMDD
+            period (str): D:일봉, W:주봉, M:월봉, Y:년봉
+        """
+        path = "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "FHKST03010100"
+        }
+        params = {
+            "FID_COND_MRKT_DIV_CODE": "J",          # J:주식,ETF,ETN
+            "FID_INPUT_ISCD": symbol,
+            "FID_INPUT_DATE_1": start_dt,
+            "FID_INPUT_DATE_2": end_dt,
+            "FID_PERIOD_DIV_CODE": period,
+            "FID_ORG_ADJ_PRC": "0"                  # 0:수정주가, 1:원주가
+        }
+
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        return data
+
+    def get_domestic_daily_chart_all(self, symbol: str, start_dt: str, end_dt: str) -> list:
+        """
+        Name:국내주식기간별시세(일봉) 전체
+        100건씩 과거 방향으로 연속 조회 한다.
+        Args:
+            symbol (str): 종목코드
+            start_dt (str): 조회 시작일자 YYYYMMDD
+            end_dt (str): 조회 종료일자 YYYYMMDD
+        Returns:
+            list: output2 항목, 날짜 오름차순
+        """
+        rows = []
+        cur_end_dt = end_dt
+        while cur_end_dt >= start_dt:
+            data = self.get_domestic_daily_chart(symbol, start_dt, cur_end_dt)
+            output = [item for item in data.get("output2", []) if item.get("stck_bsop_date")]
+            if not output:
+                break
+            rows.extend(output)
+
+            oldest_dt = min(item["stck_bsop_date"] for item in output)
+            if len(output) < 100 or oldest_dt <= start_dt:
+                break
+            cur_end_dt = (datetime.strptime(oldest_dt, "%Y%m%d") - timedelta(days=1)).strftime("%Y%m%d")
+            self.clock.sleep(0.1)
+
+        rows.sort(key=lambda item: item["stck_bsop_date"])
+        return rows
+
+    # {
+    #     "output1": { "stck_prpr": "22145", ........ },
+    #     "output2": [
+    #         {
+    #             "stck_bsop_date": "20250521",
+    #             "stck_cntg_hour": "101500",
+    #             "stck_prpr": "22145",
+    #             "stck_oprc": "22140",
+    #             "stck_hgpr": "22150",
+    #             "stck_lwpr": "22135",
+    #             "cntg_vol": "1200",
+    #              ........
+    #         },
+    #         ........
+    #     ],
+    #     "rt_cd": "0",
+    #     ........
+    # }
+    def get_domestic_minute_chart(self, symbol: str, hour: str = "153000") -> dict:
+        """
+        Name:주식당일분봉조회
+        당일만 가능, 지정 시각 이전 30건, 최신 시각부터 내림차순
+        Args:
+            symbol (str): 종목코드
+            hour (str): 조회 기준 시각 HHMMSS
+        """
+        path = "/uapi/domestic-stock/v1/quotations/inquire-time-itemchartprice"
+        headers = {
+           "content-type": "application/json",
+           "authorization": self.authorization,
+           "appKey": self.app_key,
+           "appSecret": self.app_secret,
+           "tr_id": "FHKST03010200"
+        }
+        params = {
+            "FID_ETC_CLS_CODE": "",
+            "FID_COND_MRKT_DIV_CODE": "J",
+            "FID_INPUT_ISCD": symbol,
+            "FID_INPUT_HOUR_1": hour,
+            "FID_PW_DATA_INCU_YN": "N"              # 과거 데이터 포함 여부
+        }
+
+        res = self.send_request("GET", path, headers=headers, params=params)
+        data = self.get_json(res)
+        return data
+
+    def get_domestic_minute_chart_all(self, symbol: str, start_hour: str = "090000", end_hour: str = "153000") -> list:
+        """
+        Name:주식당일분봉조회 전체
+        30건씩 과거 방향으로 연속 조회 한다.
+        Args:
+            symbol (str): 종목코드
+            start_hour (str): 시작 시각 HHMMSS
+            end_hour (str): 종료 시각 HHMMSS
+        Returns:
+            list: output2 항목, 시각 오름차순
+        """
+        rows = []
+        cur_hour = end_hour
+        while cur_hour >= start_hour:
+            data = self.get_domestic_minute_chart(symbol, cur_hour)
+            output = [item for item in data.get("output2", []) if item.get("stck_cntg_hour")]
+            if not output:
+                break
+            rows.extend(item for item in output if item["stck_cntg_hour"] >= start_hour)
+
+            oldest_hour = min(item["stck_cntg_hour"] for item in output)
+            if len(output) < 30 or oldest_hour <= start_hour:
+                break
+            cur_hour = (datetime.strptime(oldest_hour, "%H%M%S") - timedelta(minutes=1)).strftime("%H%M%S")
+            self.clock.sleep(0.1)
+
+        # 중복 제거 후 오름차순
+        rows = list({item["stck_bsop_date"] + item["stck_cntg_hour"]: item for item in rows}.values())
+        rows.sort(key=lambda item: item["stck_bsop_date"] + item["stck_cntg_hour"])
+        return rows
+
+class BarCache:
+    '''
+    과거 시세(봉) 로컬 캐시
+    종목/봉 종류별로 컬럼마다 append-only 바이너리 파일에 저장하고 np.memmap 으로 연다.
+    읽기는 복사 없이 NumPy 배열로 바로 사용한다.
+    없는 구간만 KisApi 로 조회해서 뒤에 붙인다.
+    '''
+    def __init__(self, kis_api: KisApi, cache_dir: str = BAR_CACHE_DIR):
+        """
+        Name:생성자
+        Args:
+            kis_api (KisApi): 시세 조회용
+            cache_dir (str): 캐시 폴더 ./bars
+        """
+        self.kis_api = kis_api
+        self.cache_dir = cache_dir
+
+    def get_series_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.cache_dir, symbol, interval)
+
+    def load(self, symbol: str, interval: str = "D") -> dict:
+        """
+        Name:캐시 읽기
+        Args:
+            symbol (str): 종목코드
+            interval (str): D:일봉, M:분봉
+        Returns:
+            dict: {컬럼명: np.ndarray} 읽기 전용 memmap, ts 오름차순
+        """
+        series_dir = self.get_series_dir(symbol, interval)
+        columns = {}
+        for name, dtype in BAR_COLUMNS.items():
+            path = os.path.join(series_dir, f"{name}.bin")
+            if os.path.exists(path) and os.path.getsize(path) >= np.dtype(dtype).itemsize:
+                columns[name] = np.memmap(path, dtype=dtype, mode="r")
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+
+        # 쓰는 도중 종료된 경우 컬럼 길이가 다를 수 있다 -> 공통 길이만 사용
+        length = min(len(col) for col in columns.values())
+        return {name: col[:length] for name, col in columns.items()}
+
+    def load_many(self, symbols: list, interval: str = "D") -> dict:
+        """
+        Name:여러 종목 캐시 읽기
+        Returns:
+            dict: {종목코드: {컬럼명: np.ndarray}}
+        """
+        return {symbol: self.load(symbol, interval) for symbol in symbols}
+
+    def append(self, symbol: str, interval: str, bars: dict) -> int:
+        """
+        Name:캐시 뒤에 붙이기
+        마지막 ts 이후의 봉만 저장한다.
+        Args:
+            symbol (str): 종목코드
+            interval (str): D:일봉, M:분봉
+            bars (dict): {컬럼명: 배열} ts 오름차순
+        Returns:
+            int: 저장한 봉 개수
+        """
+        series_dir = self.get_series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+
+        cached = self.load(symbol, interval)
+        length = len(cached["ts"])
+        last_ts = int(cached["ts"][-1]) if length else -1
+        del cached
+
+        ts = np.asarray(bars["ts"], dtype=np.int64)
+        mask = ts > last_ts
+        count = int(mask.sum())
+        if count == 0:
+            return 0
+
+        for name, dtype in BAR_COLUMNS.items():
+            path = os.path.join(series_dir, f"{name}.bin")
+            with open(path, "ab") as f:
+                # 이전에 쓰다 만 부분 정리
+                f.truncate(length * np.dtype(dtype).itemsize)
+                f.write(np.asarray(bars[name], dtype=dtype)[mask].tobytes())
+        return count
+
+    def rewrite(self, symbol: str, interval: str, bars: dict):
+        """
+        Name:캐시 다시 쓰기
+        캐시 시작보다 과거 구간을 받은 경우에만 사용한다.
+        """
+        series_dir = self.get_series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        for name, dtype in BAR_COLUMNS.items():
+            path = os.path.join(series_dir, f"{name}.bin")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(np.asarray(bars[name], dtype=dtype).tobytes())
+            os.replace(tmp_path, path)
+
+    def load_meta(self, symbol: str, interval: str) -> dict:
+        path = os.path.join(self.get_series_dir(symbol, interval), "meta.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_meta(self, symbol: str, interval: str, meta: dict):
+        path = os.path.join(self.get_series_dir(symbol, interval), "meta.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    def get_daily_bars(self, symbol: str, start_dt: str, end_dt: str = None) -> dict:
+        """
+        Name:일봉 조회
+        캐시에 없는 구간만 조회해서 저장한 후 캐시에서 읽는다.
+        장 마감 전 오늘 봉은 확정되지 않았으므로 저장하지 않는다.
+        Args:
+            symbol (str): 종목코드
+            start_dt (str): 시작일자 YYYYMMDD
+            end_dt (str): 종료일자 YYYYMMDD, 없으면 오늘
+        Returns:
+            dict: {컬럼명: np.ndarray} start_dt ~ end_dt
+        """
+        now = self.kis_api.clock.now()
+        today_str = now.strftime("%Y%m%d")
+        if end_dt is None or end_dt > today_str:
+            end_dt = today_str
+        # 확정된 마지막 일자
+        if end_dt == today_str and now.time() < dtime(15, 40):
+            end_dt = (now - timedelta(days=1)).strftime("%Y%m%d")
+
+        meta = self.load_meta(symbol, "D")
+        fetched_from = meta.get("fetched_from")
+        fetched_to = meta.get("fetched_to")
+
+        if not fetched_from:
+            # 캐시 없음
+            if start_dt <= end_dt:
+                self.append(symbol, "D", self.to_bars(self.kis_api.get_domestic_daily_chart_all(symbol, start_dt, end_dt)))
+                fetched_from, fetched_to = start_dt, end_dt
+        else:
+            if end_dt > fetched_to:
+                # 뒤쪽 구간 : append
+                next_dt = (datetime.strptime(fetched_to, "%Y%m%d") + timedelta(days=1)).strftime("%Y%m%d")
+                self.append(symbol, "D", self.to_bars(self.kis_api.get_domestic_daily_chart_all(symbol, next_dt, end_dt)))
+                fetched_to = end_dt
+            if start_dt < fetched_from:
+                # 앞쪽 구간 : 합쳐서 다시 쓰기
+                prev_dt = (datetime.strptime(fetched_from, "%Y%m%d") - timedelta(days=1)).strftime("%Y%m%d")
+                older = self.to_bars(self.kis_api.get_domestic_daily_chart_all(symbol, start_dt, prev_dt))
+                cached = self.load(symbol, "D")
+                merged = {name: np.concatenate([older[name], np.array(cached[name])]) for name in BAR_COLUMNS}
+                del cached
+                self.rewrite(symbol, "D", merged)
+                fetched_from = start_dt
+
+        if fetched_from:
+            self.save_meta(symbol, "D", {"fetched_from": fetched_from, "fetched_to": fetched_to})
+
+        bars = self.load(symbol, "D")
+        ts = bars["ts"]
+        lo = np.searchsorted(ts, int(start_dt), side="left")
+        hi = np.searchsorted(ts, int(end_dt), side="right")
+        return {name: col[lo:hi] for name, col in bars.items()}
+
+    def get_minute_bars(self, symbol: str) -> dict:
+        """
+        Name:당일 분봉 조회
+        캐시의 마지막 분봉 이후만 조회해서 저장한 후 캐시에서 읽는다.
+        진행 중인 현재 분의 봉은 저장하지 않는다.
+        Args:
+            symbol (str): 종목코드
+        Returns:
+            dict: {컬럼명: np.ndarray} 오늘 분봉
+        """
+        now = self.kis_api.clock.now()
+        today_str = now.strftime("%Y%m%d")
+        current_minute = int(now.strftime("%Y%m%d%H%M00"))
+
+        cached = self.load(symbol, "M")
+        last_ts = int(cached["ts"][-1]) if len(cached["ts"]) else 0
+        del cached
+
+        start_hour = "090000"
+        if last_ts // 1000000 == int(today_str):
+            last_dt = datetime.strptime(str(last_ts), "%Y%m%d%H%M%S") + timedelta(minutes=1)
+            start_hour = last_dt.strftime("%H%M%S")
+        end_hour = min(now.strftime("%H%M%S"), "153000")
+
+        if start_hour <= end_hour:
+            bars = self.to_bars(self.kis_api.get_domestic_minute_chart_all(symbol, start_hour, end_hour))
+            done = bars["ts"] < current_minute
+            self.append(symbol, "M", {name: col[done] for name, col in bars.items()})
+
+        bars = self.load(symbol, "M")
+        lo = np.searchsorted(bars["ts"], int(today_str) * 1000000, side="left")
+        return {name: col[lo:] for name, col in bars.items()}
+
+    def to_bars(self, rows: list) -> dict:
+        """
+        Name:조회 결과 -> 컬럼 배열
+        일봉(stck_bsop_date), 분봉(stck_bsop_date + stck_cntg_hour) 모두 처리
+        """
+        ts = []
+        for item in rows:
+            if item.get("stck_cntg_hour"):
+                ts.append(int(item["stck_bsop_date"] + item["stck_cntg_hour"]))
+            else:
+                ts.append(int(item["stck_bsop_date"]))
+        return {
+            "ts": np.array(ts, dtype=np.int64),
+            "open": np.array([item.get("stck_oprc", 0) for item in rows], dtype=np.float64),
+            "high": np.array([item.get("stck_hgpr", 0) for item in rows], dtype=np.float64),
+            "low": np.array([item.get("stck_lwpr", 0) for item in rows], dtype=np.float64),
+            "close": np.array([item.get("stck_clpr") or item.get("stck_prpr", 0) for item in rows], dtype=np.float64),
+            "volume": np.array([item.get("acml_vol") or item.get("cntg_vol", 0) for item in rows], dtype=np.int64),
+        }
+
+class PriceFeed:
+    '''
+    기록된 시세
+    모의 매매에서 가상 시각의 현재가를 제공한다.
+    ts 는 YYYYMMDDHHMMSS 정수
+    '''
+    def __init__(self, series: dict, names: dict = None):
+        """
+        Name:생성자
+        Args:
+            series (dict): {종목코드: (ts np.ndarray, price np.ndarray)} ts 오름차순
+            names (dict): {종목코드: 종목명}
+        """
+        self.series = series
+        self.names = names or {}
+        self.dates = None
+
+    @staticmethod
+    def from_json(path: str) -> "PriceFeed":
+        """
+        Name:json 기록에서 생성
+        {"360750": [["20250521090000", 22100], ...], ...}
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        series = {}
+        for symbol, rows in data.items():
+            rows = sorted(rows, key=lambda row: int(row[0]))
+            series[symbol] = (np.array([int(row[0]) for row in rows], dtype=np.int64),
+                              np.array([float(row[1]) for row in rows], dtype=np.float64))
+        return PriceFeed(series)
+
+    @staticmethod
+    def from_bar_cache(bar_cache: BarCache, symbols: list, interval: str = "M") -> "PriceFeed":
+        """
+        Name:봉 캐시에서 생성
+        분봉은 종가를 그대로, 일봉은 09:00 시가 / 15:30 종가 2개로 사용한다.
+        """
+        series = {}
+        for symbol in symbols:
+            bars = bar_cache.load(symbol, interval)
+            if interval == "D":
+                ts = np.column_stack([bars["ts"] * 1000000 + 90000, bars["ts"] * 1000000 + 153000]).ravel()
+                price = np.column_stack([bars["open"], bars["close"]]).ravel()
+            else:
+                ts = np.asarray(bars["ts"])
+                price = np.asarray(bars["close"])
+            series[symbol] = (ts, price)
+        return PriceFeed(series)
+
+    def price_at(self, symbol: str, now: datetime) -> float | None:
+        # now 이전 마지막 가격
+        if symbol not in self.series:
+            return None
+        ts, price = self.series[symbol]
+        i = np.searchsorted(ts, int(now.strftime("%Y%m%d%H%M%S")), side="right") - 1
+        if i < 0:
+            return None
+        return float(price[i])
+
+    def trading_dates(self) -> set:
+        # 시세가 있는 날 = 개장일
+        if self.dates is None:
+            dates = set()
+            for ts, _ in self.series.values():
+                dates.update(str(d) for d in np.unique(ts // 1000000))
+            self.dates = dates
+        return self.dates
+
+class PaperKisApi(KisApi):
+    '''
+    모의 브로커
+    KisApi 와 같은 응답 형식으로 가상 계좌의 잔고, 체결, 주문을 처리한다.
+    시장가 주문은 PriceFeed 의 현재가로 즉시 체결한다.
+    파일(token.json, businesdate.json)과 네트워크를 사용하지 않는다.
+    '''
+    def __init__(self, feed: PriceFeed, clock: Clock, initial_cash: int = 10000000, positions: dict = None):
+        """
+        Name:생성자
+        Args:
+            feed (PriceFeed): 시세
+            clock (Clock): 시계 (VirtualClock)
+            initial_cash (int): 예수금
+            positions (dict): 초기 보유 {종목코드: (수량, 매입평균가)}
+        """
+        self.feed = feed
+        self.cash = float(initial_cash)
+        self.positions = {symbol: [int(qty), float(avg)] for symbol, (qty, avg) in (positions or {}).items()}
+        self.orders = []
+        super().__init__(app_key="paper", app_secret="paper", account_no="00000000-01", clock=clock)
+
+    def load_json_token(self):
+        pass
+
+    def load_json_business_date(self):
+        self.business_date_data = None
+
+    def get_access_token(self) -> bool:
+        self.access_token = "paper"
+        self.authorization = "Bearer paper"
+        return True
+
+    def get_hashkey(self, data: dict):
+        return "paper"
+
+    def get_domestic_balance(self, ctx_area_fk100: str = "", ctx_area_nk100: str = "") -> dict:
+        self.count_request()
+        now = self.clock.now()
+        output1 = []
+        pchs_total = 0.0
+        evlu_total = 0.0
+        for symbol, (qty, avg) in self.positions.items():
+            price = self.feed.price_at(symbol, now) or avg
+            pchs_amt = qty * avg
+            evlu_amt = qty * price
+            pchs_total += pchs_amt
+            evlu_total += evlu_amt
+            output1.append({
+                "pdno": symbol,
+                "prdt_name": self.feed.names.get(symbol, symbol),
+                "hldg_qty": str(qty),
+                "ord_psbl_qty": str(qty),
+                "pchs_avg_pric": f"{avg:.4f}",
+                "pchs_amt": str(int(pchs_amt)),
+                "prpr": str(int(price)),
+                "evlu_amt": str(int(evlu_amt)),
+                "evlu_pfls_amt": str(int(evlu_amt - pchs_amt)),
+                "evlu_pfls_rt": f"{(price / avg - 1.0) * 100.0:.2f}" if avg > 0 else "0.00",
+            })
+        output2 = [{
+            "dnca_tot_amt": str(int(self.cash)),
+            "prvs_rcdl_excc_amt": str(int(self.cash)),
+            "tot_evlu_amt": str(int(self.cash + evlu_total)),
+            "pchs_amt_smtl_amt": str(int(pchs_total)),
+            "evlu_amt_smtl_amt": str(int(evlu_total)),
+            "evlu_pfls_smtl_amt": str(int(evlu_total - pchs_total)),
+        }]
+        return {"ctx_area_fk100": "", "ctx_area_nk100": "", "output1": output1, "output2": output2,
+                "rt_cd": "0", "msg_cd": "KIOK0510", "msg1": "조회가 완료되었습니다", "tr_cont": "D"}
+
+    def get_domestic_chk_holiday(self, base_dt=None, ctx_area_fk: str = "", ctx_area_nk: str = ""):
+        self.count_request()
+        if base_dt is None:
+            base_dt = self.clock.now().strftime("%Y%m%d")
+        trading_dates = self.feed.trading_dates()
+        start = datetime.strptime(base_dt, "%Y%m%d")
+        output = []
+        for i in range(24):
+            day = start + timedelta(days=i)
+            day_str = day.strftime("%Y%m%d")
+            opnd_yn = "Y" if day_str in trading_dates else "N"
+            output.append({
+                "bass_dt": day_str,
+                "wday_dvsn_cd": f"{(day.isoweekday() % 7) + 1:02d}",
+                "bzdy_yn": "Y" if day.weekday() < 5 else "N",
+                "tr_day_yn": "Y",
+                "opnd_yn": opnd_yn,
+                "sttl_day_yn": opnd_yn,
+            })
+        data = {"ctx_area_nk": "", "ctx_area_fk": "", "output": output, "rt_cd": "0", "msg_cd": "KIOK0500", "msg1": ""}
+        self.business_date_data = data
+        return data
+
+    def get_domestic_price(self, symbol: str) -> dict:
+        self.count_request()
+        price = self.feed.price_at(symbol, self.clock.now())
+        if price is None:
+            return {"output": {}, "rt_cd": "1", "msg_cd": "PAPER", "msg1": "시세 없음"}
+        return {"output": {"stck_prpr": str(int(price))}, "rt_cd": "0", "msg_cd": "MCA00000", "msg1": "정상처리 되었습니다."}
+
+    def get_domestic_multi_price(self, symbols: list) -> dict:
+        self.count_request()
+        output = []
+        for symbol in symbols[:MULTI_PRICE_MAX_SYMBOLS]:
+            price = self.feed.price_at(symbol, self.clock.now())
+            if price is not None:
+                output.append({"inter_shrn_iscd": symbol, "inter2_prpr": str(int(price))})
+        return {"output": output, "rt_cd": "0", "msg_cd": "MCA00000", "msg1": "정상처리 되었습니다."}
+
+    def get_domestic_daily_chart_all(self, symbol: str, start_dt: str, end_dt: str) -> list:
+        # 시세 기록을 날짜별로 묶은 일봉 (거래량 없음), 날짜 오름차순
+        self.count_request()
+        if symbol not in self.feed.series:
+            return []
+        ts, price = self.feed.series[symbol]
+        dates = ts // 1000000
+        rows = []
+        for date in np.unique(dates[(dates >= int(start_dt)) & (dates <= int(end_dt))]):
+            day = price[dates == date]
+            rows.append({"stck_bsop_date": str(date), "stck_oprc": str(day[0]), "stck_hgpr": str(day.max()),
+                         "stck_lwpr": str(day.min()), "stck_clpr": str(day[-1]), "acml_vol": "0"})
+        return rows
+
+    def get_domestic_asking_price(self, symbol: str) -> dict:
+        # 현재가 기준 1원 간격, 단계마다 같은 잔량의 가상 호가
+        self.count_request()
+        price = self.feed.price_at(symbol, self.clock.now())
+        if price is None:
+            return {"output1": {}, "rt_cd": "1", "msg_cd": "PAPER", "msg1": "시세 없음"}
+        output1 = {"aspr_acpt_hour": self.clock.now().strftime("%H%M%S")}
+        for level in range(1, ORDER_BOOK_DEPTH + 1):
+            output1[f"askp{level}"] = str(int(price) + level)
+            output1[f"bidp{level}"] = str(int(price) - level + 1)
+            output1[f"askp_rsqn{level}"] = "1000"
+            output1[f"bidp_rsqn{level}"] = "1000"
+        return {"output1": output1, "rt_cd": "0", "msg_cd": "MCA00000", "msg1": "정상처리 되었습니다."}
+
+    def get_domestic_psbl_sell(self, symbol: str):
+        self.count_request()
+        qty = self.positions.get(symbol, [0, 0.0])[0]
+        return {"output": {"pdno": symbol, "ord_psbl_qty": str(qty), "cblc_qty": str(qty)},
+                "rt_cd": "0", "msg_cd": "KIOK0420", "msg1": "정상적으로 조회되었습니다"}
+
+    def set_domestic_order_cash(self, side: str, symbol: str, price: int,
+                     quantity: int, order_type: str) -> dict:
+        self.count_request()
+        now = self.clock.now()
+        market_price = self.feed.price_at(symbol, now)
+        if market_price is None:
+            return {"rt_cd": "1", "msg_cd": "PAPER001", "msg1": "시세가 없습니다", "output": {}}
+
+        # 시장가는 현재가, 지정가는 유리한 경우에만 지정가로 체결
+        fill_price = market_price if order_type == "01" else float(price)
+        if order_type != "01":
+            marketable = market_price <= fill_price if side == "buy" else market_price >= fill_price
+        else:
+            marketable = True
+
+        qty, avg = self.positions.get(symbol, [0, 0.0])
+        if side == "buy" and marketable and fill_price * quantity > self.cash:
+            return {"rt_cd": "1", "msg_cd": "APBK0952", "msg1": "주문가능금액을 초과 했습니다", "output": {}}
+        if side != "buy" and quantity > qty:
+            return {"rt_cd": "1", "msg_cd": "APBK0400", "msg1": "주문 가능한 수량을 초과하였습니다", "output": {}}
+
+        ccld_qty = quantity if marketable else 0
+        if ccld_qty:
+            if side == "buy":
+                self.cash -= fill_price * ccld_qty
+                new_qty = qty + ccld_qty
+                self.positions[symbol] = [new_qty, (qty * avg + ccld_qty * fill_price) / new_qty]
+            else:
+                self.cash += fill_price * ccld_qty
+                if qty - ccld_qty > 0:
+                    self.positions[symbol] = [qty - ccld_qty, avg]
+                else:
+                    self.positions.pop(symbol, None)
+
+        odno = f"{len(self.orders) + 1:010d}"
+        self.orders.append({
+            "ord_dt": now.strftime("%Y%m%d"),
+            "ord_tmd": now.strftime("%H%M%S"),
+            "odno": odno,
+            "sll_buy_dvsn_cd": "02" if side == "buy" else "01",
+            "sll_buy_dvsn_cd_name": "현금매수" if side == "buy" else "현금매도",
+            "pdno": symbol,
+            "prdt_name": self.feed.names.get(symbol, symbol),
+            "ord_dvsn_cd": order_type,
+            "ord_qty": str(quantity),
+            "ord_unpr": str(int(price)),
+            "avg_prvs": str(int(fill_price)) if ccld_qty else "0",
+            "tot_ccld_qty": str(ccld_qty),
+            "tot_ccld_amt": str(int(fill_price * ccld_qty)),
+            "rmn_qty": str(quantity - ccld_qty),
+        })
+        return {"rt_cd": "0", "msg_cd": "APBK0013", "msg1": "주문 전송 완료 되었습니다.",
+                "output": {"KRX_FWDG_ORD_ORGNO": "00000", "ODNO": odno, "ORD_TMD": now.strftime("%H%M%S")}}
+
+    def get_domestic_daily_ccld(self, inqr_strt_dt=None, inqr_end_dt=None, ctx_area_fk100: str = "", ctx_area_nk100: str = ""):
+        self.count_request()
+        today_str = self.clock.now().strftime("%Y%m%d")
+        inqr_strt_dt = inqr_strt_dt or today_str
+        inqr_end_dt = inqr_end_dt or today_str
+        output1 = [order for order in self.orders if inqr_strt_dt <= order["ord_dt"] <= inqr_end_dt]
+        return {"ctx_area_fk100": "", "ctx_area_nk100": "", "output1": output1, "output2": {},
+                "rt_cd": "0", "msg_cd": "KIOK0510" if output1 else "KIOK0560", "msg1": "", "tr_cont": "D"}
+
+class IndicatorEngine:
+    '''
+    실시간 지표 계산
+    종목별 고정 크기 링버퍼에 가격을 넣고 이동평균, 변동성, RSI, 고점 대비 하락률을 갱신한다.
+    가격 1개당 지표별 O(1), 모든 종목을 NumPy 로 한 번에 갱신한다.
+    지표의 시간 간격은 가격을 넣는 간격이다. 틱이나 봉을 스스로 만들지 않는다.
+    UsaTray 는 do_trading 실행(고정 10분, 적응형은 몇 초 ~ 30분)과 장 시작 전 준비마다 잔고 현재가를 넣으므로
+    지표는 실행 간격으로 샘플링한 값이다. (적응형이면 간격이 일정하지 않다)
+    '''
+    def __init__(self, symbols: list, window: int = INDICATOR_WINDOW, rsi_period: int = INDICATOR_RSI_PERIOD):
+        """
+        Name:생성자
+        Args:
+            symbols (list): 종목코드 목록
+            window (int): 이동평균, 변동성 윈도우 크기
+            rsi_period (int): RSI 기간
+        """
+        self.window = window
+        self.rsi_period = rsi_period
+        self.symbols = []
+        self.index = {}
+        self.update_count = 0
+
+        # 종목 x 윈도우 링버퍼
+        self.prices = np.full((0, window), np.nan)
+        self.returns = np.full((0, window), np.nan)
+        self.pos = np.zeros(0, dtype=np.int64)      # 다음에 쓸 위치
+        self.count = np.zeros(0, dtype=np.int64)    # 받은 가격 개수
+
+        # 누적 값
+        self.price_sum = np.zeros(0)
+        self.return_sum = np.zeros(0)
+        self.return_sq_sum = np.zeros(0)
+        self.last_price = np.full(0, np.nan)
+        self.avg_gain = np.zeros(0)
+        self.avg_loss = np.zeros(0)
+        self.peak = np.full(0, np.nan)
+
+        self.add_symbols(symbols)
+
+    def add_symbols(self, symbols: list):
+        """
+        Name:종목 추가
+        이미 있는 종목은 무시한다.
+        """
+        new_symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.index]
+        if not new_symbols:
+            return
+        n = len(new_symbols)
+        for symbol in new_symbols:
+            self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        self.prices = np.vstack([self.prices, np.full((n, self.window), np.nan)])
+        self.returns = np.vstack([self.returns, np.full((n, self.window), np.nan)])
+        self.pos = np.concatenate([self.pos, np.zeros(n, dtype=np.int64)])
+        self.count = np.concatenate([self.count, np.zeros(n, dtype=np.int64)])
+        self.price_sum = np.concatenate([self.price_sum, np.zeros(n)])
+        self.return_sum = np.concatenate([self.return_sum, np.zeros(n)])
+        self.return_sq_sum = np.concatenate([self.return_sq_sum, np.zeros(n)])
+        self.last_price = np.concatenate([self.last_price, np.full(n, np.nan)])
+        self.avg_gain = np.concatenate([self.avg_gain, np.zeros(n)])
+        self.avg_loss = np.concatenate([self.avg_loss, np.zeros(n)])
+        self.peak = np.concatenate([self.peak, np.full(n, np.nan)])
+
+    def update(self, prices: np.ndarray):
+        """
+        Name:가격 갱신
+        Args:
+            prices (np.ndarray): self.symbols 순서의 가격, 새 가격이 없는 종목은 NaN
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        rows = np.nonzero(~np.isnan(prices) & (prices > 0))[0]
+        if len(rows) == 0:
+            return
+        price = prices[rows]
+        pos = self.pos[rows]
+
+        # 이동평균 : 빠지는 값을 빼고 새 값을 더한다
+        old_price = self.prices[rows, pos]
+        self.price_sum[rows] += price - np.nan_to_num(old_price)
+        self.prices[rows, pos] = price
+
+        # 로그 수익률 (첫 가격은 수익률 없음)
+        prev = self.last_price[rows]
+        has_prev = ~np.isnan(prev)
+        ret = np.where(has_prev, np.log(price / np.where(has_prev, prev, price)), np.nan)
+        old_ret = np.nan_to_num(self.returns[rows, pos])
+        new_ret = np.nan_to_num(ret)
+        self.return_sum[rows] += new_ret - old_ret
+        self.return_sq_sum[rows] += new_ret * new_ret - old_ret * old_ret
+        self.returns[rows, pos] = ret
+
+        # RSI : Wilder 평활, 기간이 찰 때까지는 단순 평균
+        change = np.where(has_prev, price - np.where(has_prev, prev, price), 0.0)
+        gain = np.maximum(change, 0.0)
+        loss = np.maximum(-change, 0.0)
+        # 이번 변화량의 순번(count) 기준 평균 분모
+        divisor = np.maximum(np.minimum(self.count[rows], self.rsi_period), 1).astype(np.float64)
+        self.avg_gain[rows] = (self.avg_gain[rows] * (divisor - 1.0) + gain) / divisor
+        self.avg_loss[rows] = (self.avg_loss[rows] * (divisor - 1.0) + loss) / divisor
+
+        # 고점
+        self.peak[rows] = np.fmax(self.peak[rows], price)
+
+        self.last_price[rows] = price
+        self.pos[rows] = (pos + 1) % self.window
+        self.count[rows] += 1
+
+        self.update_count += 1
+        if self.update_count % INDICATOR_RESYNC_INTERVAL == 0:
+            self.resync()
+
+    def update_prices(self, price_by_symbol: dict):
+        """
+        Name:가격 갱신 (dict)
+        Args:
+            price_by_symbol (dict): {종목코드: 가격}, 처음 보는 종목은 추가한다.
+        """
+        self.add_symbols(list(price_by_symbol.keys()))
+        prices = np.full(len(self.symbols), np.nan)
+        for symbol, price in price_by_symbol.items():
+            prices[self.index[symbol]] = float(price)
+        self.update(prices)
+
+    def seed(self, closes_by_symbol: dict):
+        """
+        Name:과거 종가로 초기화
+        BarCache 의 종가 배열로 링버퍼를 채운다.
+        이후 update 로 넣을 가격과 같은 간격의 봉을 사용해야 한다. (일봉 seed 후 실행마다 update 하면 간격이 섞인다)
+        Args:
+            closes_by_symbol (dict): {종목코드: np.ndarray 종가, 시간 오름차순}
+        """
+        self.add_symbols(list(closes_by_symbol.keys()))
+        # 지표 계산에 필요한 만큼만 사용
+        depth = max(self.window, self.rsi_period) * 4
+        length = max((min(len(closes), depth) for closes in closes_by_symbol.values()), default=0)
+        matrix = np.full((length, len(self.symbols)), np.nan)
+        for symbol, closes in closes_by_symbol.items():
+            tail = np.asarray(closes[-length:], dtype=np.float64) if length else np.empty(0)
+            matrix[length - len(tail):, self.index[symbol]] = tail
+        for row in matrix:
+            self.update(row)
+
+    def resync(self):
+        # 링버퍼에서 누적 합 다시 계산
+        self.price_sum = np.nansum(self.prices, axis=1)
+        self.return_sum = np.nansum(self.returns, axis=1)
+        self.return_sq_sum = np.nansum(self.returns * self.returns, axis=1)
+
+    def sma(self) -> np.ndarray:
+        # 이동평균
+        n = np.minimum(self.count, self.window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, self.price_sum / n, np.nan)
+
+    def volatility(self) -> np.ndarray:
+        # 로그 수익률 표준편차 (표본)
+        n = np.minimum(np.maximum(self.count - 1, 0), self.window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.return_sum / n
+            var = (self.return_sq_sum - n * mean * mean) / (n - 1)
+            return np.where(n > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    def rsi(self) -> np.ndarray:
+        # 0 ~ 100, 기간이 차지 않으면 NaN
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rs = self.avg_gain / self.avg_loss
+            value = 100.0 - 100.0 / (1.0 + rs)
+        value = np.where(self.avg_loss == 0, np.where(self.avg_gain > 0, 100.0, 50.0), value)
+        return np.where(self.count > self.rsi_period, value, np.nan)
+
+    def drawdown(self) -> np.ndarray:
+        # 고점 대비 하락률 (%) 0 이하
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self.last_price / self.peak - 1.0) * 100.0
+
+    def snapshot(self) -> dict:
+        """
+        Name:지표 조회
+        Returns:
+            dict: {"symbols": list, "price", "sma", "volatility", "rsi", "drawdown": np.ndarray}
+        """
+        return {
+            "symbols": list(self.symbols),
+            "price": self.last_price.copy(),
+            "sma": self.sma(),
+            "volatility": self.volatility(),
+            "rsi": self.rsi(),
+            "drawdown": self.drawdown(),
+        }
+
+class Strategy:
+    '''
+    매매 전략 기본 클래스
+    보유 종목과 시세 전체(universe)를 배열로 받아 한 번에 매도/매수 수량을 계산한다.
+    '''
+    name = ""
+
+    # True 면 보유하지 않은 종목의 현재가(prpr)도 시세 조회로 채운 후 평가한다.
+    needs_prices = False
+
+    # 0 보다 크면 최근 history_days 영업일 일봉 종가를 universe["closes"] 로 받는다. (국내, BarCache, 하루 한 번 조회)
+    history_days = 0
+
+    def __init__(self, **params):
+        """
+        Name:생성자
+        Args:
+            params: config.json strategy.params
+        """
+        self.params = params
+        # 보유하지 않아도 universe 에 포함할 종목 (매수 대상 등)
+        self.symbols = list(params.get("symbols", []))
+
+    def evaluate(self, universe: dict) -> dict:
+        """
+        Name:전략 평가
+        Args:
+            universe (dict): Utill.build_universe 결과
+        Returns:
+            dict: {"sell_qty": np.ndarray, "buy_qty": np.ndarray} universe["symbols"] 순서의 수량
+        """
+        raise NotImplementedError
+
+    def is_due(self, universe: dict, evaluated_today: bool) -> bool:
+        """
+        Name:평가 필요 여부
+        False 면 이번 실행은 시세 조회와 평가를 하지 않는다.
+        Args:
+            universe (dict): 잔고만으로 만든 universe (보유하지 않은 종목의 현재가는 0)
+            evaluated_today (bool): 오늘 장중에 평가한 적이 있는지
+        """
+        return True
+
+    def get_order_intents(self, universe: dict) -> list:
+        """
+        Name:주문 의도 목록
+        Returns:
+            list: [{"side": "sell"|"buy", "symbol": str, "quantity": int}] 매도 먼저
+        """
+        result = self.evaluate(universe)
+        symbols = universe["symbols"]
+        intents = []
+        for side in ("sell", "buy"):
+            qty = np.asarray(result.get(f"{side}_qty", np.zeros(len(symbols))), dtype=np.int64)
+            for i in np.nonzero(qty > 0)[0]:
+                intents.append({"side": side, "symbol": str(symbols[i]), "quantity": int(qty[i])})
+        return intents
+
+    @staticmethod
+    def create(strategy_config: dict) -> "Strategy":
+        """
+        Name:전략 생성
+        Args:
+            strategy_config (dict): {"name": 이름 또는 "모듈:클래스", "params": {}}
+        """
+        strategy_config = strategy_config or {}
+        name = strategy_config.get("name") or DEFAULT_STRATEGY_NAME
+        params = strategy_config.get("params", {})
+
+        if name in STRATEGY_REGISTRY:
+            strategy_class = STRATEGY_REGISTRY[name]
+        elif ":" in name:
+            module_name, class_name = name.split(":", 1)
+            strategy_class = getattr(importlib.import_module(module_name), class_name)
+        else:
+            raise ValueError(f"알 수 없는 전략입니다. strategy.name={name}")
+
+        print(f"전략 : {name} {params}")
+        return strategy_class(**params)
+
+class TakeProfitDailyBuyStrategy(Strategy):
+    '''
+    기본 전략
+    매도 : 평가손익율이 take_profit_rt(%) 초과면 전량
+    매수 : buy_symbols 종목을 오늘 매수하지 않았으면 buy_qty 주
+    '''
+    name = "take_profit_daily_buy"
+
+    def __init__(self, take_profit_rt: float = 5.0, buy_qty: int = 1, buy_symbols: list = None, **params):
+        super().__init__(**params)
+        self.take_profit_rt = float(take_profit_rt)
+        self.buy_qty = int(buy_qty)
+        self.buy_symbols = list(buy_symbols) if buy_symbols is not None else list(SIMBOL_LIST)
+        self.symbols = list(dict.fromkeys(self.symbols + self.buy_symbols))
+
+    def evaluate(self, universe: dict) -> dict:
+        take_profit = universe["evlu_pfls_rt"] > self.take_profit_rt
+        sell_qty = np.where(universe["held"] & take_profit, universe["hldg_qty"], 0)
+
+        buy_target = np.isin(universe["symbols"], self.buy_symbols)
+        buy_qty = np.where(buy_target & ~universe["bought_today"], self.buy_qty, 0)
+        return {"sell_qty": sell_qty, "buy_qty": buy_qty}
+
+class RebalanceStrategy(Strategy):
+    '''
+    비중 재조정 전략
+    target_weights 의 목표 비중에 맞도록 정수 주(lot 단위) 매도/매수 수량을 한 번에 계산한다.
+    대상 자산 = 대상 종목 평가금액 + 예수금(prvs_rcdl_excc_amt) x (1 - cash_buffer)
+    목표 비중과 차이가 band_pct(%p) 이하인 종목은 주문하지 않는다. (잦은 소량 주문 방지)
+    매수는 예수금 + 매도 예상 금액 안에서만 하고, 부족하면 모든 매수를 같은 비율로 줄인다.
+    target_weights 에 없는 보유 종목은 건드리지 않는다.
+    daily 이면 하루 한 번 평가하고, 이후에는 보유 종목 비중이 band 를 벗어났을 때만 다시 평가한다.
+    '''
+    name = "rebalance"
+    needs_prices = True
+
+    def __init__(self, target_weights: dict = None, lot_size=1, band_pct: float = 1.0,
+                 cash_buffer: float = 0.01, daily: bool = True, **params):
+        """
+        Name:생성자
+        Args:
+            target_weights (dict): {종목코드: 비중}, 합이 1 이 아니면 1 로 맞춘다.
+            lot_size (int | dict): 주문 단위(주), 종목별로 다르면 {종목코드: 단위}
+            band_pct (float): 주문하지 않는 비중 차이 (%p)
+            cash_buffer (float): 남겨둘 예수금 비율
+            daily (bool): 하루 한 번 + band 이탈 시에만 평가 (False 면 매 실행)
+        """
+        super().__init__(**params)
+        target_weights = target_weights or {}
+        if not target_weights:
+            raise ValueError("rebalance 전략은 target_weights 가 필요합니다.")
+        self.target_symbols = list(target_weights)
+        weights = np.array([float(target_weights[symbol]) for symbol in self.target_symbols], dtype=np.float64)
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError(f"target_weights 가 잘못되었습니다. {target_weights}")
+        self.target_weights = weights / weights.sum()
+        if isinstance(lot_size, dict):
+            self.lot_sizes = {symbol: int(lot) for symbol, lot in lot_size.items()}
+            self.default_lot = 1
+        else:
+            self.lot_sizes = {}
+            self.default_lot = int(lot_size)
+        self.band = float(band_pct) / 100.0
+        self.cash_buffer = float(cash_buffer)
+        self.daily = bool(daily)
+        self.symbols = list(dict.fromkeys(self.symbols + self.target_symbols))
+
+    def get_weights(self, symbols: np.ndarray) -> tuple:
+        # 목표 비중 : universe 순서 (managed, weight)
+        index = {symbol: i for i, symbol in enumerate(self.target_symbols)}
+        target_index = np.array([index.get(str(symbol), -1) for symbol in symbols], dtype=np.int64)
+        managed = target_index >= 0
+        weight = np.where(managed, self.target_weights[np.maximum(target_index, 0)], 0.0)
+        return managed, weight
+
+    def is_due(self, universe: dict, evaluated_today: bool) -> bool:
+        if not self.daily or not evaluated_today:
+            return True
+        # 잔고 현재가만으로 보유 종목 비중 확인 (시세 조회 없음)
+        managed, weight = self.get_weights(universe["symbols"])
+        held = managed & universe["held"] & (universe["prpr"] > 0)
+        value = np.where(held, universe["hldg_qty"] * universe["prpr"], 0.0)
+        total = value.sum() + universe.get("cash", 0.0) * (1.0 - self.cash_buffer)
+        if total <= 0:
+            return False
+        return bool((np.abs(value / total - weight)[held] > self.band).any())
+
+    def evaluate(self, universe: dict) -> dict:
+        symbols = universe["symbols"]
+        n = len(symbols)
+        zeros = np.zeros(n, dtype=np.int64)
+
+        # 목표 비중, lot : universe 순서
+        managed, weight = self.get_weights(symbols)
+        lot = np.array([self.lot_sizes.get(str(symbol), self.default_lot) for symbol in symbols], dtype=np.int64)
+        lot = np.maximum(lot, 1)
+
+        price = universe["prpr"]
+        priced = managed & (price > 0)
+        qty = universe["hldg_qty"]
+        value = np.where(priced, qty * price, 0.0)
+        cash = universe.get("cash", 0.0) * (1.0 - self.cash_buffer)
+        total = value.sum() + cash
+        if total <= 0:
+            return {"sell_qty": zeros, "buy_qty": zeros}
+
+        # 목표 수량 (lot 단위 내림) 과 비중 차이
+        safe_price = np.where(priced, price, 1.0)
+        target_qty = np.floor(weight * total / safe_price / lot).astype(np.int64) * lot
+        drift = np.abs(value / total - weight)
+        active = priced & (drift > self.band)
+        diff = np.where(active, target_qty - qty, 0)
+
+        # 매도 : 주문 가능 수량 안에서 lot 단위
+        sell_qty = np.minimum(np.maximum(-diff, 0), universe["ord_psbl_qty"])
+        sell_qty = np.where(sell_qty == qty, sell_qty, sell_qty // lot * lot)
+
+        # 매수 : 예수금 + 매도 예상 금액 안에서, 부족하면 같은 비율로 줄인다.
+        buy_qty = np.maximum(diff, 0)
+        budget = cash + (sell_qty * safe_price).sum()
+        cost = (buy_qty * safe_price).sum()
+        if cost > budget:
+            scale = budget / cost if budget > 0 else 0.0
+            buy_qty = np.floor(buy_qty * scale / lot).astype(np.int64) * lot
+
+        return {"sell_qty": sell_qty.astype(np.int64), "buy_qty": buy_qty.astype(np.int64)}
+
+# 전략 이름 -> 클래스
+STRATEGY_REGISTRY = {
+    TakeProfitDailyBuyStrategy.name: TakeProfitDailyBuyStrategy,
+    RebalanceStrategy.name: RebalanceStrategy,
+}
+
+class AdaptiveScheduler:
+    '''
+    적응형 실행 주기
+    보유 종목의 익절 기준까지 남은 거리와 최근 변동성으로 다음 do_trading 까지의 시간을 정한다.
+    기준 근처면 몇 초, 멀면 수십 분, 하루 요청 예산을 넘지 않도록 최소 간격을 둔다.
+    '''
+    def __init__(self, min_sec: float = ADAPTIVE_MIN_INTERVAL_SEC, max_sec: float = ADAPTIVE_MAX_INTERVAL_SEC,
+                 daily_request_budget: int = ADAPTIVE_DAILY_REQUEST_BUDGET, z: float = ADAPTIVE_Z):
+        """
+        Name:생성자
+        Args:
+            min_sec (float): 최소 간격(초)
+            max_sec (float): 최대 간격(초)
+            daily_request_budget (int): 하루 API 요청 예산
+            z (float): 표준편차 배수
+        """
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        self.daily_request_budget = daily_request_budget
+        self.z = z
+
+        # 종목별 초당 로그수익률 분산 (EWMA)
+        session_sec = (datetime.combine(datetime.min, SESSION_END_TIME) - datetime.combine(datetime.min, SESSION_START_TIME)).total_seconds()
+        self.default_var_rate = ADAPTIVE_DEFAULT_DAILY_VOL ** 2 / session_sec
+        self.alpha = 1.0 - 0.5 ** (1.0 / ADAPTIVE_VOL_HALFLIFE)
+        self.var_rate = {}
+        self.last_price = {}
+        self.last_time = {}
+
+        # 요청 수
+        self.requests_per_cycle = 4.0
+        self.request_date = ""
+        self.requests_today = 0
+
+    def observe(self, universe: dict, now: datetime):
+        """
+        Name:가격 관측
+        직전 관측 이후 로그수익률^2 / 경과초 로 초당 분산을 갱신한다.
+        """
+        for symbol, price in zip(universe["symbols"], universe["prpr"]):
+            if price <= 0:
+                continue
+            symbol = str(symbol)
+            prev_price = self.last_price.get(symbol)
+            prev_time = self.last_time.get(symbol)
+            if prev_price and prev_time and now > prev_time and now.date() == prev_time.date():
+                elapsed = (now - prev_time).total_seconds()
+                rate = math.log(price / prev_price) ** 2 / elapsed
+                var_rate = self.var_rate.get(symbol, self.default_var_rate)
+                self.var_rate[symbol] = var_rate + self.alpha * (rate - var_rate)
+            self.last_price[symbol] = float(price)
+            self.last_time[symbol] = now
+
+    def record_requests(self, count: int, now: datetime):
+        # do_trading 1회 요청 수 기록
+        today_str = now.strftime("%Y%m%d")
+        if today_str != self.request_date:
+            self.request_date = today_str
+            self.requests_today = 0
+        self.requests_today += count
+        self.requests_per_cycle += 0.2 * (max(count, 1) - self.requests_per_cycle)
+
+    def next_interval(self, universe: dict | None, now: datetime, take_profit_rt: float | None) -> float:
+        """
+        Name:다음 실행까지 시간(초)
+        Args:
+            universe (dict | None): 마지막 do_trading 의 universe
+            now (datetime): 현재 시각
+            take_profit_rt (float | None): 익절 기준(%)
+        """
+        current_time = now.time()
+        session_start = now.replace(hour=SESSION_START_TIME.hour, minute=SESSION_START_TIME.minute, second=1, microsecond=0)
+        session_end = now.replace(hour=SESSION_END_TIME.hour, minute=SESSION_END_TIME.minute, second=0, microsecond=0)
+
+        # 장 시작 전 : 시작 직후에 실행 / 장 마감 후 : 최대 간격
+        if current_time < SESSION_START_TIME:
+            return min(self.max_sec, max(self.min_sec, (session_start - now).total_seconds()))
+        if current_time >= SESSION_END_TIME:
+            return self.max_sec
+
+        interval = self.max_sec
+        if universe is not None and take_profit_rt is not None:
+            held = universe["held"]
+            if held.any():
+                # 로그 기준 남은 거리
+                rt = universe["evlu_pfls_rt"][held]
+                distance = np.log1p(take_profit_rt / 100.0) - np.log1p(rt / 100.0)
+                var_rate = np.array([self.var_rate.get(str(symbol), self.default_var_rate)
+                                     for symbol in universe["symbols"][held]])
+                # z * sigma * sqrt(t) = distance -> t
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    seconds = (np.maximum(distance, 0.0) / self.z) ** 2 / var_rate
+                interval = float(np.nanmin(seconds)) if len(seconds) else self.max_sec
+
+        # 요청 예산 : 남은 예산을 남은 장 시간에 고르게
+        requests_today = self.requests_today if self.request_date == now.strftime("%Y%m%d") else 0
+        remaining_budget = max(self.daily_request_budget - requests_today, 1)
+        remaining_sec = max((session_end - now).total_seconds(), 0.0)
+        budget_floor = remaining_sec * self.requests_per_cycle / remaining_budget
+
+        return float(min(self.max_sec, max(self.min_sec, budget_floor, interval)))
+
+class DecisionMemo:
+    '''
+    하루 판단 기록
+    한 번 확정되면 그날 바뀌지 않는 판단을 저장해서 같은 조회를 반복하지 않는다.
+    - opnd_yn : 오늘 개장일 여부
+    - bought : 오늘 매수 주문한 종목 (현금매수는 취소되지 않는 한 없어지지 않는다)
+    - evaluated : 오늘 장중에 전략을 평가했는지 (Strategy.is_due)
+    - netted : 주문 의도 상계로 매도하지 않고 남겨서 오늘 매수로 대신한 수량 {종목: 수량}
+    날짜(Asia/Seoul)가 바뀌면 자동으로 비운다. 파일에 저장하므로 재시작해도 유지된다.
+    '''
+    def __init__(self, clock: Clock, path: str | None = JSON_DECISION_MEMO_PATH):
+        """
+        Name:생성자
+        Args:
+            clock (Clock): 날짜 기준 시계
+            path (str | None): 저장 파일, None 이면 메모리에만 (모의 매매)
+        """
+        self.clock = clock
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {"date": "", "opnd_yn": None, "bought": [], "evaluated": False, "netted": {}}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"판단 기록을 읽지 못했습니다. 새로 시작합니다. : {e}")
+
+    def current(self) -> dict:
+        # 오늘 기록, 날짜가 바뀌었으면 비운다. (lock 안에서 호출)
+        today = self.clock.now().strftime("%Y%m%d")
+        if self.data.get("date") != today:
+            self.data = {"date": today, "opnd_yn": None, "bought": [], "evaluated": False, "netted": {}}
+        self.data.setdefault("evaluated", False)
+        self.data.setdefault("netted", {})
+        return self.data
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+
+    def get_opnd_yn(self) -> str | None:
+        with self.lock:
+            return self.current()["opnd_yn"]
+
+    def set_opnd_yn(self, opnd_yn: str):
+        with self.lock:
+            self.current()["opnd_yn"] = opnd_yn
+            self.save()
+
+    def get_bought(self) -> set:
+        with self.lock:
+            return set(self.current()["bought"])
+
+    def add_bought(self, symbols: list):
+        with self.lock:
+            data = self.current()
+            new_symbols = [symbol for symbol in symbols if symbol and symbol not in data["bought"]]
+            if new_symbols:
+                data["bought"].extend(new_symbols)
+                self.save()
+
+    def get_evaluated(self) -> bool:
+        with self.lock:
+            return bool(self.current()["evaluated"])
+
+    def set_evaluated(self):
+        with self.lock:
+            data = self.current()
+            if not data["evaluated"]:
+                data["evaluated"] = True
+                self.save()
+
+    def get_netted(self) -> dict:
+        with self.lock:
+            return dict(self.current()["netted"])
+
+    def add_netted(self, netted: dict):
+        with self.lock:
+            data = self.current()
+            for symbol, quantity in netted.items():
+                data["netted"][symbol] = data["netted"].get(symbol, 0) + int(quantity)
+            if netted:
+                self.save()
+
+class OrderBookStore:
+    '''
+    호가 저장소
+    종목별 링 버퍼(미리 할당한 NumPy 배열)에 호가 갱신을 보관한다. 갱신할 때 배열을 새로 만들지 않는다.
+    가장 최근 호가로 스프레드, 잔량을 바로 조회할 수 있다.
+    배열 모양 : [종목, 갱신, 단계] (단계 0 이 최우선 호가)
+    '''
+    def __init__(self, symbols: list, depth: int = ORDER_BOOK_DEPTH, capacity: int = ORDER_BOOK_CAPACITY):
+        """
+        Name:생성자
+        Args:
+            symbols (list): 종목코드 목록
+            depth (int): 호가 단계
+            capacity (int): 종목별 보관 갱신 수
+        """
+        self.depth = depth
+        self.capacity = capacity
+        # 갱신 중 새 종목 추가(add_symbols)가 있어 RLock
+        self.lock = threading.RLock()
+        self.symbols = []
+        self.index = {}
+        self.allocate(0)
+        self.add_symbols(symbols)
+
+    def allocate(self, n: int):
+        self.ts = np.zeros((n, self.capacity), dtype=np.float64)
+        self.ask_px = np.zeros((n, self.capacity, self.depth), dtype=np.float64)
+        self.ask_qty = np.zeros((n, self.capacity, self.depth), dtype=np.int64)
+        self.bid_px = np.zeros((n, self.capacity, self.depth), dtype=np.float64)
+        self.bid_qty = np.zeros((n, self.capacity, self.depth), dtype=np.int64)
+        # 다음에 쓸 위치, 누적 갱신 수
+        self.head = np.zeros(n, dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+
+    def add_symbols(self, symbols: list):
+        # 종목 추가 (자주 일어나지 않으므로 이때만 배열을 늘린다)
+        # 있는 종목 확인도 lock 안에서 해야 동시에 추가할 때 같은 종목을 두 번 할당하지 않는다.
+        with self.lock:
+            new_symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.index]
+            if not new_symbols:
+                return
+            old = (self.ts, self.ask_px, self.ask_qty, self.bid_px, self.bid_qty, self.head, self.count)
+            n_old = len(self.symbols)
+            self.allocate(n_old + len(new_symbols))
+            for dst, src in zip((self.ts, self.ask_px, self.ask_qty, self.bid_px, self.bid_qty, self.head, self.count), old):
+                dst[:n_old] = src
+            for symbol in new_symbols:
+                self.index[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+
+    def begin_update(self, symbol: str, ts: float) -> tuple:
+        """
+        Name:갱신 시작
+        다음 칸을 비우고 (종목 위치, 칸 위치)를 돌려준다. 호출한 쪽에서 set_level 로 채운 후 end_update.
+        """
+        if symbol not in self.index:
+            self.add_symbols([symbol])
+        i = self.index[symbol]
+        slot = self.head[i]
+        self.ts[i, slot] = ts
+        self.ask_px[i, slot] = 0
+        self.ask_qty[i, slot] = 0
+        self.bid_px[i, slot] = 0
+        self.bid_qty[i, slot] = 0
+        return i, slot
+
+    def end_update(self, i: int):
+        self.head[i] = (self.head[i] + 1) % self.capacity
+        self.count[i] += 1
+
+    def update_from_rest(self, symbol: str, output1: dict, ts: float):
+        """
+        Name:호가 갱신 (get_domestic_asking_price output1)
+        """
+        with self.lock:
+            i, slot = self.begin_update(symbol, ts)
+            for level in range(self.depth):
+                self.ask_px[i, slot, level] = float(output1.get(f"askp{level + 1}") or 0)
+                self.bid_px[i, slot, level] = float(output1.get(f"bidp{level + 1}") or 0)
+                self.ask_qty[i, slot, level] = int(output1.get(f"askp_rsqn{level + 1}") or 0)
+                self.bid_qty[i, slot, level] = int(output1.get(f"bidp_rsqn{level + 1}") or 0)
+            self.end_update(i)
+
+    def update_from_realtime(self, fields: list, ts: float):
+        """
+        Name:호가 갱신 (실시간 H0STASP0 한 건)
+        fields : '^' 로 나눈 값
+        0 종목코드, 1 시각, 2 시간구분, 3~12 매도호가1~10, 13~22 매수호가1~10, 23~32 매도잔량1~10, 33~42 매수잔량1~10
+        """
+        depth = min(self.depth, 10)
+        with self.lock:
+            i, slot = self.begin_update(fields[0], ts)
+            for level in range(depth):
+                self.ask_px[i, slot, level] = float(fields[3 + level] or 0)
+                self.bid_px[i, slot, level] = float(fields[13 + level] or 0)
+                self.ask_qty[i, slot, level] = int(fields[23 + level] or 0)
+                self.bid_qty[i, slot, level] = int(fields[33 + level] or 0)
+            self.end_update(i)
+
+    def latest_slot(self, symbol: str) -> tuple | None:
+        i = self.index.get(symbol)
+        if i is None or self.count[i] == 0:
+            return None
+        return i, (self.head[i] - 1) % self.capacity
+
+    def get_top(self, symbol: str) -> dict | None:
+        """
+        Name:최우선 호가
+        Returns:
+            dict | None: {"ts", "ask", "ask_qty", "bid", "bid_qty", "spread"} 호가가 없으면 None
+        """
+        with self.lock:
+            found = self.latest_slot(symbol)
+            if found is None:
+                return None
+            i, slot = found
+            ask = float(self.ask_px[i, slot, 0])
+            bid = float(self.bid_px[i, slot, 0])
+            return {
+                "ts": float(self.ts[i, slot]),
+                "ask": ask,
+                "ask_qty": int(self.ask_qty[i, slot, 0]),
+                "bid": bid,
+                "bid_qty": int(self.bid_qty[i, slot, 0]),
+                "spread": ask - bid if ask > 0 and bid > 0 else float("nan"),
+            }
+
+    def get_depth(self, symbol: str, levels: int = None) -> tuple:
+        """
+        Name:호가 잔량 합계
+        Returns:
+            tuple: (매도 잔량 합계, 매수 잔량 합계) levels 단계까지, 호가가 없으면 (0, 0)
+        """
+        levels = levels or self.depth
+        with self.lock:
+            found = self.latest_slot(symbol)
+            if found is None:
+                return 0, 0
+            i, slot = found
+            return int(self.ask_qty[i, slot, :levels].sum()), int(self.bid_qty[i, slot, :levels].sum())
+
+    def get_history(self, symbol: str) -> dict:
+        """
+        Name:호가 기록 (오래된 것부터)
+        Returns:
+            dict: {"ts", "ask_px", "ask_qty", "bid_px", "bid_qty": np.ndarray} 복사본
+        """
+        with self.lock:
+            i = self.index.get(symbol)
+            if i is None:
+                return {}
+            n = int(min(self.count[i], self.capacity))
+            order = (np.arange(n) + self.head[i] - n) % self.capacity
+            return {
+                "ts": self.ts[i, order],
+                "ask_px": self.ask_px[i, order],
+                "ask_qty": self.ask_qty[i, order],
+                "bid_px": self.bid_px[i, order],
+                "bid_qty": self.bid_qty[i, order],
+            }
+
+class OrderBookFeed:
+    '''
+    실시간 호가 수신 (웹소켓 H0STASP0)
+    별도 쓰레드에서 종목을 구독하고 받은 호가를 OrderBookStore 에 넣는다.
+    websocket-client 패키지가 필요하다. (requirements.txt)
+    '''
+    TR_ID = "H0STASP0"
+
+    def __init__(self, kis_api: KisApi, store: OrderBookStore, symbols: list):
+        """
+        Name:생성자
+        Args:
+            kis_api (KisApi): 접속키 발급, 시계
+            store (OrderBookStore): 호가 저장소
+            symbols (list): 구독 종목
+        """
+        self.kis_api = kis_api
+        self.store = store
+        self.symbols = list(symbols)
+        self.ws = None
+        self.thread = None
+
+    def start(self):
+        try:
+            import websocket
+        except ImportError as e:
+            raise ImportError("실시간 호가는 websocket-client 패키지가 필요합니다. pip install websocket-client") from e
+
+        approval_key = self.kis_api.get_websocket_approval_key()
+
+        def on_open(ws):
+            for symbol in self.symbols:
+                ws.send(json.dumps({
+                    "header": {"approval_key": approval_key, "custtype": "P", "tr_type": "1", "content-type": "utf-8"},
+                    "body": {"input": {"tr_id": self.TR_ID, "tr_key": symbol}},
+                }))
+
+        def on_message(ws, message):
+            if message.startswith("{"):
+                # 구독 응답, PINGPONG 은 그대로 돌려준다.
+                if '"PINGPONG"' in message:
+                    ws.send(message)
+                return
+            self.handle_message(message)
+
+        self.ws = websocket.WebSocketApp(WEBSOCKET_URL, on_open=on_open, on_message=on_message)
+        self.thread = threading.Thread(target=self.ws.run_forever, kwargs={"ping_interval": 60})
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"실시간 호가 구독 : {self.symbols}")
+
+    def stop(self):
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+
+    def handle_message(self, message: str):
+        """
+        Name:실시간 메시지 처리
+        형식 : 암호화여부|TR_ID|건수|필드^필드^...
+        """
+        parts = message.split("|", 3)
+        if len(parts) < 4 or parts[1] != self.TR_ID:
+            return
+        fields = parts[3].split("^")
+        count = max(int(parts[2]), 1)
+        size = len(fields) // count
+        ts = self.kis_api.clock.now().timestamp()
+        for k in range(count):
+            self.store.update_from_realtime(fields[k * size:(k + 1) * size], ts)
+
+class OrderExecutor:
+    '''
+    주문 실행
+    주문 의도를 매도, 매수 순서로 처리한다.
+    매도는 매도 가능 수량을 확인한 후 주문한다.
+    호가 저장소(order_book)가 있으면 주문할 때 시장가/지정가를 고른다.
+    최근 호가의 반대편 최우선 잔량이 주문 수량 이상이면 그 호가로 지정가 주문 (체결은 시장가와 같고 체결가는 고정)
+    호가가 없거나 오래됐거나 잔량이 부족하면 시장가 주문
+    '''
+    def __init__(self, kis_api: KisApi, pacing_sec: float = 0.5, order_book: OrderBookStore = None,
+                 refresh_book: bool = False):
+        """
+        Name:생성자
+        Args:
+            kis_api (KisApi): 주문용
+            pacing_sec (float): 요청 사이 대기(초)
+            order_book (OrderBookStore): 호가 저장소, 없으면 항상 시장가
+            refresh_book (bool): 주문 직전에 호가를 조회(REST)해서 저장소를 갱신
+        """
+        self.kis_api = kis_api
+        self.pacing_sec = pacing_sec
+        self.order_book = order_book
+        self.refresh_book = refresh_book
+
+    def pace(self):
+        if self.pacing_sec > 0:
+            self.kis_api.clock.sleep(self.pacing_sec)
+
+    def choose_order_type(self, side: str, symbol: str, quantity: int) -> tuple:
+        """
+        Name:주문 유형 선택
+        Returns:
+            tuple: ("01", 0) 시장가 또는 ("00", 가격) 지정가
+        """
+        if self.order_book is None:
+            return "01", 0
+
+        if self.refresh_book:
+            try:
+                with self.kis_api.tracer.span("book"):
+                    data = self.kis_api.get_domestic_asking_price(symbol)
+                if data.get("rt_cd") == "0":
+                    self.order_book.update_from_rest(symbol, data["output1"], self.kis_api.clock.now().timestamp())
+            except KisApiError as e:
+                print(f"호가 조회 실패 : {symbol} : {e}")
+
+        top = self.order_book.get_top(symbol)
+        if top is None or self.kis_api.clock.now().timestamp() - top["ts"] > ORDER_BOOK_MAX_AGE_SEC:
+            return "01", 0
+        price, available = (top["ask"], top["ask_qty"]) if side == "buy" else (top["bid"], top["bid_qty"])
+        if price > 0 and available >= quantity:
+            return "00", int(price)
+        return "01", 0
+
+    def submit(self, side: str, symbol: str, quantity: int) -> dict:
+        """
+        Name:주문
+        Returns:
+            dict: {"side", "symbol", "quantity", "ord_dvsn", "price", "rt_cd", "msg1"}
+        """
+        ord_dvsn, price = self.choose_order_type(side, symbol, quantity)
+        order_name = "시장가" if ord_dvsn == "01" else f"지정가({price:,})"
+        side_name = "매수" if side == "buy" else "매도"
+        with self.kis_api.tracer.span(side):
+            if ord_dvsn == "01" and side == "buy":
+                resp = self.kis_api.set_market_price_buy_order(symbol=symbol, quantity=quantity)
+            elif ord_dvsn == "01":
+                resp = self.kis_api.set_market_price_sell_order(symbol=symbol, quantity=quantity)
+            elif side == "buy":
+                resp = self.kis_api.set_limit_price_buy_order(symbol=symbol, price=price, quantity=quantity)
+            else:
+                resp = self.kis_api.set_limit_price_sell_order(symbol=symbol, price=price, quantity=quantity)
+        rt_cd = resp['rt_cd']
+        if rt_cd == '0':
+            print(f"{order_name} {side_name} 주문 성공")
+        else:
+            print(f"{order_name} {side_name} 주문 실패")
+        return {"side": side, "symbol": symbol, "quantity": quantity, "ord_dvsn": ord_dvsn, "price": price,
+                "rt_cd": rt_cd, "msg1": resp.get("msg1", "")}
+
+    @staticmethod
+    def error_result(side: str, symbol: str, quantity: int, error: Exception) -> dict:
+        # 주문 중 통신 오류 : 실패 결과로 남기고 다음 주문을 계속한다.
+        print(f"주문 실패 : {side} {symbol} : {error}")
+        return {"side": side, "symbol": symbol, "quantity": quantity, "ord_dvsn": "", "price": 0,
+                "rt_cd": "-1", "msg1": str(error)}
+
+    def execute(self, intents: list) -> list:
+        """
+        Name:주문 실행
+        Args:
+            intents (list): [{"side", "symbol", "quantity"}]
+        Returns:
+            list: submit 결과 목록, 주문한 건만
+        """
+        tracer = self.kis_api.tracer
+        results = []
+
+        # 매도
+        # 1 매도 가능 수량 조회
+        # 2 (현금) 매도
+        for intent in intents:
+            if intent["side"] != "sell":
+                continue
+            i_symbol = intent["symbol"]
+            print(f"{'매도종목'.ljust(10, chr(12288))}: {i_symbol}")
+            
+            # 1 매도 가능 수량 조회
+            # 한 종목의 통신 오류 때문에 다른 익절 종목의 매도가 밀리지 않도록 종목 단위로 처리
+            try:
+                with tracer.span("psbl_sell"):
+                    res_json_psbl_sell = self.kis_api.get_domestic_psbl_sell(i_symbol)
+            except KisApiError as e:
+                print(f"매도 가능 수량 조회 실패 : {i_symbol} : {e}")
+                continue
+
+            rt_cd = res_json_psbl_sell['rt_cd']
+            ord_psbl_qty = 0
+            if rt_cd == '0':
+                output = res_json_psbl_sell['output']
+                ord_psbl_qty = min(int(output['ord_psbl_qty']), intent["quantity"])
+
+            self.pace()
+
+            # 2 (현금) 매도
+            # 매도 가능 수량이 있으면 매도
+            if ord_psbl_qty > 0:
+                try:
+                    results.append(self.submit("sell", i_symbol, ord_psbl_qty))
+                except KisApiError as e:
+                    results.append(self.error_result("sell", i_symbol, ord_psbl_qty, e))
+                self.pace()
+
+        # 매도 끝
+
+        # 매수
+        # 1 (현금) 매수
+        for intent in intents:
+            if intent["side"] != "buy":
+                continue
+            try:
+                results.append(self.submit("buy", intent["symbol"], intent["quantity"]))
+            except KisApiError as e:
+                results.append(self.error_result("buy", intent["symbol"], intent["quantity"], e))
+            self.pace()
+
+        #  매수 끝
+
+        return results
+
+class ShardExecutor:
+    '''
+    분할 실행
+    종목을 작업 프로세스 수만큼 나눠 주문을 동시에 처리한다.
+    모든 프로세스(조정자 포함)는 SharedRateLimiter 로 하나의 API 초당 요청 예산을 함께 쓴다.
+    작업 프로세스의 결과와 지표(요청 수, 구간 시간)는 조정자가 합친다.
+    '''
+    # 작업 프로세스 전용 KisApi, 주문 실행
+    worker_api = None
+    worker_executor = None
+
+    def __init__(self, workers: int, app_key: str, app_secret: str, account_no: str,
+                 rate_limiter: SharedRateLimiter = None, use_order_book: bool = False):
+        """
+        Name:생성자
+        Args:
+            workers (int): 작업 프로세스 수
+            app_key (str), app_secret (str), account_no (str): 작업 프로세스의 KisApi 생성용
+            rate_limiter (SharedRateLimiter): 공유 요청 예산, 없으면 생성
+            use_order_book (bool): 작업 프로세스에서 주문 직전 호가 조회(REST)로 시장가/지정가 선택
+        """
+        self.workers = workers
+        self.credentials = (app_key, app_secret, account_no)
+        self.rate_limiter = rate_limiter or SharedRateLimiter()
+        self.use_order_book = use_order_book
+        self.pool = None
+        self.metrics = {"cycles": 0, "requests": 0, "orders": 0, "workers": {}}
+
+    def start(self):
+        if self.pool is None:
+            print(f"분할 실행 시작 : 작업 프로세스 {self.workers}개")
+            self.pool = multiprocessing.Pool(
+                processes=self.workers,
+                initializer=ShardExecutor.init_worker,
+                initargs=(self.credentials, self.rate_limiter.state, self.rate_limiter.interval, self.use_order_book),
+            )
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    @staticmethod
+    def init_worker(credentials: tuple, rate_state, rate_interval: float, use_order_book: bool):
+        # 작업 프로세스 초기화 : 공유 요청 예산을 쓰는 KisApi
+        # 실시간 호가는 조정자 프로세스에만 있으므로 작업 프로세스는 REST 호가를 쓴다.
+        app_key, app_secret, account_no = credentials
+        kis_api = KisApi(app_key=app_key, app_secret=app_secret, account_no=account_no)
+        kis_api.rate_limiter = SharedRateLimiter(1.0 / rate_interval, rate_state)
+        order_book = OrderBookStore([]) if use_order_book else None
+        ShardExecutor.worker_api = kis_api
+        ShardExecutor.worker_executor = OrderExecutor(kis_api, pacing_sec=0, order_book=order_book,
+                                                      refresh_book=use_order_book)
+
+    @staticmethod
+    def run_shard(task: tuple) -> dict:
+        # 작업 프로세스 : 할당된 종목의 주문 의도 실행
+        token, intents = task
+        kis_api = ShardExecutor.worker_api
+        # 조정자가 발급/갱신한 토큰 사용
+        kis_api.authorization, kis_api.access_token, kis_api.access_token_token_expired = token
+
+        request_count = kis_api.request_count
+        started = time.perf_counter()
+        with kis_api.tracer.cycle("shard") as spans:
+            try:
+                results = ShardExecutor.worker_executor.execute(intents)
+            except Exception as e:
+                # 이 묶음만 실패로 돌려주고 다른 묶음은 계속 처리된다.
+                results = [OrderExecutor.error_result(intent["side"], intent["symbol"], intent["quantity"], e)
+                           for intent in intents]
+        return {
+            "pid": os.getpid(),
+            "results": results,
+            "requests": kis_api.request_count - request_count,
+            "elapsed_ms": (time.perf_counter() - started) * 1000.0,
+            "spans": dict(spans),
+        }
+
+    def partition(self, intents: list) -> list:
+        # 종목코드 해시로 나눈다 (같은 종목은 항상 같은 묶음)
+        shards = [[] for _ in range(self.workers)]
+        for intent in intents:
+            shards[zlib.crc32(intent["symbol"].encode()) % self.workers].append(intent)
+        return shards
+
+    def execute(self, intents: list, kis_api: KisApi) -> list:
+        """
+        Name:분할 주문 실행
+        전체 매도를 먼저 끝낸 후 매수한다.
+        Args:
+            intents (list): 주문 의도
+            kis_api (KisApi): 조정자 KisApi (토큰, 지표 합치기)
+        Returns:
+            list: OrderExecutor.execute 결과를 합친 목록
+        """
+        self.start()
+        token = (kis_api.authorization, kis_api.access_token, kis_api.access_token_token_expired)
+        results = []
+        for side in ("sell", "buy"):
+            tasks = [(token, [intent for intent in shard if intent["side"] == side])
+                     for shard in self.partition(intents)]
+            tasks = [task for task in tasks if task[1]]
+            if not tasks:
+                continue
+            pending = [(task, self.pool.apply_async(ShardExecutor.run_shard, (task,))) for task in tasks]
+            for task, async_result in pending:
+                try:
+                    output = async_result.get()
+                except Exception as e:
+                    # 작업 프로세스 오류 : 해당 묶음만 실패 결과로 기록
+                    results.extend(OrderExecutor.error_result(intent["side"], intent["symbol"], intent["quantity"], e)
+                                   for intent in task[1])
+                    continue
+                results.extend(output["results"])
+                self.merge_metrics(output, kis_api)
+
+        self.metrics["cycles"] += 1
+        return results
+
+    def merge_metrics(self, output: dict, kis_api: KisApi):
+        # 작업 프로세스 지표 합치기
+        kis_api.count_request(output["requests"])
+        kis_api.tracer.add_spans(output["spans"], prefix="shard ")
+        self.metrics["requests"] += output["requests"]
+        self.metrics["orders"] += len(output["results"])
+        worker = self.metrics["workers"].setdefault(output["pid"], {"tasks": 0, "requests": 0, "elapsed_ms": 0.0})
+        worker["tasks"] += 1
+        worker["requests"] += output["requests"]
+        worker["elapsed_ms"] += output["elapsed_ms"]
+        print(f"[shard] pid={output['pid']} 주문 {len(output['results'])}건 요청 {output['requests']}건 {output['elapsed_ms']:.0f}ms")
+
+class Utill:
+    '''
+    utill 클래스
+    기타 보조 도구 클래스
+    '''
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def build_universe(balance: dict, bought_symbols: list | None, symbols: list = None,
+                       indicator_engine: IndicatorEngine = None) -> dict:
+        """
+        Name:전략 입력 배열 생성
+        잔고(보유 종목)와 전략이 요청한 종목을 합쳐 종목별 배열로 만든다.
+        Args:
+            balance (dict): get_domestic_balance_all 결과
+            bought_symbols (list | None): 오늘 현금매수 체결 종목, None 이면 알 수 없음(매수 안함)
+            symbols (list): 보유하지 않아도 포함할 종목
+            indicator_engine (IndicatorEngine): 지표 (없으면 NaN)
+        Returns:
+            dict: {"symbols", "hldg_qty", "ord_psbl_qty", "pchs_avg_pric", "prpr", "evlu_pfls_rt",
+                   "held", "bought_today", "sma", "volatility", "rsi", "drawdown": np.ndarray, "cash": float}
+        """
+        rows = balance.get("output1", [])
+        held_symbols = [item["pdno"] for item in rows]
+        held_set = set(held_symbols)
+        extra_symbols = [symbol for symbol in dict.fromkeys(symbols or []) if symbol not in held_set]
+        all_symbols = held_symbols + extra_symbols
+        n_held = len(rows)
+        n = len(all_symbols)
+
+        def column(key, dtype):
+            values = np.zeros(n, dtype=dtype)
+            values[:n_held] = np.array([item.get(key) or 0 for item in rows], dtype=np.float64).astype(dtype)
+            return values
+
+        hldg_qty = column("hldg_qty", np.int64)
+        universe = {
+            "symbols": np.array(all_symbols, dtype=str),
+            "hldg_qty": hldg_qty,
+            "ord_psbl_qty": column("ord_psbl_qty", np.int64),
+            "pchs_avg_pric": column("pchs_avg_pric", np.float64),
+            "prpr": column("prpr", np.float64),
+            "evlu_pfls_rt": column("evlu_pfls_rt", np.float64),
+            "held": hldg_qty > 0,
+        }
+
+        if bought_symbols is None:
+            universe["bought_today"] = np.ones(n, dtype=bool)
+        else:
+            universe["bought_today"] = np.isin(universe["symbols"], list(bought_symbols))
+
+        # 지표 : 엔진의 종목 순서 -> universe 순서
+        snapshot = indicator_engine.snapshot() if indicator_engine is not None else None
+        if snapshot is not None:
+            engine_index = np.array([indicator_engine.index.get(symbol, -1) for symbol in all_symbols], dtype=np.int64)
+            found = engine_index >= 0
+        for key in ("sma", "volatility", "rsi", "drawdown"):
+            values = np.full(n, np.nan)
+            if snapshot is not None:
+                values[found] = snapshot[key][engine_index[found]]
+            universe[key] = values
+
+        # D+2 예수금
+        output2 = balance.get("output2") or [{}]
+        universe["cash"] = float(output2[0].get("prvs_rcdl_excc_amt") or 0)
+        return universe
+
+    @staticmethod
+    def get_working_orders(orders: list, qty_key: str = "rmn_qty") -> dict:
+        """
+        Name:미체결 주문
+        Args:
+            orders (list): 주문체결 조회 output1 (해외는 output, qty_key="nccs_qty")
+            qty_key (str): 잔여 수량 필드
+        Returns:
+            dict: {(side, symbol): 잔여 수량} side "buy" | "sell"
+        """
+        working = {}
+        for order in orders or []:
+            quantity = int(float(order.get(qty_key) or 0))
+            if quantity <= 0 or order.get("cncl_yn") == "Y":
+                continue
+            side = "buy" if order.get("sll_buy_dvsn_cd") == "02" else "sell"
+            key = (side, order.get("pdno", ""))
+            working[key] = working.get(key, 0) + quantity
+        return working
+
+    @staticmethod
+    def net_order_intents(intents: list, working: dict = None, reserved: dict = None, held: dict = None) -> tuple:
+        """
+        Name:주문 의도 상계
+        같은 종목의 매도/매수 의도를 합쳐 종목당 주문 1건(순수량)으로 만들고,
+        이미 접수된 미체결 주문 수량만큼 뺀다.
+        예) 보유 10주 중 4주 매도 + 오늘 매수 1주 -> 매도 3주 (보유 수량 결과는 같고 주문은 1건)
+        남긴 1주는 기존 평균단가 그대로이므로, 매도가 보유 수량 전부(청산)이거나 보유 수량을 모르면(held 없음)
+        상계하지 않고 매도/매수를 따로 주문한다. (청산 후 새 매수 단가로 다시 시작)
+        상계로 남긴 수량은 오늘 매수한 수량이므로(reserved) 이후 매도 의도에서도 빼고 남긴다.
+        Args:
+            intents (list): [{"side", "symbol", "quantity"}]
+            working (dict): get_working_orders 결과
+            reserved (dict): 이전 상계로 남긴 수량 {종목: 수량}
+            held (dict): 보유 수량 {종목: 수량}
+        Returns:
+            tuple: (주문 목록 [{"side", "symbol", "quantity"}] 매도 먼저, 이번에 상계된 매수 수량 {종목: 수량})
+        """
+        working = working or {}
+        reserved = reserved or {}
+        held = held or {}
+        net_qty = {}
+        sell_qty = {}
+        buy_qty = {}
+        for intent in intents:
+            symbol = intent["symbol"]
+            quantity = int(intent["quantity"])
+            if intent["side"] == "buy":
+                buy_qty[symbol] = buy_qty.get(symbol, 0) + quantity
+                net_qty[symbol] = net_qty.get(symbol, 0) + quantity
+            else:
+                sell_qty[symbol] = sell_qty.get(symbol, 0) + quantity
+                net_qty[symbol] = net_qty.get(symbol, 0) - quantity
+
+        # 남길 수량만큼 매도를 줄인다.
+        for symbol, quantity in sell_qty.items():
+            net_qty[symbol] += min(int(reserved.get(symbol, 0)), quantity)
+
+        # 매도와 함께 나온 매수는 주문하지 않고 보유 수량으로 대신한다. (청산하는 매도는 제외)
+        netted = {}
+        split = []
+        for symbol, quantity in buy_qty.items():
+            if symbol not in sell_qty:
+                continue
+            if sell_qty[symbol] < int(held.get(symbol, 0)):
+                netted[symbol] = min(quantity, sell_qty[symbol])
+            else:
+                del net_qty[symbol]
+                split.append(symbol)
+
+        orders = {"sell": [], "buy": []}
+
+        def add_order(side, symbol, qty):
+            quantity = qty - working.get((side, symbol), 0)
+            if quantity > 0:
+                orders[side].append({"side": side, "symbol": symbol, "quantity": quantity})
+
+        for symbol, qty in net_qty.items():
+            add_order("buy" if qty > 0 else "sell", symbol, abs(qty))
+        for symbol in split:
+            add_order("sell", symbol, sell_qty[symbol] - min(int(reserved.get(symbol, 0)), sell_qty[symbol]))
+            add_order("buy", symbol, buy_qty[symbol])
+        return orders["sell"] + orders["buy"], netted
+
+    def print_balance(jsonOrDict):
+        try:
+
+            # JSON 형식의 문자열인지 확인
+            if isinstance(jsonOrDict, str):
+                parsed = json.loads(jsonOrDict)
+            # 딕셔너리인지 확인
+            elif isinstance(jsonOrDict, dict):
+                parsed = jsonOrDict
+            else:
+                raise TypeError("Input must be a JSON string or a dictionary.")
+            
+            for item in parsed["output1"]:
+                print(f"{'종목번호'.ljust(10, chr(12288))}: {item['pdno']}")
+                print(f"{'종목명'.ljust(10, chr(12288))}: {item['prdt_name']}")
+                print(f"{'보유수량'.ljust(10, chr(12288))}: {int(item['hldg_qty']):,}")
+                print(f"{'매입평균가격'.ljust(10, chr(12288))}: {float(item['pchs_avg_pric']):,.2f}")
+                print(f"{'매입금액'.ljust(10, chr(12288))}: {int(item['pchs_amt']):,}")
+                print(f"{'현재가'.ljust(10, chr(12288))}: {int(item['prpr']):,}")
+                print(f"{'평가금액'.ljust(10, chr(12288))}: {int(item['evlu_amt']):,}")
+                print(f"{'평가손익금액'.ljust(10, chr(12288))}: {int(item['evlu_pfls_amt']):,}")
+                print(f"{'평가손익율'.ljust(10, chr(12288))}: {item['evlu_pfls_rt']}")
+                print("----------------")
+            print(" ")
+            for item in parsed["output2"]:
+                print(f"{'D+2 예수금'.ljust(12, chr(12288))}: {int(item['prvs_rcdl_excc_amt']):,}")
+                print(f"{'총평가금액'.ljust(10, chr(12288))}: {int(item['tot_evlu_amt']):,}")
+                print(f"{'매입금액합계금액'.ljust(10, chr(12288))}: {int(item['pchs_amt_smtl_amt']):,}")
+                print(f"{'평가금액합계금액'.ljust(10, chr(12288))}: {int(item['evlu_amt_smtl_amt']):,}")
+                print(f"{'평가손익합계금액'.ljust(10, chr(12288))}: {int(item['evlu_pfls_smtl_amt']):,}")
+
+
+        except json.JSONDecodeError as e:
+            print(f"Invalid JSON: {e}")
+        except TypeError as e:
+            print(f"TypeError: {e}")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+
+
+class Job:
+    '''
+    백그라운드 작업 한 건
+    '''
+    def __init__(self, name: str, func, args: tuple, notify: bool = False):
+        """
+        Name:생성자
+        Args:
+            name (str): 작업 이름 (같은 이름은 중복 실행하지 않는다)
+            func (callable): 실행할 함수
+            args (tuple): 인자
+            notify (bool): 끝나면 트레이 알림
+        """
+        self.name = name
+        self.func = func
+        self.args = args
+        self.notify = notify
+        # queued, running, done, failed, cancelled
+        self.state = "queued"
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def wait(self, timeout: float = None):
+        self.done_event.wait(timeout)
+        return self.result
+
+class JobExecutor:
+    '''
+    백그라운드 작업 실행
+    작업 쓰레드 1개가 대기열의 작업을 차례로 실행한다. 트레이 메뉴와 자동매매가 함께 쓰므로
+    잔고조회 같은 메뉴 작업과 주문이 동시에 실행되지 않는다.
+    - 같은 이름의 작업이 대기 중이거나 실행 중이면 새로 넣지 않는다. (연속 클릭)
+    - cancel : 대기 중인 작업은 빼고, 실행 중인 작업은 취소 표시 (작업이 is_cancelled 로 확인)
+    - on_status(job) : 상태가 바뀔 때마다 호출 (트레이 툴팁, 알림)
+    '''
+    def __init__(self, on_status=None):
+        """
+        Name:생성자
+        Args:
+            on_status (callable): on_status(job, pending) 상태 변경 알림
+        """
+        self.on_status = on_status
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.current = None
+        self.is_run = False
+        self.thread = None
+
+    def start(self):
+        with self.condition:
+            if self.is_run:
+                return
+            self.is_run = True
+        self.thread = threading.Thread(target=self.run_worker)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.is_run = False
+            self.cancel_locked(None)
+            self.condition.notify_all()
+
+    def submit(self, name: str, func, *args, notify: bool = False) -> Job:
+        """
+        Name:작업 넣기
+        Returns:
+            Job: 새 작업, 같은 이름이 대기 중이거나 실행 중이면 그 작업
+        """
+        with self.condition:
+            for job in [self.current, *self.queue]:
+                if job is not None and job.name == name and not job.cancelled():
+                    print(f"이미 대기 중이거나 실행 중입니다 : {name}")
+                    return job
+            job = Job(name, func, args, notify)
+            self.queue.append(job)
+            self.condition.notify_all()
+        self.report(job)
+        return job
+
+    def run(self, name: str, func, *args, timeout: float = JOB_WAIT_TIMEOUT_SEC):
+        """
+        Name:작업 넣고 끝날 때까지 기다리기 (스케줄용)
+        작업 쓰레드가 없으면(모의 매매 등) 바로 실행한다.
+        같은 이름의 작업이 대기 중이거나 실행 중이면 기다리지 않고 건너뛴다.
+        timeout 안에 끝나지 않으면 기다리지 않고 돌아온다. (작업은 계속 진행)
+        Returns:
+            작업 결과, 건너뛰었거나 시간이 초과되면 None
+        """
+        if not self.is_run:
+            return func(*args)
+        if self.is_busy(name):
+            print(f"이전 작업이 끝나지 않아 건너뜁니다 : {name}")
+            return None
+        job = self.submit(name, func, *args)
+        if not job.done_event.wait(timeout):
+            print(f"작업 대기 시간 초과({timeout}초) : {name} 는 작업 쓰레드에서 계속 진행합니다.")
+            return None
+        return job.result
+
+    def cancel(self, name: str = None) -> int:
+        """
+        Name:작업 취소
+        Args:
+            name (str): 작업 이름, None 이면 전체
+        Returns:
+            int: 취소한 작업 수
+        """
+        with self.condition:
+            cancelled = self.cancel_locked(name)
+        for job in cancelled:
+            self.report(job)
+        return len(cancelled)
+
+    def cancel_locked(self, name: str | None) -> list:
+        cancelled = []
+        for job in list(self.queue):
+            if name is None or job.name == name:
+                self.queue.remove(job)
+                job.cancel_event.set()
+                job.state = "cancelled"
+                job.done_event.set()
+                cancelled.append(job)
+        if self.current is not None and (name is None or self.current.name == name):
+            self.current.cancel_event.set()
+            cancelled.append(self.current)
+        return cancelled
+
+    def is_busy(self, name: str) -> bool:
+        # 같은 이름의 작업이 대기 중이거나 실행 중인지
+        with self.condition:
+            return any(job is not None and job.name == name and not job.cancelled()
+                       for job in [self.current, *self.queue])
+
+    def is_cancelled(self) -> bool:
+        # 실행 중인 작업의 취소 여부 (작업 안에서 단계 사이에 확인)
+        job = self.current
+        return job is not None and job.cancelled()
+
+    def get_pending(self) -> int:
+        return len(self.queue)
+
+    def report(self, job: Job):
+        if self.on_status is not None:
+            try:
+                self.on_status(job, self.get_pending())
+            except Exception as e:
+                print(f"작업 상태 표시 오류 : {e}")
+
+    def run_worker(self):
+        while True:
+            with self.condition:
+                while self.is_run and not self.queue:
+                    self.condition.wait()
+                if not self.is_run:
+                    return
+                job = self.queue.popleft()
+                self.current = job
+                job.state = "running"
+            self.report(job)
+
+            try:
+                job.result = job.func(*job.args)
+                job.state = "cancelled" if job.cancelled() else "done"
+            except Exception as e:
+                job.error = e
+                job.state = "failed"
+                print(f"작업 오류 : {job.name} : {e}")
+
+            with self.condition:
+                self.current = None
+            job.done_event.set()
+            self.report(job)
+
+class UsMarketTrader:
+    '''
+    미국 주식 자동매매
+    국내 do_trading 과 같은 흐름을 미국 영업시간(America/New_York)과 미국 휴장일로 실행한다.
+    KisApi(통신, 토큰, 요청 예산)는 국내와 함께 쓰고, 별도 schedule.Scheduler 와 쓰레드에서 돈다.
+    실행은 국내와 같은 JobExecutor 작업 쓰레드에서 하므로 메뉴 작업, 국내 주문과 동시에 실행되지 않는다.
+    미국 주식은 지정가만 가능하므로 현재가에 US_ORDER_PRICE_SLIPPAGE 를 더한(뺀) 가격으로 주문한다.
+    '''
+    def __init__(self, kis_api: KisApi, us_config: dict, job_executor: JobExecutor = None):
+        """
+        Name:생성자
+        Args:
+            kis_api (KisApi): 국내와 함께 쓰는 KisApi
+            us_config (dict): config.json us_market {"exchange", "exchanges", "strategy"}
+            job_executor (JobExecutor): 국내와 함께 쓰는 작업 실행기, 없으면 스케줄 쓰레드에서 바로 실행
+        """
+        self.kis_api = kis_api
+        self.job_executor = job_executor
+        self.clock = kis_api.clock
+        self.tracer = kis_api.tracer
+        self.timezone = ZoneInfo(US_TIMEZONE)
+        # 기본 주문 거래소, 종목별 거래소
+        self.exchange = us_config.get("exchange", "NASD")
+        self.exchanges = dict(us_config.get("exchanges", {}))
+        # 휴장일, 조기 폐장일 : 기본 표 + config.json us_market.holidays / early_close
+        self.holidays = US_MARKET_HOLIDAYS | set(us_config.get("holidays", []))
+        self.early_close = US_MARKET_EARLY_CLOSE | set(us_config.get("early_close", []))
+        self.holiday_years = {date_str[:4] for date_str in self.holidays}
+        self.strategy = self.create_strategy(us_config.get("strategy"))
+        self.scheduler = schedule.Scheduler()
+        # 이번 영업일 미체결 주문 {(side, symbol): 수량}
+        self.working_orders = {}
+
+    @staticmethod
+    def create_strategy(strategy_config: dict | None) -> Strategy:
+        """
+        Name:미국 전략 생성
+        기본 전략의 매수 종목(SIMBOL_LIST)은 국내 종목이므로 미국은 전략과 매수 종목을 반드시 지정해야 한다.
+        Args:
+            strategy_config (dict | None): config.json us_market.strategy
+        """
+        if not strategy_config:
+            raise ValueError("미국 자동매매는 config.json us_market.strategy 가 필요합니다. (기본 전략의 종목은 국내 종목)")
+        strategy = Strategy.create(strategy_config)
+        if isinstance(strategy, TakeProfitDailyBuyStrategy) and "buy_symbols" not in strategy_config.get("params", {}):
+            raise ValueError("미국 자동매매는 us_market.strategy.params.buy_symbols 가 필요합니다. (기본값은 국내 종목)")
+        return strategy
+
+    def get_session(self, now: datetime) -> tuple | None:
+        """
+        Name:미국 영업시간
+        Returns:
+            tuple | None: 오늘(뉴욕) 영업일이면 (시작, 종료) datetime, 휴장일이거나 휴장일 표에 없는 해이면 None
+        """
+        local = now.astimezone(self.timezone)
+        date_str = local.strftime("%Y%m%d")
+        if date_str[:4] not in self.holiday_years:
+            print(f"경고 : {date_str[:4]}년 미국 휴장일 정보가 없어 매매하지 않습니다. (config.json us_market.holidays)")
+            return None
+        if local.weekday() >= 5 or date_str in self.holidays:
+            return None
+        end_time = US_EARLY_CLOSE_TIME if date_str in self.early_close else US_SESSION_END_TIME
+        start = datetime.combine(local.date(), US_SESSION_START_TIME, tzinfo=self.timezone)
+        end = datetime.combine(local.date(), end_time, tzinfo=self.timezone)
+        return start, end
+
+    def get_bought_symbols(self, session_start: datetime) -> list:
+        """
+        Name:이번 미국 영업일에 매수한 종목
+        주문일자는 한국 날짜라서 장 시작 시각(한국 날짜)부터 오늘(한국 날짜)까지 조회한다.
+        """
+        start_dt = session_start.astimezone(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
+        end_dt = self.clock.now().astimezone(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
+        data = self.kis_api.get_overseas_ccnl(start_dt, end_dt)
+        self.working_orders = Utill.get_working_orders(data.get("output", []), qty_key="nccs_qty")
+        return [order.get("pdno", "") for order in data.get("output", []) if order.get("sll_buy_dvsn_cd") == "02"]
+
+    @staticmethod
+    def to_universe_balance(balance: dict) -> dict:
+        # 해외 잔고 -> Utill.build_universe 입력 형식 (국내 잔고 필드 이름)
+        output1 = [{
+            "pdno": item.get("ovrs_pdno", ""),
+            "prdt_name": item.get("ovrs_item_name", ""),
+            "hldg_qty": item.get("ovrs_cblc_qty") or 0,
+            "ord_psbl_qty": item.get("ord_psbl_qty") or 0,
+            "pchs_avg_pric": item.get("pchs_avg_pric") or 0,
+            "prpr": item.get("now_pric2") or 0,
+            "evlu_pfls_rt": item.get("evlu_pfls_rt") or 0,
+            "ovrs_excg_cd": item.get("ovrs_excg_cd", ""),
+        } for item in balance.get("output1", [])]
+        return {"output1": output1, "output2": []}
+
+    def do_trading(self):
+        now = self.clock.now()
+        print(f"[{now.astimezone(self.timezone).strftime('%Y-%m-%d %H:%M:%S')} NY] 미국 자동매매 실행")
+        try:
+            with self.tracer.cycle("us_trading", now):
+                self.trading_cycle(now)
+        except KisApiError as e:
+            print(f"통신 오류 : us do_trading : {e}")
+        except Exception as e:
+            print(f"오류 : us do_trading : {e}")
+
+    def trading_cycle(self, now: datetime):
+        # 1. 영업일, 영업시간 (뉴욕 기준)
+        session = self.get_session(now)
+        if session is None:
+            print("미국 휴장일입니다.")
+            return
+        start, end = session
+        if not start < now < end:
+            print("미국 영업시간이 아닙니다.")
+            return
+
+        # 2. 로그인 (국내와 같은 토큰)
+        with self.tracer.span("login"):
+            if not self.kis_api.get_access_token():
+                print("로그인 실패 : us do_trading")
+                return
+
+        # 3. 잔고 조회
+        with self.tracer.span("balance"):
+            balance = self.to_universe_balance(self.kis_api.get_overseas_balance_all())
+        for item in balance["output1"]:
+            if item["ovrs_excg_cd"]:
+                self.exchanges.setdefault(item["pdno"], item["ovrs_excg_cd"])
+
+        # 4. 이번 영업일 매수 종목, 미체결 주문
+        simbol_list_bought = None
+        self.working_orders = {}
+        try:
+            with self.tracer.span("ccld"):
+                simbol_list_bought = self.get_bought_symbols(start)
+        except KisApiError as e:
+            print(f"미국 주문체결 조회 실패 : 매수 단계는 다음 실행으로 넘깁니다. : {e}")
+
+        # 5. 전략 평가
+        with self.tracer.span("strategy"):
+            universe = Utill.build_universe(balance, simbol_list_bought, self.strategy.symbols)
+            intents = self.strategy.get_order_intents(universe)
+            held = dict(zip(universe["symbols"], universe["hldg_qty"]))
+            intents, _ = Utill.net_order_intents(intents, self.working_orders, held=held)
+
+        # 6. 매도 -> 매수 (지정가)
+        ord_psbl_qty = dict(zip(universe["symbols"], universe["ord_psbl_qty"]))
+        for intent in intents:
+            symbol = intent["symbol"]
+            quantity = intent["quantity"]
+            if intent["side"] == "sell":
+                quantity = min(quantity, int(ord_psbl_qty.get(symbol, 0)))
+                if quantity <= 0:
+                    continue
+            self.submit(intent["side"], symbol, quantity)
+            self.clock.sleep(0.5)
+
+    def submit(self, side: str, symbol: str, quantity: int) -> dict | None:
+        # 현재가 기준 지정가 주문
+        exchange = self.exchanges.get(symbol, self.exchange)
+        with self.tracer.span("quote"):
+            quote = self.kis_api.get_overseas_price(symbol, exchange)
+        last = float((quote.get("output") or {}).get("last") or 0)
+        if quote.get("rt_cd") != "0" or last <= 0:
+            print(f"미국 시세 조회 실패 : {symbol} : {quote.get('msg1', '')}")
+            return None
+
+        factor = 1.0 + US_ORDER_PRICE_SLIPPAGE if side == "buy" else 1.0 - US_ORDER_PRICE_SLIPPAGE
+        price = round(last * factor, 2)
+        with self.tracer.span(f"us_{side}"):
+            resp = self.kis_api.set_overseas_order(side, symbol, price, quantity, exchange)
+        side_name = "매수" if side == "buy" else "매도"
+        result = "성공" if resp.get("rt_cd") == "0" else "실패"
+        print(f"미국 지정가 {side_name} 주문 {result} : {symbol} {quantity}주 ${price:,.2f} {resp.get('msg1', '')}")
+        return resp
+
+    def run_schedule(self, is_running):
+        """
+        Name:미국 스케줄 루프
+        Args:
+            is_running (callable): False 가 되면 종료
+        """
+        print("미국 스케줄 실행.")
+        if self.job_executor is not None:
+            self.scheduler.every(SCHEDULE_INTERVAL_MIN).minutes.do(self.job_executor.run, "미국 자동매매", self.do_trading)
+        else:
+            self.scheduler.every(SCHEDULE_INTERVAL_MIN).minutes.do(self.do_trading)
+        while is_running():
+            self.scheduler.run_pending()
+            time.sleep(1)
+
+class UsaTray:
     '''
-    def __init__(self, app_name:str = "u-sa", icon_path: str = "./favicon.ico"):
+    main 클래스
+    유저 인터페이스: 시스템 트레이
+    매매 자동화
+    매매 판단 알고리즘
+    '''
+    def __init__(self, app_name:str = "u-sa", icon_path: str = "./favicon.ico", kis_api: KisApi = None):
         """
         Name:생성자
         Args:
             app_name (str): 앱 이름 u-sa
             icon_path (str): 트레이 아이콘 이미지 경로 ./favicon.ico
+            kis_api (KisApi): 지정하면 config.json 계정 대신 사용 (모의 매매 PaperKisApi)
         """
         print("UsaTray __init__")
         # schedule loop status run or stop
@@ -740,24 +3984,98 @@ class UsaTray:
         self.app_key = ""
         self.app_secret = ""
         self.account_no = ""
-        self.load_json_config()
+        self.strategy_config = {}
+        self.schedule_mode = "fixed"
+        self.shard_workers = 0
+        self.order_book_mode = "off"
+        self.us_config = {}
+        # 모의 매매(kis_api 지정)는 계정 정보를 쓰지 않으므로 config.json 없이도 실행한다.
+        self.load_json_config(require_credentials=kis_api is None)
+
+        # 매매 전략
+        self.strategy = Strategy.create(self.strategy_config)
         
         # KisApi 생성
-        self.kis_api = KisApi(
-            app_key=self.app_key,
-            app_secret=self.app_secret,
-            account_no=self.account_no
-        )
+        if kis_api is None:
+            kis_api = KisApi(
+                app_key=self.app_key,
+                app_secret=self.app_secret,
+                account_no=self.account_no
+            )
+        self.kis_api = kis_api
+
+        # 시계 : 모의 매매에서는 가상 시계
+        self.clock = self.kis_api.clock
+
+        # 실행 추적, 프로파일링
+        self.tracer = self.kis_api.tracer
+        self.profiler = CycleProfiler(self.tracer)
+
+        # 실시간 지표 : 실행(do_trading) 간격으로 잔고 현재가를 넣는다. (IndicatorEngine 참고)
+        # 호가(OrderBookFeed) 갱신은 넣지 않는다. 호가 구독 종목만 틱 간격이 되어 종목마다 간격이 달라진다.
+        self.indicator_engine = IndicatorEngine(SIMBOL_LIST)
+
+        # 과거 시세(일봉) : 전략이 history_days 를 요구할 때 만든다. (load_history)
+        self.bar_cache = None
+        self.history = {"date": "", "closes": {}}
+
+        # 적응형 스케줄
+        self.adaptive_scheduler = AdaptiveScheduler()
+        self.last_universe = None
+        self.next_trading_at = None
+
+        # 장 시작 전 준비 결과
+        self.warm_state = None
+
+        # 백그라운드 작업 (트레이 메뉴, 자동매매가 함께 사용)
+        self.job_executor = JobExecutor(on_status=self.show_job_status)
+
+        # 하루 판단 기록 (모의 매매는 파일에 저장하지 않는다)
+        memo_path = None if isinstance(self.kis_api, PaperKisApi) else JSON_DECISION_MEMO_PATH
+        self.decision_memo = DecisionMemo(self.clock, memo_path)
+
+        # 오늘 미체결 주문 {(side, symbol): 수량}, 주문체결 조회할 때 갱신
+        self.working_orders = {}
+
+        # 호가
+        # off : 사용 안 함 (항상 시장가)
+        # rest : 주문 직전 호가 조회
+        # realtime : 실시간 호가 구독 (run 에서 시작), 주문할 때는 저장소만 본다.
+        self.order_book = None
+        self.order_book_feed = None
+        if self.order_book_mode in ("rest", "realtime"):
+            self.order_book = OrderBookStore(self.strategy.symbols)
+            if self.order_book_mode == "realtime":
+                self.order_book_feed = OrderBookFeed(self.kis_api, self.order_book, self.strategy.symbols)
+
+        # 주문 실행
+        # shard_workers 가 2 이상이면 작업 프로세스로 분할 실행 (모의 매매는 제외)
+        self.order_executor = OrderExecutor(self.kis_api, order_book=self.order_book,
+                                            refresh_book=self.order_book_mode == "rest")
+        self.shard_executor = None
+        if self.shard_workers > 1 and not isinstance(self.kis_api, PaperKisApi):
+            self.kis_api.rate_limiter = SharedRateLimiter()
+            self.shard_executor = ShardExecutor(self.shard_workers, self.app_key, self.app_secret, self.account_no,
+                                                rate_limiter=self.kis_api.rate_limiter,
+                                                use_order_book=self.order_book is not None)
+
+        # 미국 주식 (모의 매매는 제외)
+        self.us_trader = None
+        if self.us_config.get("enabled") and not isinstance(self.kis_api, PaperKisApi):
+            self.us_trader = UsMarketTrader(self.kis_api, self.us_config, self.job_executor)
 
         self.app_name = app_name
         self.icon_path = icon_path
         image = self.get_icon_image()
 
         # 트레이 메뉴 구성
+        # 메뉴 작업은 백그라운드 작업으로 넣고 바로 돌아온다. (트레이가 멈추지 않도록)
         menu = Menu(
-            MenuItem('테스트', self.do_test),
+            MenuItem('테스트', self.on_test),
             MenuItem('', None, enabled=False),
-            MenuItem('잔고조회', self.do_balance),
+            MenuItem('잔고조회', self.on_balance),
+            MenuItem(f'프로파일링 (다음 {PROFILE_CYCLES_DEFAULT}회)', self.do_profile),
+            MenuItem('작업 취소', self.on_cancel),
             MenuItem('', None, enabled=False),
             MenuItem('종료', self.stop),
         )
@@ -765,16 +4083,36 @@ class UsaTray:
         # 트레이 아이콘 생성
         self.icon = Icon(name=app_name, title=app_name, icon=image, menu=menu)
 
-    def load_json_config(self):
-        if os.path.exists(self.json_config_path):
-            with open(self.json_config_path, "r", encoding="utf-8") as f:
+    def load_json_config(self, require_credentials: bool = True):
+        """
+        Name:설정 읽기
+        Args:
+            require_credentials (bool): False 면 (모의 매매) config.json 이 없으면 example_config.json 을 읽고 계정 정보는 검사하지 않는다.
+        """
+        config_path = self.json_config_path
+        if not require_credentials and not os.path.exists(config_path) and os.path.exists(JSON_EXAMPLE_CONFIG_PATH):
+            print(f"{config_path} 파일이 없어 {JSON_EXAMPLE_CONFIG_PATH} 설정으로 실행합니다.")
+            config_path = JSON_EXAMPLE_CONFIG_PATH
+
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
                 config_data = json.load(f)
                 self.app_key = config_data.get("app_key","")
                 self.app_secret = config_data.get("app_secret","")
                 self.account_no = config_data.get("account_no","")
-        else:
+                self.strategy_config = config_data.get("strategy", {})
+                self.schedule_mode = config_data.get("schedule_mode", "fixed")
+                self.shard_workers = int(config_data.get("shard_workers", 0))
+                self.order_book_mode = config_data.get("order_book", "off")
+                self.us_config = config_data.get("us_market", {})
+        elif require_credentials:
             raise FileNotFoundError("config.json 파일이 없습니다.")
-        
+        else:
+            print("설정 파일이 없어 기본 설정으로 실행합니다.")
+
+        if not require_credentials:
+            return
+
         # 필수 값 검사
         if not self.app_key or not self.app_key.strip():
             raise ValueError("APP Key는 비어 있을 수 없습니다. app_key")
@@ -811,17 +4149,47 @@ class UsaTray:
         print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] 시작합니다")
 
         # scheudle에서 실행할 작업 지정
-        # 10분마다 작업
-        schedule.every(10).minutes.do(self.do_trading)
+        # fixed : 10분마다 작업
+        # adaptive : run_schedule 에서 매번 다음 실행 시각을 정한다.
+        if self.schedule_mode == "adaptive":
+            print("적응형 스케줄")
+            self.next_trading_at = self.clock.now()
+        else:
+            schedule.every(SCHEDULE_INTERVAL_MIN).minutes.do(self.job_executor.run, "자동매매", self.do_trading)
+
+        # 장 시작 전 준비
+        schedule.every().day.at(WARMUP_TIME, "Asia/Seoul").do(self.job_executor.run, "장 시작 전 준비", self.do_warmup)
+        schedule.every().day.at(WARMUP_KEEPALIVE_TIME, "Asia/Seoul").do(self.job_executor.run, "연결 유지", self.do_keepalive)
+
+        # 백그라운드 작업 쓰레드
+        self.job_executor.start()
+
+        # 실시간 호가 구독
+        if self.order_book_feed is not None:
+            try:
+                self.order_book_feed.start()
+            except (ImportError, KisApiError) as e:
+                print(f"실시간 호가를 시작하지 못했습니다. 시장가로 주문합니다. : {e}")
+                self.order_book_feed = None
 
         # schedule 상태
         self.schedule_is_run = True
 
+        # 시그널로 프로파일링 요청 (SIGUSR1, 지원하는 OS 만)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.profiler.request(PROFILE_CYCLES_DEFAULT))
+
         # schedule용 쓰레드 실행
         task_thread = threading.Thread(target=self.run_schedule)
         task_thread.daemon = True # 메인 스레드가 종료되면 함께 종료
         task_thread.start()
 
+        # 미국 주식 : 국내와 따로 도는 스케줄 쓰레드
+        if self.us_trader is not None:
+            us_thread = threading.Thread(target=self.us_trader.run_schedule, args=(lambda: self.schedule_is_run,))
+            us_thread.daemon = True
+            us_thread.start()
+
         # 트레이
         self.icon.run()
 
@@ -830,27 +4198,100 @@ class UsaTray:
         # schedule 루프: 주기적인 작업을 실행
         while self.schedule_is_run:
             schedule.run_pending() # 실행해야 할 작업이 있는지 확인
+            if (self.schedule_mode == "adaptive" and self.clock.now() >= self.next_trading_at
+                    and not self.job_executor.is_busy("자동매매")):
+                self.job_executor.run("자동매매", self.run_adaptive_trading)
             time.sleep(1)  # 반드시 있어야 함 (CPU 낭비 방지)
         
 
+    def run_adaptive_trading(self) -> float:
+        """
+        Name:적응형 스케줄 실행
+        do_trading 을 실행하고 다음 실행 시각을 정한다.
+        Returns:
+            float: 다음 실행까지 시간(초)
+        """
+        request_count = self.kis_api.request_count
+        self.do_trading()
+        now = self.clock.now()
+        self.adaptive_scheduler.record_requests(self.kis_api.request_count - request_count, now)
+
+        take_profit_rt = getattr(self.strategy, "take_profit_rt", None)
+        interval = self.adaptive_scheduler.next_interval(self.last_universe, now, take_profit_rt)
+        self.next_trading_at = now + timedelta(seconds=interval)
+        print(f"다음 실행 : {interval:.0f}초 후 {self.next_trading_at.strftime('%H:%M:%S')}")
+        return interval
+
     def stop(self):
         # 현재 시간 (서울 기준)
         now = datetime.now(ZoneInfo("Asia/Seoul"))
         print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] 종료합니다")
         self.schedule_is_run = False
+        self.job_executor.stop()
+        if self.shard_executor is not None:
+            self.shard_executor.close()
+        if self.order_book_feed is not None:
+            self.order_book_feed.stop()
         self.icon.stop()
 
+    def on_test(self):
+        self.job_executor.submit("테스트", self.do_test, notify=True)
+
+    def on_balance(self):
+        self.job_executor.submit("잔고조회", self.do_balance, notify=True)
+
+    def on_cancel(self):
+        # 메뉴 작업만 취소 (주문 중인 자동매매는 끝까지 실행)
+        count = sum(self.job_executor.cancel(name) for name in ("테스트", "잔고조회"))
+        print(f"작업 취소 : {count}건")
+
+    def show_job_status(self, job: Job, pending: int):
+        """
+        Name:작업 상태 표시
+        실행 중에는 트레이 툴팁에 표시하고, 메뉴 작업이 끝나면 알림으로 결과를 보여준다.
+        """
+        if job.state in ("queued", "running"):
+            state_name = "실행 중" if job.state == "running" else "대기 중"
+            title = f"{self.app_name} : {job.name} {state_name}"
+            if pending > 0:
+                title += f" (대기 {pending})"
+            self.icon.title = title
+            return
+
+        self.icon.title = self.app_name
+        if not job.notify:
+            return
+        if job.state == "done":
+            message = job.result if isinstance(job.result, str) else "완료"
+        elif job.state == "failed":
+            message = f"오류 : {job.error}"
+        else:
+            message = "취소됨"
+        if self.icon.HAS_NOTIFICATION:
+            self.icon.notify(message, f"{self.app_name} : {job.name}")
+
     def do_test(self):
         print("테스트 기능 실행")
         now = datetime.now(ZoneInfo("Asia/Seoul"))
         print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] 테스트 실행")
 
+        # 통신 오류(시간 초과, 재시도 소진)가 메뉴/작업 쓰레드로 나가지 않도록 로그인부터 처리한다.
+        try:
+            return self.run_test()
+        except KisApiError as e:
+            print(f"통신 오류 : do_test : {e}")
+            return f"통신 오류 : {e}"
+
+    def run_test(self) -> str:
         # 1. 로그인
         is_valid = self.kis_api.get_access_token()
         
         if not is_valid:
             print("로그인 실패 : do_trading")
-            return
+            return "로그인 실패"
+
+        if self.job_executor.is_cancelled():
+            return "취소됨"
 
         # 2. 매도 가능 수량 확인 테스트
         res_json_psbl_sell = self.kis_api.get_domestic_psbl_sell("360750")
@@ -874,6 +4315,9 @@ class UsaTray:
 
         # print(resp_sell_order)
 
+        if self.job_executor.is_cancelled():
+            return "취소됨"
+
         # 4. 오늘 주문체결 조회 테스트
         simbol_list_bought = []
 
@@ -897,57 +4341,309 @@ class UsaTray:
         #         else:
         #             print("시장가 매수 주문 실패")
 
-    def do_balance(self):
+        return f"매도 가능 {ord_psbl_qty}주, 오늘 매수 {len(simbol_list_bought)}건"
+
+    def do_profile(self):
+        # 다음 N회 do_trading 프로파일링
+        self.profiler.request(PROFILE_CYCLES_DEFAULT)
+
+    def do_balance(self) -> str:
+        # 백그라운드 작업 쓰레드에서 실행 (on_balance)
         print(f"잔고조회 실행 version : {APP_VERSION}")
 
-        # 로그인
-        is_valid = self.kis_api.get_access_token()
-        
-        if not is_valid:
-            print("로그인 실패 : do_balance")
-            return
-        
-        time.sleep(1)
-        
-        # 잔고조회
-        balance = self.kis_api.get_domestic_balance_all()
+        try:
+            # 로그인
+            is_valid = self.kis_api.get_access_token()
+
+            if not is_valid:
+                print("로그인 실패 : do_balance")
+                return "로그인 실패"
+
+            time.sleep(1)
+
+            if self.job_executor.is_cancelled():
+                return "취소됨"
+
+            # 잔고조회
+            balance = self.kis_api.get_domestic_balance_all()
+        except KisApiError as e:
+            print(f"통신 오류 : do_balance : {e}")
+            return f"통신 오류 : {e}"
         Utill.print_balance(balance)
-        time.sleep(1)
 
-        return
+        # 알림용 요약
+        output2 = balance.get("output2") or [{}]
+        tot_evlu_amt = int(output2[0].get("tot_evlu_amt") or 0)
+        return f"보유 {len(balance['output1'])}종목, 총평가금액 {tot_evlu_amt:,}"
 
     # 자동매매 실행
     # 1. 로그인
-    # 2. 휴일 확인
+    # 2. 휴일 확인 (하루 판단 기록)
     # 3. 영엽시간 확인
-    # 4. 매도
-    # 4-0 익절 5%
-    # 4-1 잔고 조회
-    # 4-2 익절 종목 선정
-    # 4-3 매도 가능 수량 조회
-    # 4-4 시장가 매도
-    # 5. 매수
-    # 5-0 매일 1주 매수 in SIMBOL_LIST
-    # 5-1 주문체결 조회
-    # 5-2 오늘 매수하지 않은 종목 선정
-    # 5-3 시장가 매수
+    # 4. 잔고 조회
+    # 5. 전략 평가 -> 주문 의도 (기본 전략 : 익절 5% 전량 매도, SIMBOL_LIST 매일 1주 매수)
+    # 6. 매도 (OrderExecutor, 분할 실행이면 ShardExecutor) : 매수와 상계될 수 없는 매도 먼저
+    # 6-1 매도 가능 수량 조회
+    # 6-2 시장가 매도
+    # 7. 주문체결 조회 (오늘 매수한 종목) -> 매수 의도
+    # 8. 남은 매도 + 매수 (종목당 주문 1건으로 상계)
+    # 8-1 시장가 매수
     def do_trading(self):
         # 현재 시간 (서울 기준)
         # now는 Asia/Seoul 타임존 기준
-        now = datetime.now(ZoneInfo("Asia/Seoul"))
+        now = self.clock.now()
         print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] 자동매매 실행")
 
+        # 1회 실행 시간 예산
+        # 통신 오류로 스케줄 쓰레드가 죽지 않도록 여기서 모두 처리한다.
+        deadline = Deadline(CYCLE_DEADLINE_SEC, self.clock)
+        self.kis_api.set_deadline(deadline)
+        try:
+            self.profiler.run(self.traced_trading_cycle, now, deadline)
+        except KisApiError as e:
+            print(f"통신 오류 : do_trading : {e}")
+        except Exception as e:
+            print(f"오류 : do_trading : {e}")
+        finally:
+            self.kis_api.set_deadline(None)
+
+    def get_bought_symbols(self) -> list:
+        """
+        Name:오늘 매수한 종목
+        주문체결 조회에서 현금매수 종목만 사용, 미체결 주문(working_orders)도 갱신
+        전략 종목을 모두 오늘 매수했으면(판단 기록) 조회하지 않는다.
+        """
+        bought = self.decision_memo.get_bought()
+        if set(self.strategy.symbols) <= bought:
+            return list(bought)
+
+        simbol_list_bought = []
+        resp_daily_ccld_data = self.kis_api.get_domestic_daily_ccld()
+        tmp_daily_ccld_output = resp_daily_ccld_data.get("output1")
+        self.working_orders = Utill.get_working_orders(tmp_daily_ccld_output)
+        if tmp_daily_ccld_output:
+            for order in tmp_daily_ccld_output:
+                if order.get("sll_buy_dvsn_cd_name") == "현금매수":
+                    simbol_list_bought.append(order.get("pdno",""))
+        self.decision_memo.add_bought(simbol_list_bought)
+        return list(bought.union(simbol_list_bought))
+
+    def get_today_opnd_yn(self) -> str | None:
+        """
+        Name:오늘 개장일 여부
+        판단 기록에 있으면 조회하지 않는다.
+        """
+        open_yn = self.decision_memo.get_opnd_yn()
+        if open_yn is None:
+            open_yn = self.kis_api.get_today_opnd_yn()
+            if open_yn in ("Y", "N"):
+                self.decision_memo.set_opnd_yn(open_yn)
+        return open_yn
+
+    def record_orders(self, results: list, netted: dict = None):
+        # 접수된 주문은 미체결 주문(working_orders)에 더한다. (같은 실행의 다음 주문에서 중복 제거)
+        # 접수된 매수 주문은 오늘 매수한 종목으로 기록 (다음 실행에서 주문체결 조회 생략)
+        # 상계로 매도 대신 남긴 수량도 오늘 매수로 기록하고, 이후 매도에서 빼고 남긴다.
+        # 단 그 종목의 매도 주문이 거부되었으면 상계도 없던 것으로 한다. (다음 실행에서 다시 매수)
+        accepted = [result for result in results if result["rt_cd"] == "0"]
+        for result in accepted:
+            key = (result["side"], result["symbol"])
+            self.working_orders[key] = self.working_orders.get(key, 0) + int(result["quantity"])
+        rejected = {result["symbol"] for result in results if result["side"] == "sell" and result["rt_cd"] != "0"}
+        netted = {symbol: quantity for symbol, quantity in (netted or {}).items() if symbol not in rejected}
+        self.decision_memo.add_bought([result["symbol"] for result in accepted if result["side"] == "buy"] + list(netted))
+        self.decision_memo.add_netted(netted)
+
+    # 장 시작 전 준비
+    # 1. 로그인 (토큰 발급)
+    # 2. 휴장일 (달력 갱신)
+    # 3. 잔고 조회 (연결 생성)
+    # 4. 주문체결 조회
+    # 5. 전략 평가 -> 오늘 첫 do_trading 에서 사용할 매수 의도 (주문체결 조회 생략)
+    def do_warmup(self):
+        now = self.clock.now()
+        print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] 장 시작 전 준비")
+        self.warm_state = None
+        try:
+            with self.tracer.cycle("warmup", now):
+                with self.tracer.span("login"):
+                    if not self.kis_api.get_access_token():
+                        print("로그인 실패 : do_warmup")
+                        return
+
+                with self.tracer.span("holiday"):
+                    open_yn = self.get_today_opnd_yn()
+                if open_yn != 'Y':
+                    print(f"휴일 또는 확인 실패 : open_yn={open_yn}")
+                    return
+
+                with self.tracer.span("balance"):
+                    balance = self.kis_api.get_domestic_balance_all()
+                    self.indicator_engine.update_prices({item['pdno']: item['prpr'] for item in balance["output1"]})
+
+                # 전략이 쓰는 과거 종가 (오늘 첫 평가에서 조회하지 않도록)
+                if self.strategy.history_days > 0:
+                    self.load_history(self.strategy.symbols)
+
+                self.working_orders = {}
+                with self.tracer.span("ccld"):
+                    simbol_list_bought = self.get_bought_symbols()
+
+                # 매도는 장중 잔고로 판단하므로 매수 의도만 준비한다.
+                universe, intents = self.evaluate_strategy(balance, simbol_list_bought)
+                buy_intents = [intent for intent in intents if intent["side"] == "buy"]
+
+            self.warm_state = {
+                "date": now.strftime("%Y%m%d"),
+                "bought": simbol_list_bought,
+                "working_orders": self.working_orders,
+                "buy_intents": buy_intents,
+            }
+            print(f"준비 완료 : 매수 주문 {len(buy_intents)}건")
+        except KisApiError as e:
+            print(f"통신 오류 : do_warmup : {e}")
+        except Exception as e:
+            print(f"오류 : do_warmup : {e}")
+
+    def do_keepalive(self):
+        # 장 시작 직전 연결 유지 (가벼운 요청)
+        try:
+            self.kis_api.get_hashkey({})
+        except KisApiError as e:
+            print(f"통신 오류 : do_keepalive : {e}")
+
+    def take_warm_state(self, now: datetime) -> dict | None:
+        """
+        Name:장 시작 전 준비 결과 가져오기
+        오늘 준비한 결과만, 한 번만 사용한다.
+        """
+        warm_state, self.warm_state = self.warm_state, None
+        if warm_state is None or warm_state["date"] != now.strftime("%Y%m%d"):
+            return None
+        return warm_state
+
+    def evaluate_strategy(self, balance: dict, bought_symbols: list | None, gate: bool = False) -> tuple:
+        """
+        Name:전략 평가
+        전략이 현재가가 필요하면(needs_prices) 보유하지 않은 종목의 시세를 조회해서 채운다.
+        gate 이면 전략이 평가가 필요 없다고 할 때(is_due) 시세 조회와 평가를 하지 않는다. (universe["due"] = False)
+        Returns:
+            tuple: (universe, intents)
+        """
+        universe = Utill.build_universe(balance, bought_symbols, self.strategy.symbols, self.indicator_engine)
+        universe["due"] = True
+        if self.strategy.history_days > 0:
+            universe["closes"] = self.get_history_closes(universe["symbols"])
+        if gate:
+            if not self.strategy.is_due(universe, self.decision_memo.get_evaluated()):
+                universe["due"] = False
+                return universe, []
+            self.decision_memo.set_evaluated()
+        if self.strategy.needs_prices:
+            with self.tracer.span("quote"):
+                self.fill_prices(universe)
+        with self.tracer.span("strategy"):
+            intents = self.strategy.get_order_intents(universe)
+        return universe, intents
+
+    def load_history(self, symbols: list) -> dict:
+        """
+        Name:과거 종가 읽기
+        오늘 처음 보는 종목만 BarCache 로 읽는다. 캐시에 없는 날짜만 조회해서 붙이므로 매일 새 일봉만 조회한다.
+        조회에 실패한 종목은 이번 평가에서 NaN 으로 두고 다음 평가에서 다시 읽는다.
+        Args:
+            symbols (list): 종목코드
+        Returns:
+            dict: {종목코드: np.ndarray 종가, 날짜 오름차순, 최대 history_days 개}
+        """
+        today = self.clock.now().strftime("%Y%m%d")
+        if self.history["date"] != today:
+            self.history = {"date": today, "closes": {}}
+        closes = self.history["closes"]
+        missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in closes]
+        if not missing:
+            return closes
+
+        if self.bar_cache is None:
+            # 모의 매매는 기록된 시세로 만든 일봉이므로 임시 폴더에 둔다.
+            cache_dir = tempfile.mkdtemp(prefix="u-sa-bars-") if isinstance(self.kis_api, PaperKisApi) else BAR_CACHE_DIR
+            self.bar_cache = BarCache(self.kis_api, cache_dir)
+
+        days = self.strategy.history_days
+        # 영업일 days 개를 덮는 달력 기간 (주말, 휴장일 여유)
+        start_dt = (self.clock.now() - timedelta(days=days * 7 // 5 + 14)).strftime("%Y%m%d")
+        with self.tracer.span("history"):
+            for symbol in missing:
+                try:
+                    closes[symbol] = np.array(self.bar_cache.get_daily_bars(symbol, start_dt)["close"][-days:])
+                except KisApiError as e:
+                    print(f"일봉 조회 실패 : {symbol} : {e}")
+        return closes
+
+    def get_history_closes(self, symbols: np.ndarray) -> np.ndarray:
+        """
+        Name:과거 종가 배열
+        Returns:
+            np.ndarray: [종목, history_days] universe 순서, 오래된 날짜부터, 없는 날은 NaN (앞쪽)
+        """
+        days = self.strategy.history_days
+        closes = self.load_history([str(symbol) for symbol in symbols])
+        matrix = np.full((len(symbols), days), np.nan)
+        for i, symbol in enumerate(symbols):
+            values = closes.get(str(symbol), np.empty(0))
+            if len(values):
+                matrix[i, days - len(values):] = values
+        return matrix
+
+    def fill_prices(self, universe: dict):
+        # 현재가가 없는 종목만 채운다. 실패한 종목은 0 으로 두고 전략에서 제외된다.
+        # 1 최근 호가(호가 저장소)의 중간값
+        # 2 관심종목(멀티종목) 시세조회로 MULTI_PRICE_MAX_SYMBOLS 종목씩
+        prpr = universe["prpr"]
+        index = {str(universe["symbols"][i]): i for i in np.nonzero(prpr <= 0)[0]}
+        if self.order_book is not None:
+            now_ts = self.clock.now().timestamp()
+            for symbol, i in list(index.items()):
+                top = self.order_book.get_top(symbol)
+                if top is not None and now_ts - top["ts"] <= ORDER_BOOK_MAX_AGE_SEC and top["ask"] > 0 and top["bid"] > 0:
+                    prpr[i] = (top["ask"] + top["bid"]) / 2.0
+                    del index[symbol]
+
+        symbols = list(index)
+        for start in range(0, len(symbols), MULTI_PRICE_MAX_SYMBOLS):
+            chunk = symbols[start:start + MULTI_PRICE_MAX_SYMBOLS]
+            try:
+                data = self.kis_api.get_domestic_multi_price(chunk)
+            except KisApiError as e:
+                print(f"시세 조회 실패 : {len(chunk)}종목 : {e}")
+                continue
+            if data.get("rt_cd") != "0":
+                print(f"시세 조회 실패 : {data.get('msg1', '')}")
+                continue
+            for item in data.get("output") or []:
+                i = index.get(item.get("inter_shrn_iscd", ""))
+                if i is not None:
+                    prpr[i] = float(item.get("inter2_prpr") or 0)
+
+    def traced_trading_cycle(self, now: datetime, deadline: Deadline):
+        # 단계별 시간 추적
+        with self.tracer.cycle("do_trading", now):
+            self.trading_cycle(now, deadline)
+
+    def trading_cycle(self, now: datetime, deadline: Deadline):
         # 1. 로그인
-        is_valid = self.kis_api.get_access_token()
+        with self.tracer.span("login"):
+            is_valid = self.kis_api.get_access_token()
         
         if not is_valid:
             print("로그인 실패 : do_trading")
             return
         
-        time.sleep(0.5)
+        self.clock.sleep(0.5)
 
         # 2. 휴일 확인
-        open_yn = self.kis_api.get_today_opnd_yn()
+        with self.tracer.span("holiday"):
+            open_yn = self.get_today_opnd_yn()
         if open_yn is None:
             print(f"확인 실패 : open_yn=None")
             return
@@ -958,120 +4654,539 @@ class UsaTray:
             print(f"영업일 : open_yn={open_yn}")
             pass
 
-        time.sleep(0.5)
+        self.clock.sleep(0.5)
 
         # 3. 영업시간 확인
-        current_time = now.time()
+        with self.tracer.span("session"):
+            current_time = now.time()
+
+            start_time = SESSION_START_TIME   # 비교값도 타임존 없이 정의
+            end_time = SESSION_END_TIME
 
-        start_time = dtime(9, 00)   # 비교값도 타임존 없이 정의
-        end_time = dtime(15, 20)
+            is_session = start_time < current_time < end_time
 
-        if start_time < current_time < end_time:
+        if is_session:
             print("영업시간입니다.")
         else:
             print("영업시간이 아닙니다.")
             return
 
-        # 4. 매도 
-        # 4-0 익절 5%
-        # 4-1 잔고 조회
-        # 4-2 익절 종목 선정
-        # 4-3 매도 가능 수량 조회
-        # 4-4 (현금) 시장가 매도
+        # 시간 예산은 단계 사이마다 확인한다. (요청 1건의 타임아웃은 KisApi 가 남은 예산으로 줄인다.)
+        if self.deadline_expired(deadline, "잔고 조회"):
+            return
 
-        # 4-1 잔고 조회
-        balance = self.kis_api.get_domestic_balance_all()
-            
-        # 매도 대상 종목 저장용 list
-        sell_pdno_list = []
-        no_i = 0
-        for item in balance["output1"]:
-            no_i = no_i + 1
-            # print(f"{'NO'.ljust(10, chr(12288))}: {no_i}")
-            # print(f"{'종목번호'.ljust(10, chr(12288))}: {item['pdno']}")
-            # print(f"{'종목명'.ljust(10, chr(12288))}: {item['prdt_name']}")
-            # print(f"{'보유수량'.ljust(10, chr(12288))}: {int(item['hldg_qty']):,}")
-            # print(f"{'평가손익율'.ljust(10, chr(12288))}: {item['evlu_pfls_rt']}")
-            # print("----------------")
-
-            # 4-2 익절 종목 선정
-            evlu_rt = float(item['evlu_pfls_rt'])
-            if evlu_rt > 5.0:
-                # 5% 이상 종목 저장
-                sell_pdno_list.append(item['pdno'])
-        
-        time.sleep(0.5)
+        # 4. 잔고 조회
+        with self.tracer.span("balance"):
+            balance = self.kis_api.get_domestic_balance_all()
 
-        # 4-3 매도 가능 수량 조회 : 익절 종목을 대상으로
-        for i_symbol in sell_pdno_list:
-            print(f"{'매도종목'.ljust(10, chr(12288))}: {i_symbol}")
-            
-            # 4-3 매도 가능 수량 조회
-            res_json_psbl_sell = self.kis_api.get_domestic_psbl_sell(i_symbol)
+            # 보유 종목 현재가로 지표 갱신 (실행 1회 = 지표 입력 1개)
+            self.indicator_engine.update_prices({item['pdno']: item['prpr'] for item in balance["output1"]})
 
-            rt_cd = res_json_psbl_sell['rt_cd']
-            ord_psbl_qty = 0
-            if rt_cd == '0':
-                output = res_json_psbl_sell['output']
-                ord_psbl_qty = int(output['ord_psbl_qty'])
+        # 5. 전략 평가
+        # 오늘 매수 여부를 모르는 상태(None)로 평가하므로 매수 의도는 쓰지 않는다.
+        universe, intents = self.evaluate_strategy(balance, None, gate=True)
+        self.observe_universe(universe, now)
+        held = dict(zip(universe["symbols"], universe["hldg_qty"]))
+        sell_intents = [intent for intent in intents if intent["side"] == "sell"]
 
-            time.sleep(0.5)
+        # 잔고/시세 조회가 예산을 다 썼으면 오래된 잔고로 주문하지 않고 다음 실행에서 다시 판단한다.
+        if self.deadline_expired(deadline, "주문"):
+            return
 
-            # 4-4 (현금) 시장가 매도
-            # 매도 가능 수량이 있으면 시장가 매도
-            if ord_psbl_qty > 0:
-                resp_sell_order = self.kis_api.set_market_price_sell_order(symbol=i_symbol,quantity=ord_psbl_qty)
-                rt_cd_sell_order = resp_sell_order['rt_cd']
-                if rt_cd_sell_order == '0':
-                    print("시장가 매도 주문 성공")
-                else:
-                    print("시장가 매도 주문 실패")
+        # 6. 매도 : 매수와 상계될 수 없는 매도는 주문체결 조회보다 먼저 보낸다. (매도가 우선)
+        # 보유 수량 전부를 파는 매도(청산)와 오늘 매수하지 않았어도 매수 의도가 없는 종목의 매도
+        # 나머지(일부 매도 + 매수 후보)는 매수 의도와 함께 상계해서 8 에서 보낸다.
+        buy_candidates = {intent["symbol"] for intent in self.evaluate_buys(dict(universe), [])}
+        deferred_sells = [intent for intent in sell_intents if intent["symbol"] in buy_candidates
+                          and intent["quantity"] < held.get(intent["symbol"], 0)]
+        self.working_orders = {}
+        self.submit_intents([intent for intent in sell_intents if intent not in deferred_sells], held)
 
-                time.sleep(0.5)
+        # 평가하지 않은 실행(is_due)은 매수도 없으므로 주문체결 조회를 하지 않는다.
+        if not universe["due"]:
+            return
 
-        # 매도 끝
+        # 7. 매수 의도 (장 시작 전 준비 결과 또는 주문체결 조회 후 다시 평가)
+        buy_intents = self.prepare_buys(universe, now, deadline)
 
-        # 5. 매수
-        # 5-0 매일 1주 매수 in SIMBOL_LIST
-        # 5-1 주문체결 조회
-        # 5-2 오늘 매수하지 않은 종목 선정
-        # 5-3 (현금) 시장가 매수
+        # 8. 남은 매도 + 매수 : 같은 종목은 상계해서 종목당 주문 1건 (매도 먼저)
+        # 매수 의도를 만들지 못했어도(조회 실패, 시간 예산 초과) 매도는 보낸다.
+        self.submit_intents(deferred_sells + buy_intents, held)
 
-        # 5-1 주문체결 조회
-        # 오늘 매수한 종목 리스트 작성(현금매수만 사용)
-        simbol_list_bought = []
+        return
 
-        resp_daily_ccld_data = self.kis_api.get_domestic_daily_ccld()
-        tmp_daily_ccld_output = resp_daily_ccld_data.get("output1")
-        if tmp_daily_ccld_output:
-            for order in tmp_daily_ccld_output:
-                if order.get("sll_buy_dvsn_cd_name") == "현금매수":
-                    simbol_list_bought.append(order.get("pdno",""))
+    def prepare_buys(self, universe: dict, now: datetime, deadline: Deadline) -> list:
+        """
+        Name:매수 의도 준비
+        장 시작 전 준비(do_warmup)한 결과가 있으면 오늘 첫 실행은 주문체결 조회 없이 준비한 매수 의도를 쓴다.
+        없으면 주문체결 조회(오늘 매수한 종목, 현금매수만 사용) 후 같은 잔고/시세로 오늘 매수 여부만 바꿔 다시 평가한다.
+        시간 예산을 다 썼거나 조회에 실패하면 매수는 다음 실행으로 넘긴다.
+        Returns:
+            list: [{"side": "buy", "symbol", "quantity"}]
+        """
+        warm_state = self.take_warm_state(now)
+        if warm_state is not None:
+            print(f"장 시작 전 준비한 체결/매수 주문을 사용합니다. (오늘 매수 {len(warm_state['bought'])}종목)")
+            self.working_orders.update(warm_state["working_orders"])
+            return warm_state["buy_intents"]
 
-        # 5-2 오늘 매수하지 않은 종목 선정
-        # 5-3 (현금) 시장가 매수
-        for i_symbol in SIMBOL_LIST:
-            if i_symbol not in simbol_list_bought:
-                # 1주 매수
-                resp_buy_order = self.kis_api.set_market_price_buy_order(symbol=i_symbol, quantity=1)
-                rt_cd_buy_order = resp_buy_order['rt_cd']
-                if rt_cd_buy_order == '0':
-                    print("시장가 매수 주문 성공")
-                else:
-                    print("시장가 매수 주문 실패")
+        if self.deadline_expired(deadline, "매수"):
+            return []
+        try:
+            with self.tracer.span("ccld"):
+                simbol_list_bought = self.get_bought_symbols()
+        except KisApiError as e:
+            print(f"주문체결 조회 실패 : 매수 단계는 다음 실행으로 넘깁니다. : {e}")
+            return []
+        if self.deadline_expired(deadline, "매수"):
+            return []
+        return self.evaluate_buys(universe, simbol_list_bought)
 
-                time.sleep(0.5)
+    def deadline_expired(self, deadline: Deadline, step: str) -> bool:
+        # 시간 예산을 다 썼으면 step 단계부터 다음 실행으로 넘긴다.
+        if deadline.expired():
+            print(f"시간 예산 초과({deadline.budget_sec}초) : {step} 단계는 다음 실행으로 넘깁니다.")
+            return True
+        return False
 
-        #  매수 끝
+    def observe_universe(self, universe: dict, now: datetime):
+        # 적응형 스케줄용
+        self.last_universe = universe
+        self.adaptive_scheduler.observe(universe, now)
 
-        return
+    def evaluate_buys(self, universe: dict, bought_symbols: list) -> list:
+        """
+        Name:매수 의도
+        Returns:
+            list: [{"side": "buy", "symbol", "quantity"}]
+        """
+        if not universe.get("due", True):
+            return []
+        universe["bought_today"] = np.isin(universe["symbols"], list(bought_symbols))
+        with self.tracer.span("strategy"):
+            intents = self.strategy.get_order_intents(universe)
+        return [intent for intent in intents if intent["side"] == "buy"]
+
+    def submit_intents(self, intents: list, held: dict = None) -> list:
+        """
+        Name:주문
+        주문 의도 상계(종목당 주문 1건, 미체결 주문과 중복 제거) 후 매도 -> 매수
+        분할 실행이면 작업 프로세스들이 종목을 나눠서 처리
+        Args:
+            intents (list): [{"side", "symbol", "quantity"}]
+            held (dict): 보유 수량 {종목: 수량}, 청산하는 매도는 상계하지 않는다.
+        Returns:
+            list: 주문 결과
+        """
+        if not intents:
+            return []
+        order_count = len(intents)
+        intents, netted = Utill.net_order_intents(intents, self.working_orders, self.decision_memo.get_netted(), held)
+        if len(intents) != order_count:
+            print(f"주문 의도 상계 : {order_count}건 -> {len(intents)}건")
+
+        if self.shard_executor is not None:
+            results = self.shard_executor.execute(intents, self.kis_api)
+        else:
+            results = self.order_executor.execute(intents)
+        self.record_orders(results, netted)
+        return results
         
+class PnlReport:
+    '''
+    손익 분석 리포트
+    주문체결 내역(최대 3개월)과 잔고를 pandas/NumPy 열로 바꿔 한 번에 계산한다.
+    - 실현손익 : 이동평균 단가 기준 (국내 증권사 잔고 단가와 같은 방식), 수수료/세금 제외
+    - 평가손익, 평균단가 : 현재 잔고
+    - 회전율 : 체결 금액 합계 / 총평가금액
+    - 익절 적중률 : 매도 체결 중 매도 시점 수익률이 take_profit_rt 이상인 비율
+    - 보유 기간 : 보유 수량이 0 에서 시작해서 다시 0 이 될 때까지 (일)
+    조회 기간 이전에 산 수량(opening)은 조회 시작 시점에 산 것으로 본다.
+    - 현재 잔고로 설명되는 수량이면 잔고 평균단가
+    - 기간 안에서 모두 팔아 잔고에 없는 수량이면 단가를 알 수 없음 : 그 매도는 실현손익, 익절 적중률에서 뺀다.
+    - opening 으로 시작한 보유 구간은 시작일을 알 수 없어 보유 기간에서 뺀다.
+    '''
+    FILL_COLUMNS = ["ord_dt", "ord_tmd", "sll_buy_dvsn_cd", "pdno", "prdt_name", "tot_ccld_qty", "avg_prvs", "tot_ccld_amt"]
+
+    def __init__(self, fills: list, balance: dict, take_profit_rt: float = None):
+        """
+        Name:생성자
+        Args:
+            fills (list): get_domestic_daily_ccld output1 목록
+            balance (dict): get_domestic_balance_all 결과
+            take_profit_rt (float): 익절 기준(%), 없으면 적중률 계산 안 함
+        """
+        self.fills = fills
+        self.balance = balance
+        self.take_profit_rt = take_profit_rt
+
+    @staticmethod
+    def fetch(kis_api: KisApi, months: int = REPORT_MONTHS_DEFAULT) -> tuple:
+        """
+        Name:조회
+        Args:
+            months (int): 조회 기간(개월), REPORT_MONTHS_MAX(3) 를 넘으면 3
+        Returns:
+            tuple: (체결 목록, 잔고)
+        """
+        now = kis_api.clock.now()
+        start_dt = PnlReport.months_before(now, min(max(int(months), 1), REPORT_MONTHS_MAX)).strftime("%Y%m%d")
+        fills = kis_api.get_domestic_daily_ccld_all(start_dt, now.strftime("%Y%m%d"))
+        balance = kis_api.get_domestic_balance_all()
+        return fills, balance
+
+    @staticmethod
+    def months_before(now: datetime, months: int) -> datetime:
+        # 달력 기준 N개월 전 같은 날 (없는 날이면 그 달의 마지막 날)
+        month_index = now.year * 12 + now.month - 1 - months
+        year, month = divmod(month_index, 12)
+        month += 1
+        day = min(now.day, calendar.monthrange(year, month)[1])
+        return now.replace(year=year, month=month, day=day)
+
+    def build_frames(self) -> tuple:
+        """
+        Name:체결, 잔고 열 만들기
+        Returns:
+            tuple: (fills DataFrame, holdings DataFrame)
+        """
+        import pandas as pd  # 리포트에서만 사용 (앱 시작 시간에 포함하지 않는다)
+
+        raw = pd.DataFrame.from_records(self.fills, columns=self.FILL_COLUMNS)
+        fills = pd.DataFrame({
+            "dt": pd.to_datetime(raw["ord_dt"].astype(str) + raw["ord_tmd"].astype(str).str.zfill(6),
+                                 format="%Y%m%d%H%M%S", errors="coerce"),
+            "symbol": raw["pdno"].astype(str),
+            "name": raw["prdt_name"].fillna("").astype(str),
+            "side": np.where(raw["sll_buy_dvsn_cd"].astype(str) == "02", 1, -1),
+            "qty": pd.to_numeric(raw["tot_ccld_qty"], errors="coerce").fillna(0).astype(np.int64),
+            "amount": pd.to_numeric(raw["tot_ccld_amt"], errors="coerce").fillna(0.0),
+            "price": pd.to_numeric(raw["avg_prvs"], errors="coerce").fillna(0.0),
+        })
+        fills = fills[(fills["qty"] > 0) & fills["dt"].notna()]
+        # 체결 금액이 없으면 평균가 x 수량
+        fills["amount"] = np.where(fills["amount"] > 0, fills["amount"], fills["price"] * fills["qty"])
+        fills["price"] = fills["amount"] / fills["qty"]
+
+        rows = self.balance.get("output1", [])
+        holdings = pd.DataFrame({
+            "symbol": [item["pdno"] for item in rows],
+            "name": [item.get("prdt_name", "") for item in rows],
+            "hldg_qty": np.array([item.get("hldg_qty") or 0 for item in rows], dtype=np.float64).astype(np.int64),
+            "avg_cost": np.array([item.get("pchs_avg_pric") or 0 for item in rows], dtype=np.float64),
+            "prpr": np.array([item.get("prpr") or 0 for item in rows], dtype=np.float64),
+        })
+
+        # 조회 기간 이전 보유분(opening) : 기간 안에서 보유 수량이 0 아래로 내려가지 않도록 시작 시점에 추가
+        # 수량 = max(현재 보유 - 기간 순매수, -(기간 중 가장 낮은 누적 순매수), 0)
+        fills = fills.sort_values(["symbol", "dt"], kind="stable")
+        fills["opening"] = False
+        cum = (fills["qty"] * fills["side"]).groupby(fills["symbol"]).cumsum()
+        by_symbol = pd.DataFrame({
+            "net": cum.groupby(fills["symbol"]).last(),
+            "min_cum": cum.groupby(fills["symbol"]).min(),
+            "name": fills.groupby("symbol")["name"].last(),
+        })
+        by_symbol = by_symbol.join(holdings.set_index("symbol"), how="outer", rsuffix="_balance")
+        net = by_symbol["net"].fillna(0).to_numpy(dtype=np.int64)
+        shortfall = -np.minimum(by_symbol["min_cum"].fillna(0).to_numpy(dtype=np.int64), 0)
+        hldg_qty = by_symbol["hldg_qty"].fillna(0).to_numpy(dtype=np.int64)
+        from_balance = hldg_qty - net
+        opening_qty = np.maximum(np.maximum(from_balance, shortfall), 0)
+        # 현재 잔고로 설명되는 수량만 잔고 평균단가, 아니면 단가를 알 수 없음
+        known = (hldg_qty > 0) & (from_balance >= shortfall)
+        opening_price = np.where(known, by_symbol["avg_cost"].to_numpy(dtype=np.float64), np.nan)
+        has_opening = opening_qty > 0
+        if has_opening.any():
+            start = fills["dt"].min() if len(fills) else pd.Timestamp.now()
+            names = by_symbol["name_balance"].fillna(by_symbol["name"]).fillna("")
+            fills = pd.concat([pd.DataFrame({
+                "dt": start - pd.Timedelta(seconds=1),
+                "symbol": by_symbol.index.to_numpy()[has_opening],
+                "name": names.to_numpy()[has_opening],
+                "side": 1,
+                "qty": opening_qty[has_opening],
+                "amount": opening_qty[has_opening] * opening_price[has_opening],
+                "price": opening_price[has_opening],
+                "opening": True,
+            }), fills], ignore_index=True)
+
+        fills = fills.sort_values(["symbol", "dt"], kind="stable").reset_index(drop=True)
+        return fills, holdings
+
+    def compute(self) -> dict:
+        """
+        Name:계산
+        Returns:
+            dict: {"fills": DataFrame, "symbols": DataFrame, "summary": dict}
+        """
+        import pandas as pd
+
+        fills, holdings = self.build_frames()
+        symbol = fills["symbol"].to_numpy()
+        side = fills["side"].to_numpy()
+        qty = fills["qty"].to_numpy()
+        price = fills["price"].to_numpy()
+        amount = fills["amount"].to_numpy()
+        opening = fills["opening"].to_numpy(dtype=bool)
+        buy = side > 0
+        n = len(fills)
+
+        # 보유 수량
+        signed = qty * side
+        pos_after = pd.Series(signed).groupby(symbol).cumsum().to_numpy() if n else np.zeros(0, dtype=np.int64)
+        pos_before = pos_after - signed
+
+        # 보유 구간 : 수량 0 에서 매수로 시작 (종목이 바뀌어도 새 구간)
+        new_symbol = np.ones(n, dtype=bool)
+        new_symbol[1:] = symbol[1:] != symbol[:-1]
+        episode = np.cumsum(new_symbol | ((pos_before <= 0) & buy))
+
+        # 이동평균 단가 : 매도는 원가를 수량 비율만큼 줄이고(f), 매수는 금액을 더한다.
+        # 원가 C = S x 누적합(매수금액 / S), S = 구간 내 f 의 누적곱
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f = np.where(buy, 1.0, np.where(pos_before > 0, np.clip(pos_after, 0, None) / pos_before, 0.0))
+            scale = pd.Series(f).groupby(episode).cumprod().to_numpy()
+            scaled_buy = np.where(buy & (scale > 0), amount / scale, 0.0)
+            cost_after = scale * pd.Series(scaled_buy).groupby(episode).cumsum().to_numpy()
+            # 단가를 알 수 없는 opening 으로 시작한 구간은 끝날 때까지 원가를 알 수 없다.
+            unknown = pd.Series(buy & np.isnan(amount)).groupby(episode).cummax().to_numpy(dtype=bool)
+            cost_after = np.where(unknown, np.nan, cost_after)
+            avg_after = np.where(pos_after > 0, cost_after / pos_after, np.nan)
+        avg_before = pd.Series(avg_after).groupby(episode).shift(1).to_numpy()
+
+        sell = ~buy
+        realized = np.where(sell, (price - avg_before) * qty, 0.0)
+        return_rt = np.where(sell, (price / avg_before - 1.0) * 100.0, np.nan)
+        fills["pos_after"] = pos_after
+        fills["avg_cost"] = avg_after
+        # 원가를 모르는 매도는 NaN (합계에서 빠진다)
+        fills["realized_pnl"] = realized
+        fills["return_rt"] = return_rt
+
+        # 보유 기간 : 구간 시작 ~ 수량이 0 이 된 매도 (opening 으로 시작한 구간은 시작일을 몰라서 제외)
+        episode_start = fills["dt"].groupby(episode).transform("first")
+        episode_opening = pd.Series(opening).groupby(episode).transform("first").to_numpy(dtype=bool)
+        closed = sell & (pos_after <= 0) & ~episode_opening
+        fills["holding_days"] = np.where(closed, (fills["dt"] - episode_start).dt.total_seconds() / 86400.0, np.nan)
+
+        # 익절 적중
+        sell_known = sell & ~np.isnan(return_rt)
+        if self.take_profit_rt is not None:
+            fills["take_profit_hit"] = sell_known & (np.nan_to_num(return_rt) >= self.take_profit_rt)
+        else:
+            fills["take_profit_hit"] = False
+
+        # 종목별 (opening 은 체결이 아니므로 체결 수, 매수 금액/수량에서 뺀다)
+        traded_buy = buy & ~opening
+        fills["is_fill"] = ~opening
+        fills["buy_amount"] = np.where(traded_buy, amount, 0.0)
+        fills["sell_amount"] = np.where(sell, amount, 0.0)
+        fills["buy_qty"] = np.where(traded_buy, qty, 0)
+        fills["sell_qty"] = np.where(sell, qty, 0)
+        fills["sell_known"] = sell_known
+        symbols = fills.groupby("symbol").agg(
+            name=("name", "last"),
+            fills=("is_fill", "sum"),
+            buy_qty=("buy_qty", "sum"),
+            sell_qty=("sell_qty", "sum"),
+            buy_amount=("buy_amount", "sum"),
+            sell_amount=("sell_amount", "sum"),
+            realized_pnl=("realized_pnl", "sum"),
+            sells=("sell_known", "sum"),
+            take_profit_hits=("take_profit_hit", "sum"),
+            avg_holding_days=("holding_days", "mean"),
+        )
+        symbols = symbols.join(holdings.set_index("symbol")[["hldg_qty", "avg_cost", "prpr"]], how="outer")
+        symbols[["hldg_qty"]] = symbols[["hldg_qty"]].fillna(0).astype(np.int64)
+        symbols["unrealized_pnl"] = ((symbols["prpr"] - symbols["avg_cost"]) * symbols["hldg_qty"]).fillna(0.0)
+        symbols["turnover_amount"] = symbols["buy_amount"].fillna(0.0) + symbols["sell_amount"].fillna(0.0)
+        fills = fills.drop(columns=["is_fill", "buy_amount", "sell_amount", "buy_qty", "sell_qty", "sell_known"])
+
+        output2 = (self.balance.get("output2") or [{}])[0]
+        tot_evlu_amt = float(output2.get("tot_evlu_amt") or 0)
+        sells = int(symbols["sells"].fillna(0).sum())
+        hits = int(symbols["take_profit_hits"].fillna(0).sum())
+        holding_days = fills["holding_days"].dropna()
+        summary = {
+            "fills": int((~opening).sum()),
+            "symbols": int(len(symbols)),
+            "realized_pnl": float(symbols["realized_pnl"].fillna(0).sum()),
+            "unrealized_pnl": float(symbols["unrealized_pnl"].sum()),
+            "buy_amount": float(symbols["buy_amount"].fillna(0).sum()),
+            "sell_amount": float(symbols["sell_amount"].fillna(0).sum()),
+            "turnover": float(symbols["turnover_amount"].sum() / tot_evlu_amt) if tot_evlu_amt > 0 else None,
+            "take_profit_rt": self.take_profit_rt,
+            "take_profit_hit_rate": hits / sells if sells and self.take_profit_rt is not None else None,
+            "closed_positions": int(len(holding_days)),
+            "holding_days_mean": float(holding_days.mean()) if len(holding_days) else None,
+            "holding_days_median": float(holding_days.median()) if len(holding_days) else None,
+        }
+        return {"fills": fills, "symbols": symbols, "summary": summary}
+
+    def export(self, out_dir: str = REPORT_DIR) -> dict:
+        """
+        Name:저장
+        fills.csv, symbols.csv, report.json (요약 + 종목별)
+        Returns:
+            dict: compute 결과
+        """
+        result = self.compute()
+        os.makedirs(out_dir, exist_ok=True)
+        result["fills"].to_csv(os.path.join(out_dir, "fills.csv"), index=False, encoding="utf-8-sig")
+        result["symbols"].to_csv(os.path.join(out_dir, "symbols.csv"), index_label="symbol", encoding="utf-8-sig")
+        symbols_json = json.loads(result["symbols"].reset_index(names="symbol").to_json(orient="records", force_ascii=False))
+        with open(os.path.join(out_dir, "report.json"), "w", encoding="utf-8") as f:
+            json.dump({"summary": result["summary"], "symbols": symbols_json}, f, indent=2, ensure_ascii=False)
+
+        summary = result["summary"]
+        print(f"손익 분석 : 체결 {summary['fills']}건, 종목 {summary['symbols']}개, "
+              f"실현손익 {summary['realized_pnl']:,.0f}, 평가손익 {summary['unrealized_pnl']:,.0f} -> {out_dir}")
+        return result
+
+    @staticmethod
+    def main(args):
+        # --report 실행
+        usa_tray = UsaTray()
+        kis_api = usa_tray.kis_api
+        if not kis_api.get_access_token():
+            print("로그인 실패 : report")
+            return
+        fills, balance = PnlReport.fetch(kis_api, args.report_months)
+        take_profit_rt = getattr(usa_tray.strategy, "take_profit_rt", None)
+        PnlReport(fills, balance, take_profit_rt).export(args.report)
+
+class PaperTrader:
+    '''
+    모의 매매 재생
+    가상 시계와 모의 브로커로 UsaTray.do_trading 흐름을 그대로 빠르게 실행한다.
+    스케줄은 schedule.every(N).seconds 와 같이 작업이 끝난 시각 + N초에 다음 실행을 한다.
+    '''
+    def __init__(self, feed: PriceFeed, start: datetime, end: datetime, interval_sec: int = 600,
+                 initial_cash: int = 10000000, positions: dict = None):
+        """
+        Name:생성자
+        Args:
+            feed (PriceFeed): 시세
+            start (datetime): 재생 시작 시각 (스케줄 시작)
+            end (datetime): 재생 종료 시각
+            interval_sec (int): 실행 간격(초), 기본 10분
+            initial_cash (int): 예수금
+            positions (dict): 초기 보유 {종목코드: (수량, 매입평균가)}
+        """
+        self.clock = VirtualClock(start)
+        self.end = end if end.tzinfo is not None else end.replace(tzinfo=ZoneInfo("Asia/Seoul"))
+        self.interval_sec = interval_sec
+        self.broker = PaperKisApi(feed, self.clock, initial_cash=initial_cash, positions=positions)
+        self.usa_tray = UsaTray(kis_api=self.broker)
+
+    def run(self) -> dict:
+        """
+        Name:재생
+        Returns:
+            dict: {"cycles": 실행 횟수, "orders": 주문 목록, "requests": 요청 수, "cash": 예수금, "positions": 보유, "elapsed_sec": 실제 소요 시간}
+        """
+        started = time.perf_counter()
+        cycles = 0
+        next_run = self.clock.now() + timedelta(seconds=self.interval_sec)
+        next_warmup = self.get_next_warmup(self.clock.now())
+        while next_run <= self.end:
+            # 장 시작 전 준비 (매일 WARMUP_TIME)
+            if next_warmup <= next_run:
+                self.clock.set(next_warmup)
+                self.usa_tray.do_warmup()
+                next_warmup = self.get_next_warmup(next_warmup + timedelta(seconds=1))
+                continue
+
+            self.clock.set(next_run)
+            if self.usa_tray.schedule_mode == "adaptive":
+                interval = self.usa_tray.run_adaptive_trading()
+            else:
+                self.usa_tray.do_trading()
+                interval = self.interval_sec
+            cycles += 1
+            next_run = self.clock.now() + timedelta(seconds=interval)
+
+        return {
+            "cycles": cycles,
+            "orders": self.broker.orders,
+            "requests": self.broker.request_count,
+            "cash": self.broker.cash,
+            "positions": self.broker.positions,
+            "elapsed_sec": time.perf_counter() - started,
+        }
+
+    @staticmethod
+    def get_next_warmup(now: datetime) -> datetime:
+        # now 이후 첫 WARMUP_TIME
+        hour, minute = (int(v) for v in WARMUP_TIME.split(":"))
+        warmup = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if warmup < now:
+            warmup = warmup + timedelta(days=1)
+        return warmup
+
+    @staticmethod
+    def parse_datetime(value: str) -> datetime:
+        # YYYYMMDD 또는 YYYYMMDDHHMM
+        fmt = "%Y%m%d%H%M" if len(value) > 8 else "%Y%m%d"
+        return datetime.strptime(value, fmt).replace(tzinfo=ZoneInfo("Asia/Seoul"))
+
+    @staticmethod
+    def main(args):
+        # --paper 실행
+        if args.paper == "bars":
+            feed = PriceFeed.from_bar_cache(BarCache(None), SIMBOL_LIST, "M")
+        else:
+            feed = PriceFeed.from_json(args.paper)
+        start = PaperTrader.parse_datetime(args.paper_start)
+        end = PaperTrader.parse_datetime(args.paper_end) if args.paper_end else start + timedelta(days=1)
+
+        trader = PaperTrader(feed, start, end, interval_sec=args.paper_interval, initial_cash=args.paper_cash)
+        if args.profile > 0:
+            trader.usa_tray.profiler.request(args.profile)
+        result = trader.run()
+
+        with open(JSON_PAPER_ORDERS_PATH, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False, default=str)
+
+        print(f"모의 매매 : {result['cycles']}회 실행, 주문 {len(result['orders'])}건, 요청 {result['requests']}건, "
+              f"{result['elapsed_sec']:.2f}초 -> {JSON_PAPER_ORDERS_PATH}")
+
+        # 모의 계좌 손익 분석
+        if args.report:
+            balance = trader.broker.get_domestic_balance_all()
+            take_profit_rt = getattr(trader.usa_tray.strategy, "take_profit_rt", None)
+            PnlReport(trader.broker.orders, balance, take_profit_rt).export(args.report)
+
 if __name__ == '__main__':
     print("u-sa-v0001")
     print("__main__")
+
+    parser = argparse.ArgumentParser(prog="u-sa")
+    parser.add_argument("--paper", metavar="PRICES", help="모의 매매 재생 : 시세 기록 json 경로 또는 bars(분봉 캐시)")
+    parser.add_argument("--paper-start", metavar="YYYYMMDD[HHMM]", help="재생 시작 시각")
+    parser.add_argument("--paper-end", metavar="YYYYMMDD[HHMM]", help="재생 종료 시각 (기본: 시작 + 1일)")
+    parser.add_argument("--paper-interval", type=int, default=600, help="실행 간격(초) (기본: 600)")
+    parser.add_argument("--paper-cash", type=int, default=10000000, help="예수금 (기본: 10,000,000)")
+    parser.add_argument("--profile", type=int, metavar="N", default=0, help="처음 N회 do_trading 프로파일링 (결과: ./profile)")
+    parser.add_argument("--report", nargs="?", const=REPORT_DIR, metavar="DIR",
+                        help=f"손익 분석 리포트 CSV/JSON 저장 (기본: ./{REPORT_DIR}), --paper 와 함께 쓰면 모의 계좌")
+    parser.add_argument("--report-months", type=int, default=REPORT_MONTHS_DEFAULT, choices=range(1, REPORT_MONTHS_MAX + 1),
+                        metavar="1-3", help="체결 조회 기간(개월, 주식일별주문체결조회는 3개월 이내) (기본: 3)")
+    args = parser.parse_args()
+
     try:
-        usa_tray = UsaTray()
-        usa_tray.run()
+        if args.paper:
+            if not args.paper_start:
+                parser.error("--paper 는 --paper-start 가 필요합니다.")
+            PaperTrader.main(args)
+        elif args.report:
+            PnlReport.main(args)
+        else:
+            usa_tray = UsaTray()
+            if args.profile > 0:
+                usa_tray.profiler.request(args.profile)
+            usa_tray.run()
     except Exception as e:
         print(f"[오류] 프로그램을 종료합니다: {e}")
         
\ No newline at end of file